@@ -0,0 +1,79 @@
+import os
+import json
+import time
+import threading
+from pathlib import Path
+
+# Índice em memória job → clipes (com metadados), espelhado em
+# processed/{job_id}/artifacts.json. Cada job escreve apenas no seu diretório;
+# listagens consultam o índice em vez de varrer o disco.
+INDEX_FILE = "artifacts.json"
+
+_LOCK = threading.Lock()
+_JOBS = {}  # job_id -> {"job_id", "created_at", "clips": [ {filename, idx, start, end, duration, size, score, mode} ]}
+
+def job_dir(root, job_id) -> Path:
+    """Diretório de saída do job (criado se não existir)."""
+    path = Path(root) / str(job_id)
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+def _save(entry, directory):
+    tmp = Path(directory) / f".{INDEX_FILE}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(entry, f, ensure_ascii=False)
+    os.replace(tmp, Path(directory) / INDEX_FILE)
+
+def load(root) -> int:
+    """Carrega os índices gravados (uma leitura por job, na inicialização)."""
+    count = 0
+    root = Path(root)
+    if not root.exists():
+        return 0
+    with _LOCK:
+        for entry in os.scandir(root):
+            index_path = Path(entry.path) / INDEX_FILE
+            if not entry.is_dir() or not index_path.exists():
+                continue
+            try:
+                with open(index_path, encoding="utf-8") as f:
+                    data = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"[WARN] Índice de artefatos inválido em {index_path}: {e}")
+                continue
+            _JOBS[data.get("job_id", entry.name)] = data
+            count += 1
+    return count
+
+def add_clip(job_id, clip_path, meta=None) -> dict:
+    """Registra um clipe finalizado do job (metadados + tamanho do arquivo)."""
+    clip_path = Path(clip_path)
+    meta = dict(meta or {})
+    start, end = meta.get("start"), meta.get("end")
+    clip = {
+        "filename": clip_path.name,
+        "idx": meta.get("idx"),
+        "start": start,
+        "end": end,
+        "duration": round(end - start, 3) if start is not None and end is not None else None,
+        "size": clip_path.stat().st_size if clip_path.exists() else None,
+        "score": meta.get("score"),
+        "mode": meta.get("mode"),
+    }
+    with _LOCK:
+        entry = _JOBS.setdefault(job_id, {"job_id": job_id, "created_at": time.time(), "clips": []})
+        entry["clips"] = [c for c in entry["clips"] if c["filename"] != clip["filename"]] + [clip]
+        entry["clips"].sort(key=lambda c: (c["idx"] is None, c["idx"] or 0))
+        _save(entry, clip_path.parent)
+    return clip
+
+def clips(job_id) -> list:
+    with _LOCK:
+        entry = _JOBS.get(job_id)
+        return [dict(c) for c in entry["clips"]] if entry else []
+
+def recent(limit_jobs=20) -> list:
+    """Clipes dos jobs mais recentes, no formato [{job_id, **clip}]."""
+    with _LOCK:
+        entries = sorted(_JOBS.values(), key=lambda e: e.get("created_at", 0), reverse=True)[:limit_jobs]
+        return [{"job_id": e["job_id"], **c} for e in entries for c in e["clips"]]
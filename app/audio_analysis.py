@@ -0,0 +1,158 @@
+import os
+import logging
+import subprocess
+
+import numpy as np
+
+from ffmpeg_utils import ffmpeg_bin
+
+logger = logging.getLogger(__name__)
+
+# Pré-pontuação do áudio: features por quadro (loudness, picos de energia, ZCR,
+# planicidade espectral) + taxa de fala da transcrição, tudo vetorizado em NumPy,
+# agregadas em regiões deslizantes e ranqueadas. A detecção pode então mandar ao
+# LLM só a transcrição em volta das melhores regiões (DETECT_PRESCORE=focus).
+SILENCE_DB = -50.0
+
+def decode_pcm_blocks(media_path, sample_rate=8000, block_seconds=60.0):
+    """Decodifica o áudio (mono, float32 em [-1, 1]) em blocos, sem carregar tudo na memória."""
+    cmd = [ffmpeg_bin(), "-hide_banner", "-loglevel", "error", "-nostdin", "-i", str(media_path),
+           "-map", "0:a:0", "-vn", "-ac", "1", "-ar", str(sample_rate), "-f", "s16le", "pipe:1"]
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    block_bytes = int(sample_rate * block_seconds) * 2
+    try:
+        while True:
+            raw = proc.stdout.read(block_bytes)
+            if not raw:
+                break
+            yield np.frombuffer(raw[:len(raw) // 2 * 2], dtype="<i2").astype(np.float32) / 32768.0
+    finally:
+        proc.stdout.close()
+        if proc.wait() != 0:
+            raise RuntimeError(f"ffmpeg não conseguiu decodificar o áudio de {media_path}")
+
+def frame_features(media_path, sample_rate=8000, frame_seconds=0.5) -> dict:
+    """Features por quadro de `frame_seconds`: rms_db, zcr e flatness (0 = tonal, 1 = ruído)."""
+    frame_len = int(sample_rate * frame_seconds)
+    window = np.hanning(frame_len).astype(np.float32)
+    rms_db, zcr, flatness = [], [], []
+    carry = np.zeros(0, dtype=np.float32)
+    for block in decode_pcm_blocks(media_path, sample_rate):
+        samples = np.concatenate([carry, block])
+        n = len(samples) // frame_len
+        carry = samples[n * frame_len:]
+        if n == 0:
+            continue
+        frames = samples[:n * frame_len].reshape(n, frame_len)
+        rms = np.sqrt(np.mean(frames ** 2, axis=1))
+        rms_db.append(20 * np.log10(rms + 1e-9))
+        zcr.append(np.mean(np.abs(np.diff(np.signbit(frames), axis=1)), axis=1))
+        power = np.abs(np.fft.rfft(frames * window, axis=1)) ** 2 + 1e-12
+        flatness.append(np.exp(np.mean(np.log(power), axis=1)) / np.mean(power, axis=1))
+    cat = lambda parts: np.concatenate(parts) if parts else np.zeros(0, dtype=np.float32)
+    return {"frame_seconds": frame_seconds, "rms_db": cat(rms_db), "zcr": cat(zcr), "flatness": cat(flatness)}
+
+def speech_rate(transcript, n_frames: int, frame_seconds: float) -> np.ndarray:
+    """Palavras por segundo em cada quadro (tempos de palavras; sem eles, distribui pelos cues)."""
+    edges = np.arange(n_frames + 1) * frame_seconds
+    if transcript is None or n_frames == 0:
+        return np.zeros(n_frames)
+    if getattr(transcript, "words", None):
+        counts, _ = np.histogram(np.asarray(transcript.word_starts), bins=edges)
+    else:
+        mids = (np.asarray(transcript.starts) + np.asarray(transcript.ends)) / 2
+        weights = np.array([len(t.split()) for t in transcript.texts], dtype=float)
+        counts, _ = np.histogram(mids, bins=edges, weights=weights)
+    return counts / frame_seconds
+
+def _robust_z(x: np.ndarray) -> np.ndarray:
+    if x.size == 0:
+        return x
+    med = np.median(x)
+    mad = np.median(np.abs(x - med)) * 1.4826 + 1e-6
+    return (x - med) / mad
+
+def _moving_sum(x: np.ndarray, width: int) -> np.ndarray:
+    c = np.concatenate([[0.0], np.cumsum(x)])
+    return c[width:] - c[:-width]
+
+def score_frames(features: dict, rate: np.ndarray) -> dict:
+    """Componentes por quadro e a pontuação combinada."""
+    db = features["rms_db"]
+    voiced = db > SILENCE_DB
+    loud = np.clip(_robust_z(np.where(voiced, db, SILENCE_DB)), 0, 4)
+    # pico de energia: salto em relação à média dos ~5 s anteriores
+    k = max(1, int(round(5.0 / features["frame_seconds"])))
+    baseline = np.concatenate([np.full(k, db[:k].mean() if db.size else 0.0), db])
+    prev_mean = _moving_sum(baseline, k)[:db.size] / k
+    spikes = ((db - prev_mean) > 6.0).astype(float)
+    # riso/aplauso: banda larga (planicidade alta), muitos cruzamentos por zero e volume acima da mediana
+    bursts = ((features["flatness"] > 0.25) & (features["zcr"] > 0.15) & (loud > 0.5)).astype(float)
+    rate_z = np.clip(_robust_z(rate), 0, 4) if rate.size else rate
+    score = 1.0 * loud + 1.5 * spikes + 2.0 * bursts + 0.75 * rate_z
+    score[~voiced] = 0.0
+    return {"loud": loud, "spikes": spikes, "bursts": bursts, "rate": rate, "score": score}
+
+def rank_regions(frames: dict, frame_seconds: float, region_seconds=30.0, hop_seconds=10.0) -> list:
+    """Regiões deslizantes ordenadas pela pontuação média (maior primeiro)."""
+    n = frames["score"].size
+    width = max(1, int(round(region_seconds / frame_seconds)))
+    hop = max(1, int(round(hop_seconds / frame_seconds)))
+    if n < width:
+        width = max(n, 1)
+    if n == 0:
+        return []
+    starts = np.arange(0, n - width + 1, hop)
+    sums = {name: _moving_sum(frames[name].astype(float), width)[starts] / width
+            for name in ("score", "loud", "spikes", "bursts", "rate")}
+    order = np.argsort(-sums["score"], kind="stable")
+    return [{
+        "start": round(float(starts[i] * frame_seconds), 2),
+        "end": round(float((starts[i] + width) * frame_seconds), 2),
+        "score": round(float(sums["score"][i]), 3),
+        "loudness": round(float(sums["loud"][i]), 3),
+        "spikes": round(float(sums["spikes"][i]), 3),
+        "bursts": round(float(sums["bursts"][i]), 3),
+        "speech_rate": round(float(sums["rate"][i]), 2),
+    } for i in order]
+
+def select_regions(ranked: list, top_k: int, context_seconds: float, duration: float) -> list:
+    """Top-k regiões sem repetição, com contexto nas bordas; sobrepostas são unidas. Ordenadas por início."""
+    picked = []
+    for region in ranked:
+        if len(picked) >= top_k:
+            break
+        if any(region["start"] < p["end"] and p["start"] < region["end"] for p in picked):
+            continue
+        picked.append(region)
+    padded = sorted(({**r, "start": max(0.0, r["start"] - context_seconds),
+                      "end": min(duration, r["end"] + context_seconds) if duration else r["end"] + context_seconds}
+                     for r in picked), key=lambda r: r["start"])
+    merged = []
+    for r in padded:
+        if merged and r["start"] <= merged[-1]["end"]:
+            merged[-1]["end"] = max(merged[-1]["end"], r["end"])
+            merged[-1]["score"] = max(merged[-1]["score"], r["score"])
+        else:
+            merged.append(dict(r))
+    return merged
+
+def candidate_regions(media_path, transcript=None, top_k=None, region_seconds=None, context_seconds=None) -> list:
+    """
+    Regiões candidatas [{start, end, score, loudness, spikes, bursts, speech_rate}]
+    do áudio de `media_path` (vídeo ou áudio extraído), ordenadas por início.
+    """
+    top_k = top_k or int(os.getenv("PRESCORE_TOP_K", "12"))
+    region_seconds = region_seconds or float(os.getenv("PRESCORE_REGION_SECONDS", "60"))
+    context_seconds = float(os.getenv("PRESCORE_CONTEXT_SECONDS", "15")) if context_seconds is None else context_seconds
+    frame_seconds = float(os.getenv("PRESCORE_FRAME_SECONDS", "0.5"))
+
+    features = frame_features(media_path, frame_seconds=frame_seconds)
+    n = features["rms_db"].size
+    rate = speech_rate(transcript, n, frame_seconds)
+    frames = score_frames(features, rate)
+    ranked = rank_regions(frames, frame_seconds, region_seconds, hop_seconds=region_seconds / 3)
+    regions = select_regions(ranked, top_k, context_seconds, n * frame_seconds)
+    covered = sum(r["end"] - r["start"] for r in regions)
+    logger.info(f"Pré-pontuação do áudio: {len(regions)} região(ões), {covered:.0f}s de {n * frame_seconds:.0f}s")
+    return regions
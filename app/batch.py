@@ -0,0 +1,266 @@
+"""
+Processamento em lote: um diretório de vídeos ou um manifesto CSV/JSON (com prompt por item)
+passa pelo pipeline em processo com vários jobs ao mesmo tempo.
+
+Os jobs disputam as vagas de STAGE_LIMITS (Whisper, LLM, ffmpeg), então enquanto um vídeo
+é transcrito outro está na detecção e um terceiro no corte. Sessão HTTP, prontidão do
+modelo e texto dos prompts são carregados uma vez e compartilhados pelo lote. Jobs já
+concluídos (manifesto com status done e clipes no disco) são pulados; um lote
+interrompido retoma de onde parou. No fim grava um relatório JSON com o resultado e os
+tempos por etapa de cada vídeo.
+"""
+import os
+import csv
+import json
+import time
+import hashlib
+import argparse
+import shutil
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Optional
+
+import artifacts
+import detect_highlight
+import manifest
+import metrics
+import ollama_ready
+from http_session import get_session
+from pipeline import JobRequest, run_pipeline_safe
+from prompts.loader import resolve_by_name_or_default
+from utils import env_flag
+
+VIDEO_EXTENSIONS = (".mp4", ".mkv", ".mov", ".webm", ".avi", ".flv", ".ts", ".m4v")
+
+@dataclass
+class BatchItem:
+    video: str
+    prompt: Optional[str] = None       # nome em prompts/detect_highlight (sem .txt)
+    prompt_path: Optional[str] = None  # ou caminho de um .txt
+    cut_mode: Optional[str] = None
+    job_id: Optional[str] = None
+
+def default_workers() -> int:
+    return max(1, int(os.getenv("BATCH_WORKERS", os.getenv("JOB_WORKERS", "3"))))
+
+# --------------------------
+# Entrada
+# --------------------------
+def _item_from(entry, base_dir: Path) -> BatchItem:
+    if isinstance(entry, str):
+        entry = {"video": entry}
+    video = entry.get("video") or entry.get("path")
+    if not video:
+        raise ValueError(f"Item sem 'video': {entry}")
+    video = Path(video).expanduser()
+    if not video.is_absolute():
+        video = base_dir / video
+    return BatchItem(
+        video=str(video.resolve()),
+        prompt=entry.get("prompt") or None,
+        prompt_path=entry.get("prompt_path") or None,
+        cut_mode=entry.get("cut_mode") or None,
+        job_id=entry.get("job_id") or None,
+    )
+
+def load_items(source, recursive: bool = False) -> List[BatchItem]:
+    """
+    `source` pode ser um diretório (todos os vídeos dele), um .csv (colunas video,
+    prompt, prompt_path, cut_mode, job_id; só `video` é obrigatória) ou um .json (lista de
+    caminhos ou de objetos com as mesmas chaves, solta ou em {"items": [...]}).
+    Caminhos relativos são resolvidos a partir do diretório do manifesto.
+    """
+    source = Path(source)
+    if source.is_dir():
+        pattern = "**/*" if recursive else "*"
+        return [BatchItem(video=str(p.resolve())) for p in sorted(source.glob(pattern))
+                if p.is_file() and p.suffix.lower() in VIDEO_EXTENSIONS]
+    base_dir = source.resolve().parent
+    if source.suffix.lower() == ".csv":
+        with open(source, newline="", encoding="utf-8") as f:
+            return [_item_from({k.strip(): (v or "").strip() for k, v in row.items() if k}, base_dir)
+                    for row in csv.DictReader(f)]
+    if source.suffix.lower() == ".json":
+        with open(source, encoding="utf-8") as f:
+            data = json.load(f)
+        if isinstance(data, dict):
+            data = data.get("items", [])
+        return [_item_from(entry, base_dir) for entry in data]
+    raise ValueError(f"Entrada não suportada: {source} (use um diretório, .csv ou .json)")
+
+def batch_job_id(item: BatchItem) -> str:
+    """Id estável por vídeo + prompt + modo de corte: rodar o lote de novo reencontra os mesmos jobs."""
+    if item.job_id:
+        return item.job_id
+    key = "|".join([item.video, item.prompt or "", item.prompt_path or "", item.cut_mode or ""])
+    slug = "".join(ch if ch.isalnum() or ch in "-_" else "_" for ch in Path(item.video).stem)[:40]
+    return f"batch_{hashlib.sha1(key.encode()).hexdigest()[:10]}_{slug}"
+
+# --------------------------
+# Recursos compartilhados
+# --------------------------
+def warm_up():
+    """Abre a sessão HTTP e confirma (ou baixa) e carrega o modelo uma vez antes de começar o lote."""
+    get_session()
+    if env_flag("USE_CHATGPT"):
+        return
+    if not detect_highlight.ensure_ollama_model():
+        raise RuntimeError("O modelo Ollama não está disponível e não pôde ser baixado.")
+    if ollama_ready.preload_enabled():
+        ollama_ready.preload()
+
+def resolve_prompts(items: List[BatchItem]) -> dict:
+    """Caminho de cada prompt distinto do lote (já lido para o cache); prompt inexistente vira a exceção."""
+    resolved = {}
+    for item in items:
+        key = item.prompt_path or item.prompt
+        if key in resolved:
+            continue
+        try:
+            path = Path(item.prompt_path) if item.prompt_path else resolve_by_name_or_default(item.prompt)
+            if not path.exists():
+                raise FileNotFoundError(f"Prompt não encontrado: {path}")
+            detect_highlight.load_prompt_from_file(str(path))
+            resolved[key] = str(path.resolve())
+        except (OSError, ValueError) as e:
+            resolved[key] = e
+    return resolved
+
+def stage_video(video: str, work_dir: Path, job_id: str) -> str:
+    """
+    Link do vídeo em `work_dir` com o nome do job: áudio, SRT e highlights do pipeline são
+    gravados (e limpos) ali, sem tocar no diretório de origem nem apagar o vídeo original.
+    """
+    work_dir.mkdir(parents=True, exist_ok=True)
+    target = work_dir / f"{job_id}{Path(video).suffix.lower()}"
+    if target.exists() or target.is_symlink():
+        return str(target)
+    try:
+        os.symlink(video, target)
+    except OSError:
+        try:
+            os.link(video, target)
+        except OSError:
+            shutil.copy2(video, target)
+    return str(target)
+
+# --------------------------
+# Execução
+# --------------------------
+def _finished_clips(output_dir: str, job_id: str) -> Optional[list]:
+    """Clipes de um job que já terminou com sucesso numa execução anterior (None se precisa rodar)."""
+    m = manifest.load(output_dir, job_id)
+    if m is None or m.data.get("status") != "done":
+        return None
+    clips = (m.data["stages"].get("cut") or {}).get("outputs", {}).get("clips", [])
+    return clips if all(os.path.exists(c) for c in clips) else None
+
+def run_item(item: BatchItem, prompt_path, processed_dir: Path, work_dir: Path, force: bool = False) -> dict:
+    job_id = batch_job_id(item)
+    output_dir = str(artifacts.job_dir(processed_dir, job_id))
+    entry = {"video": item.video, "job_id": job_id, "prompt": item.prompt_path or item.prompt,
+             "output_dir": output_dir, "status": "failed", "error": None, "highlights": 0, "clips": [],
+             "seconds": 0.0, "timings": {}}
+    if isinstance(prompt_path, Exception):
+        entry["error"] = str(prompt_path)
+        return entry
+    if not os.path.exists(item.video):
+        entry["error"] = "Vídeo não encontrado"
+        return entry
+    if not force:
+        clips = _finished_clips(output_dir, job_id)
+        if clips is not None:
+            entry.update(status="skipped", clips=clips)
+            return entry
+
+    started = time.perf_counter()
+    result = run_pipeline_safe(JobRequest(
+        video_path=stage_video(item.video, work_dir, job_id),
+        output_dir=output_dir,
+        job_id=job_id,
+        prompt_path=prompt_path,
+        cut_mode=item.cut_mode if item.cut_mode in ("smart", "copy", "reencode") else None,
+    ))
+    entry.update(status="done" if result.ok else "failed", error=result.error, highlights=len(result.highlights),
+                 clips=result.clips, seconds=round(time.perf_counter() - started, 3),
+                 timings=metrics.job_summary(job_id))
+    return entry
+
+def run_batch(items: List[BatchItem], processed_dir="processed", work_dir=None, workers: int = 0,
+              force: bool = False) -> dict:
+    processed_dir = Path(processed_dir)
+    work_dir = Path(work_dir) if work_dir else processed_dir / "_batch"
+    workers = workers or default_workers()
+    started_at, started = time.time(), time.perf_counter()
+
+    warm_up()
+    prompts = resolve_prompts(items)
+    print(f"[batch] {len(items)} vídeo(s), {workers} job(s) simultâneos, {len(prompts)} prompt(s)")
+
+    results = [None] * len(items)
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="batch") as pool:
+        futures = {pool.submit(run_item, item, prompts[item.prompt_path or item.prompt], processed_dir,
+                               work_dir, force): i for i, item in enumerate(items)}
+        for n, future in enumerate(as_completed(futures), 1):
+            entry = results[futures[future]] = future.result()
+            detail = entry["error"] or f"{len(entry['clips'])} clipe(s)"
+            print(f"[batch] {n}/{len(items)} {entry['status']}: {Path(entry['video']).name} "
+                  f"({entry['seconds']:.1f}s) {detail}")
+
+    wall = time.perf_counter() - started
+    ran = [r for r in results if r["status"] != "skipped"]
+    stage_totals = {}
+    for r in ran:
+        for name, seconds in r["timings"].items():
+            stage_totals[name] = round(stage_totals.get(name, 0.0) + seconds, 3)
+    busy = sum(r["seconds"] for r in ran)
+    return {
+        "started_at": started_at,
+        "finished_at": time.time(),
+        "wall_seconds": round(wall, 3),
+        "workers": workers,
+        "totals": {status: sum(1 for r in results if r["status"] == status)
+                   for status in ("done", "failed", "skipped")},
+        "clips": sum(len(r["clips"]) for r in results),
+        # soma dos tempos dos jobs / tempo de parede: quanto as etapas de jobs diferentes se sobrepuseram
+        "overlap": round(busy / wall, 2) if wall > 0 else 0.0,
+        "videos_per_hour": round(sum(r["status"] == "done" for r in ran) * 3600 / wall, 2) if wall > 0 else 0.0,
+        "stage_seconds": stage_totals,
+        "items": results,
+    }
+
+def write_report(report: dict, path) -> Path:
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    return path
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Extrai highlights de vários vídeos (diretório ou manifesto CSV/JSON).")
+    parser.add_argument("source", help="Diretório de vídeos ou manifesto .csv/.json")
+    parser.add_argument("--output_dir", default="processed", help="Diretório dos jobs (processed/{job_id})")
+    parser.add_argument("--work_dir", default=None, help="Intermediários (áudio, SRT); padrão: <output_dir>/_batch")
+    parser.add_argument("--workers", type=int, default=0, help="Jobs simultâneos (padrão: BATCH_WORKERS ou JOB_WORKERS)")
+    parser.add_argument("--prompt", default="prompt_detect_highlight",
+                        help="Prompt padrão (nome em prompts/detect_highlight) para itens sem prompt")
+    parser.add_argument("--cut_mode", default=None, choices=["smart", "copy", "reencode"],
+                        help="Modo de corte padrão para itens sem cut_mode")
+    parser.add_argument("--recursive", action="store_true", help="Inclui subdiretórios (entrada em diretório)")
+    parser.add_argument("--force", action="store_true", help="Reprocessa jobs já concluídos")
+    parser.add_argument("--report", default=None, help="Relatório JSON (padrão: <output_dir>/batch_<data>.json)")
+    args = parser.parse_args()
+
+    items = load_items(args.source, recursive=args.recursive)
+    for item in items:
+        if not item.prompt and not item.prompt_path:
+            item.prompt = args.prompt
+        item.cut_mode = item.cut_mode or args.cut_mode
+    if not items:
+        raise SystemExit(f"Nenhum vídeo encontrado em {args.source}")
+
+    report = run_batch(items, args.output_dir, args.work_dir, args.workers, args.force)
+    report_path = args.report or Path(args.output_dir) / f"batch_{time.strftime('%Y%m%d_%H%M%S')}.json"
+    print(f"[batch] {report['totals']} em {report['wall_seconds']:.1f}s "
+          f"(sobreposição {report['overlap']}x) → {write_report(report, report_path)}")
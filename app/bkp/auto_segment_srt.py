@@ -1,8 +1,10 @@
 import os
 import sys
-import re
 import json
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # app/
+from transcript import load_srt
+
 MIN_LEN = float(os.getenv("MIN_LEN", 3))
 MAX_LEN = float(os.getenv("MAX_LEN", 30))
 
@@ -10,34 +12,7 @@ def parse_srt(srt_path):
     """
     Lê um arquivo SRT e retorna uma lista de tuplas: (start, end, texto)
     """
-    pattern = re.compile(r"(\d{2}):(\d{2}):(\d{2}),(\d{3})\s-->\s(\d{2}):(\d{2}):(\d{2}),(\d{3})")
-    blocks = []
-    with open(srt_path, "r", encoding="utf-8") as f:
-        lines = f.readlines()
-    idx, n = 0, len(lines)
-    while idx < n:
-        # Ignora número da legenda
-        while idx < n and not pattern.match(lines[idx]):
-            idx += 1
-        if idx >= n: break
-        # Tempo
-        match = pattern.match(lines[idx])
-        if not match:
-            idx += 1
-            continue
-        start = int(match.group(1)) * 3600 + int(match.group(2)) * 60 + int(match.group(3)) + int(match.group(4))/1000
-        end = int(match.group(5)) * 3600 + int(match.group(6)) * 60 + int(match.group(7)) + int(match.group(8))/1000
-        idx += 1
-        # Texto
-        text_lines = []
-        while idx < n and lines[idx].strip() and not pattern.match(lines[idx]):
-            text_lines.append(lines[idx].strip())
-            idx += 1
-        blocks.append((start, end, " ".join(text_lines)))
-        # Avança para o próximo bloco
-        while idx < n and not lines[idx].strip():
-            idx += 1
-    return blocks
+    return load_srt(srt_path).cues()
 
 def group_blocks(blocks, min_len, max_len):
     """
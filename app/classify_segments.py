@@ -1,64 +1,157 @@
 import os
 import sys
 import json
-import requests
 import re
+from concurrent.futures import ThreadPoolExecutor
+from http_session import get_session  # sessão keep-alive compartilhada
+import llm_cache
+import metrics
+import ollama_ready
+from transcript import load_srt, as_transcript
+from utils import env_flag
 
 def parse_srt(srt_path):
-    pattern = re.compile(r"(\d{2}):(\d{2}):(\d{2}),(\d{3})\s-->\s(\d{2}):(\d{2}):(\d{2}),(\d{3})")
-    blocks = []
-    with open(srt_path, "r", encoding="utf-8") as f:
-        lines = f.readlines()
-    idx, n = 0, len(lines)
-    while idx < n:
-        while idx < n and not pattern.match(lines[idx]):
-            idx += 1
-        if idx >= n: break
-        match = pattern.match(lines[idx])
-        if not match:
-            idx += 1
-            continue
-        start = int(match.group(1)) * 3600 + int(match.group(2)) * 60 + int(match.group(3)) + int(match.group(4))/1000
-        end = int(match.group(5)) * 3600 + int(match.group(6)) * 60 + int(match.group(7)) + int(match.group(8))/1000
-        idx += 1
-        text_lines = []
-        while idx < n and lines[idx].strip() and not pattern.match(lines[idx]):
-            text_lines.append(lines[idx].strip())
-            idx += 1
-        blocks.append((start, end, " ".join(text_lines)))
-        while idx < n and not lines[idx].strip():
-            idx += 1
-    return blocks
+    return load_srt(srt_path)
 
 def get_text_for_segment(blocks, seg_start, seg_end):
-    text = []
-    for start, end, content in blocks:
-        if end > seg_start and start < seg_end:
-            text.append(content)
-    return " ".join(text)
+    return as_transcript(blocks).text_between(seg_start, seg_end)
 
 def load_prompt_from_file(prompt_path):
     with open(prompt_path, "r", encoding="utf-8") as f:
         return f.read()
 
-def request_ollama(text, prompt_template):
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_PROMPT = os.path.join(BASE_DIR, "prompts", "classify", "prompt_classify.txt")
+DEFAULT_BATCH_PROMPT = os.path.join(BASE_DIR, "prompts", "classify", "prompt_classify_batch.txt")
+
+def classify_enabled() -> bool:
+    return env_flag("CLASSIFY_ENABLED")
+
+def classify_concurrency() -> int:
+    return max(1, int(os.getenv("CLASSIFY_CONCURRENCY", "4")))
+
+def classify_batch_size() -> int:
+    return max(1, int(os.getenv("CLASSIFY_BATCH_SIZE", "1")))
+
+def min_score() -> int:
+    return int(os.getenv("MIN_SCORE", 7))
+
+def request_ollama_prompt(prompt):
     OLLAMA_HOSTNAME = os.getenv("OLLAMA_HOSTNAME")
     OLLAMA_PORT = os.getenv("OLLAMA_PORT")
     OLLAMA_MODEL = os.getenv("OLLAMA_MODEL")
     OLLAMA_TIMEOUT = int(os.getenv("OLLAMA_TIMEOUT", "120"))
 
     url = f"http://{OLLAMA_HOSTNAME}:{OLLAMA_PORT}/api/generate"
-    prompt = prompt_template.replace("TRECHO_AQUI", text)
     payload = {
         "model": OLLAMA_MODEL,
         "stream": False,
         "prompt": prompt
     }
-    response = requests.post(url, json=payload, timeout=OLLAMA_TIMEOUT)
-    response.raise_for_status()
-    data = response.json()
-    result = data.get("response", "").strip()
-    return result
+    if ollama_ready.keep_alive() is not None:
+        payload["keep_alive"] = ollama_ready.keep_alive()
+
+    def generate():
+        with metrics.span("llm_generate", model=OLLAMA_MODEL, purpose="classify") as attrs:
+            response = get_session().post(url, json=payload, timeout=OLLAMA_TIMEOUT)
+            response.raise_for_status()
+            data = response.json()
+            metrics.record_llm(attrs, "ollama", data.get("prompt_eval_count"), data.get("eval_count"),
+                               load_seconds=ollama_ready.load_seconds(data))
+        return data.get("response", "").strip()
+
+    return llm_cache.cached_generate("ollama", OLLAMA_MODEL, {}, prompt, generate)
+
+def request_ollama(text, prompt_template):
+    return request_ollama_prompt(prompt_template.replace("TRECHO_AQUI", text))
+
+def parse_score(response) -> int:
+    try:
+        return int(re.findall(r'\d+', response)[0])
+    except Exception:
+        return 0
+
+def parse_batch_scores(response, expected: int):
+    """Lista de notas de uma resposta em lote; None se não vier um array com `expected` números."""
+    m = re.search(r'\[.*?\]', response or "", re.DOTALL)
+    if not m:
+        return None
+    try:
+        scores = [int(round(float(v))) for v in json.loads(m.group(0))]
+    except (ValueError, TypeError):
+        return None
+    return scores if len(scores) == expected else None
+
+def score_one(text, prompt_template) -> int:
+    return parse_score(request_ollama(text, prompt_template))
+
+def score_batch(texts, prompt_template, batch_template) -> list:
+    """Vários trechos num único prompt; se a resposta não bater, pontua um a um."""
+    numbered = "\n\n".join(f"Trecho {i}: {t}" for i, t in enumerate(texts, 1))
+    prompt = batch_template.replace("QUANTIDADE_AQUI", str(len(texts))).replace("TRECHOS_AQUI", numbered)
+    scores = parse_batch_scores(request_ollama_prompt(prompt), len(texts))
+    if scores is None:
+        print(f"[WARN] Resposta em lote inválida para {len(texts)} trechos; classificando individualmente.")
+        scores = [score_one(t, prompt_template) for t in texts]
+    return scores
+
+def score_texts(texts, prompt_template, batch_template=None) -> list:
+    """Notas de um grupo de trechos: em lote se houver `batch_template` e mais de um trecho."""
+    if batch_template and len(texts) > 1:
+        return score_batch(texts, prompt_template, batch_template)
+    return [score_one(t, prompt_template) for t in texts]
+
+def load_batch_template() -> str:
+    return load_prompt_from_file(os.getenv("CLASSIFY_BATCH_PROMPT_PATH", DEFAULT_BATCH_PROMPT))
+
+def classify_highlights(highlights, blocks, prompt_template=None, batch_size=None, concurrency=None):
+    """
+    Atribui `score` (0 a 10) a cada highlight com texto no SRT/cues `blocks`.
+    batch_size > 1 agrupa trechos num único prompt (CLASSIFY_BATCH_SIZE); os pedidos
+    (individuais ou em lote) rodam em paralelo na sessão compartilhada. Um pedido que
+    falha descarta só os cortes do seu grupo (como no pipeline em stream), sem derrubar o job.
+    Retorna (classificados, ignorados), na ordem de entrada.
+    """
+    prompt_template = prompt_template or load_prompt_from_file(os.getenv("CLASSIFY_PROMPT_PATH", DEFAULT_PROMPT))
+    batch_size = batch_size or classify_batch_size()
+    concurrency = concurrency or classify_concurrency()
+    blocks = as_transcript(blocks)
+
+    # o texto só serve para o prompt: não vai nos itens (highlight.json e manifesto do job)
+    items, texts, ignored = [], [], 0
+    for seg in highlights:
+        seg_start = float(seg["start"])
+        seg_end = float(seg["end"])
+        seg_text = get_text_for_segment(blocks, seg_start, seg_end)
+        if not seg_text.strip():
+            print(f"Ignorado corte {seg_start}-{seg_end}s (sem texto encontrado no SRT)")
+            ignored += 1
+            continue
+        seg = {k: v for k, v in seg.items() if k != "text"}
+        items.append({**seg, "start": seg_start, "end": seg_end})
+        texts.append(seg_text)
+
+    batch_template = load_batch_template() if batch_size > 1 else None
+    groups = [range(i, min(i + batch_size, len(items))) for i in range(0, len(items), batch_size)]
+
+    def work(group):
+        try:
+            return score_texts([texts[i] for i in group], prompt_template, batch_template)
+        except Exception as e:
+            print(f"[WARN] Falha ao classificar {len(group)} corte(s) ({e}); descartando-os.")
+            return [None] * len(group)
+
+    scored = []
+    with ThreadPoolExecutor(max_workers=min(concurrency, max(len(groups), 1))) as pool:
+        for group, scores in zip(groups, pool.map(metrics.carry_job(work), groups)):
+            for i, score in zip(group, scores):
+                if score is None:
+                    continue
+                it = items[i]
+                it["score"] = score
+                scored.append(it)
+                print(f"Corte {it['start']}-{it['end']}s: nota {score}")
+    return scored, ignored
 
 if __name__ == "__main__":
     if len(sys.argv) < 4:
@@ -74,28 +167,7 @@ if __name__ == "__main__":
     with open(highlight_path, "r", encoding="utf-8") as f:
         highlights = json.load(f)
 
-    result_highlights = []
-    ignored = 0
-    for seg in highlights:
-        seg_start = float(seg["start"])
-        seg_end = float(seg["end"])
-        seg_text = get_text_for_segment(blocks, seg_start, seg_end)
-        if not seg_text.strip():
-            print(f"Ignorado corte {seg_start}-{seg_end}s (sem texto encontrado no SRT)")
-            ignored += 1
-            continue
-        score = request_ollama(seg_text, prompt_template)
-        try:
-            score_num = int(re.findall(r'\d+', score)[0])
-        except Exception:
-            score_num = 0
-        result_highlights.append({
-            "start": seg_start,
-            "end": seg_end,
-            "score": score_num,
-            "text": seg_text
-        })
-        print(f"Corte {seg_start}-{seg_end}s: nota {score_num}")
+    result_highlights, ignored = classify_highlights(highlights, blocks, prompt_template)
 
     output_json = os.path.splitext(highlight_path)[0] + ".classified.json"
     with open(output_json, "w", encoding="utf-8") as f:
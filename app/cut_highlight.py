@@ -3,7 +3,39 @@ import os
 import json
 import argparse
 import shutil
+import time
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from moviepy.editor import VideoFileClip
+import metrics
+from utils import env_flag
+from ffmpeg_utils import (
+    run_ffmpeg, probe_duration, probe_video_stream, probe_keyframes, probe_has_audio,
+    keyframe_at_or_after, keyframe_at_or_before,
+)
+
+# Modos de corte:
+#   smart    → copia o bitstream; só re-encoda o trecho antes do 1º keyframe
+#   copy     → copia o bitstream a partir do keyframe anterior ao início (sem re-encode)
+#   reencode → caminho original (MoviePy + libx264 no clipe inteiro)
+CUT_MODES = ("smart", "copy", "reencode")
+
+# Planos de render:
+#   per_clip    → cada clipe é cortado de forma independente (seek + decode por clipe)
+#   single_pass → a origem é decodificada uma única vez em ordem de tempo e cada quadro
+#                 alimenta todas as janelas de highlight abertas (split + trim no ffmpeg)
+CUT_PLANS = ("per_clip", "single_pass")
+
+# Encoders usados no trecho re-encodado do modo smart, por codec de origem
+SMART_ENCODERS = {"h264": "libx264", "hevc": "libx265"}
+
+# Seek de cópia um pouco depois do keyframe: com 3 casas, n/30 s arredonda para baixo
+# (1.0333 → "1.033") e o ffmpeg com -c copy começa no keyframe anterior (GOP repetido)
+KEYFRAME_SEEK_EPSILON = 0.0005
+
+def keyframe_seek(key: float) -> str:
+    return f"{key + KEYFRAME_SEEK_EPSILON:.6f}"
 
 def try_update_status(job_id, message, percent, output_dir):
     if job_id and output_dir:
@@ -13,51 +45,447 @@ def try_update_status(job_id, message, percent, output_dir):
         except Exception as e:
             print(f"Erro ao atualizar status: {e}")
 
+def try_add_highlight_clip(job_id, clip_path, output_dir, meta=None):
+    if job_id and output_dir:
+        try:
+            from utils import add_highlight_clip
+            add_highlight_clip(job_id, clip_path, output_dir, meta)
+        except Exception as e:
+            print(f"Erro ao publicar clipe: {e}")
+
 def read_highlight_times(highlight_path):
     with open(highlight_path, "r", encoding="utf-8") as f:
         data = json.load(f)
     return data
 
-def cut_video_segments(video_path, highlights, job_id=None, output_dir=None):
-    base, ext = os.path.splitext(video_path)
-    clip_count = 0
-    video = VideoFileClip(video_path)
-    video_duration = video.duration
-    print(f"Duração do vídeo: {video_duration:.2f}s")
+def resolve_snap(timings, video_path):
+    """
+    Tempos de palavras usados para ajustar início/fim dos cortes (CUT_SNAP=words|off).
+    Sem `timings` explícito, procura o artefato .timings.bin ao lado do vídeo.
+    """
+    if os.getenv("CUT_SNAP", "words").strip().lower() in ("off", "0", "false", "no", "none"):
+        return None
+    if timings is None:
+        from transcript import load_timings_for
+        timings = load_timings_for(video_path)
+    return timings
+
+def resolve_scenes(video_path, video_hash=None, keyframes=None):
+    """
+    Índice de trocas de cena para alinhar os cortes a mudanças de plano (CUT_SCENE_SNAP).
+    Calculado uma vez por vídeo (cache em disco); sem NumPy ou com falha no decode, segue sem ele.
+    """
+    if not env_flag("CUT_SCENE_SNAP"):
+        return None
+    try:
+        from scene_index import get_scene_index
+        return get_scene_index(video_path, video_hash, keyframes)
+    except Exception as e:
+        print(f"[WARN] Índice de cenas indisponível ({e}); cortes sem alinhamento a trocas de cena.")
+        return None
+
+def resolve_cut_mode(mode=None) -> str:
+    mode = (mode or os.getenv("CUT_MODE", "smart")).strip().lower()
+    if mode not in CUT_MODES:
+        print(f"[WARN] Modo de corte inválido '{mode}', usando reencode.")
+        return "reencode"
+    return mode
+
+def resolve_cut_plan(plan=None) -> str:
+    plan = (plan or os.getenv("CUT_PLAN", "per_clip")).strip().lower()
+    if plan not in CUT_PLANS:
+        print(f"[WARN] Plano de corte inválido '{plan}', usando per_clip.")
+        return "per_clip"
+    return plan
+
+# --------------------------
+# Engines de corte
+# --------------------------
+def cut_reencode(video, start, end, output_path, threads=None):
+    subclip = video.subclip(start, end)
+    subclip.write_videofile(output_path, codec="libx264", threads=threads)
+
+def cut_stream_copy(video_path, start, end, output_path):
+    """Copia os pacotes sem re-encode. `start` deve estar num keyframe."""
+    run_ffmpeg([
+        "-ss", keyframe_seek(start), "-i", video_path, "-t", f"{end - start:.6f}",
+        "-map", "0:v:0", "-map", "0:a?", "-c", "copy",
+        "-avoid_negative_ts", "make_zero", "-movflags", "+faststart",
+        output_path,
+    ])
+
+def cut_smart(video_path, start, end, output_path, keyframes, stream_info, tolerance, threads=None):
+    """
+    Re-encoda apenas [start, 1º keyframe) e copia o restante do bitstream.
+    As duas partes são geradas em MPEG-TS (SPS/PPS in-band) e concatenadas sem re-encode.
+    Retorna o modo efetivamente usado.
+    """
+    on_key = keyframe_at_or_after(keyframes, start, tolerance)
+    if on_key is not None and abs(on_key - start) <= tolerance:
+        cut_stream_copy(video_path, on_key, end, output_path)
+        return "copy"
+
+    encoder = SMART_ENCODERS.get(stream_info.get("codec_name"))
+    next_key = keyframe_at_or_after(keyframes, start)
+    if encoder is None or next_key is None or next_key >= end - tolerance:
+        raise RuntimeError("corte sem keyframe aproveitável ou codec sem encoder compatível")
+
+    with tempfile.TemporaryDirectory(prefix="smartcut_", dir=os.path.dirname(os.path.abspath(output_path))) as tmp:
+        head = os.path.join(tmp, "head.ts")
+        tail = os.path.join(tmp, "tail.ts")
+        # Trecho inicial (até o keyframe): re-encode com os mesmos parâmetros básicos da origem
+        head_args = [
+            "-ss", f"{start:.3f}", "-i", video_path, "-t", f"{next_key - start:.6f}",
+            "-map", "0:v:0", "-map", "0:a?",
+            "-c:v", encoder, "-preset", os.getenv("CUT_SMART_PRESET", "veryfast"),
+            "-crf", os.getenv("CUT_SMART_CRF", "18"),
+        ]
+        if threads:
+            head_args += ["-threads", threads]
+        if stream_info.get("pix_fmt"):
+            head_args += ["-pix_fmt", stream_info["pix_fmt"]]
+        if stream_info.get("fps"):
+            head_args += ["-r", f"{stream_info['fps']:.6f}"]
+        head_args += ["-c:a", "aac", "-f", "mpegts", head]
+        run_ffmpeg(head_args)
+        # Restante: cópia do bitstream a partir do keyframe (áudio re-encodado, barato)
+        bsf = "h264_mp4toannexb" if stream_info.get("codec_name") == "h264" else "hevc_mp4toannexb"
+        run_ffmpeg([
+            "-ss", keyframe_seek(next_key), "-i", video_path, "-t", f"{end - next_key:.6f}",
+            "-map", "0:v:0", "-map", "0:a?",
+            "-c:v", "copy", "-bsf:v", bsf, "-c:a", "aac",
+            "-avoid_negative_ts", "make_zero", "-f", "mpegts", tail,
+        ])
+        run_ffmpeg([
+            "-i", f"concat:{head}|{tail}", "-c", "copy",
+            "-bsf:a", "aac_adtstoasc", "-movflags", "+faststart", output_path,
+        ])
+    return "smart"
+
+# --------------------------
+# Render de um clipe (roda no processo worker)
+# --------------------------
+# Cada processo worker mantém seu próprio VideoFileClip (readers não são compartilháveis)
+_VIDEO_CACHE = {}
+
+def _get_video(video_path):
+    video = _VIDEO_CACHE.get(video_path)
+    if video is None:
+        video = VideoFileClip(video_path)
+        _VIDEO_CACHE[video_path] = video
+    return video
+
+def _close_videos():
+    for video in _VIDEO_CACHE.values():
+        video.close()
+    _VIDEO_CACHE.clear()
+
+def render_clip(task: dict) -> dict:
+    """Renderiza um clipe descrito por `task`; retorna o task com `output_path` final e `mode` usado."""
+    video_path, idx = task["video_path"], task["idx"]
+    start, end, output_path = task["start"], task["end"], task["output_path"]
+    cut_mode, threads = task["cut_mode"], task.get("threads")
+    print(f"Cortando de {start:.2f}s a {end:.2f}s -> {output_path}")
+    used_mode = "reencode"
+    started = time.perf_counter()
+    try:
+        if cut_mode == "smart":
+            used_mode = cut_smart(video_path, start, end, output_path, task["keyframes"],
+                                  task["stream_info"], task["tolerance"], threads)
+        elif cut_mode == "copy":
+            key = keyframe_at_or_before(task["keyframes"], start, task["tolerance"])
+            if key is None:
+                raise RuntimeError("nenhum keyframe antes do início do corte")
+            cut_stream_copy(video_path, key, end, output_path)
+            used_mode = "copy"
+        else:
+            cut_reencode(_get_video(video_path), start, end, output_path, threads)
+    except Exception as e:
+        if cut_mode == "reencode":
+            raise
+        print(f"[WARN] Corte {idx} em modo {cut_mode} falhou ({e}); usando reencode.")
+        cut_reencode(_get_video(video_path), start, end, output_path, threads)
+    encode_seconds = time.perf_counter() - started
+    print(f"Vídeo salvo em {output_path} (modo {used_mode})")
+    output_path = _move_to_output_dir(output_path, task.get("output_dir"))
+    return {**task, "output_path": output_path, "mode": used_mode, "encode_seconds": encode_seconds}
+
+def _move_to_output_dir(output_path, output_dir):
+    """Move o highlight já para processed/output_dir se fornecido."""
+    if output_dir:
+        dest = os.path.join(output_dir, os.path.basename(output_path))
+        if os.path.abspath(output_path) != os.path.abspath(dest):
+            try:
+                shutil.move(output_path, dest)
+                print(f"Highlight movido: {output_path} -> {dest}")
+                return dest
+            except Exception as e:
+                print(f"Erro ao mover highlight {output_path}: {e}")
+    return output_path
+
+def render_pass(tasks: list) -> list:
+    """
+    Renderiza vários clipes com um único decode da origem.
+
+    O trecho [menor start, maior end] é decodificado uma vez; cada quadro passa por
+    split/trim e só é encaminhado aos encoders das janelas que o contêm (janelas
+    sobrepostas compartilham o mesmo quadro decodificado). Quadros fora de qualquer
+    janela são descartados pelo trim, então nada fica em buffer além do que as
+    janelas abertas consomem.
+    """
+    tasks = sorted(tasks, key=lambda t: t["start"])
+    video_path, threads = tasks[0]["video_path"], tasks[0].get("threads")
+    pass_start = min(t["start"] for t in tasks)
+    pass_end = max(t["end"] for t in tasks)
+    has_audio = tasks[0].get("has_audio", True)
+    n = len(tasks)
+
+    graph = ["[0:v]split=%d%s" % (n, "".join(f"[v{i}]" for i in range(n)))]
+    if has_audio:
+        graph.append("[0:a]asplit=%d%s" % (n, "".join(f"[a{i}]" for i in range(n))))
+    for i, t in enumerate(tasks):
+        s, e = t["start"] - pass_start, t["end"] - pass_start
+        graph.append(f"[v{i}]trim=start={s:.3f}:end={e:.3f},setpts=PTS-STARTPTS[ov{i}]")
+        if has_audio:
+            graph.append(f"[a{i}]atrim=start={s:.3f}:end={e:.3f},asetpts=PTS-STARTPTS[oa{i}]")
 
-    total = len(highlights)
-    for idx, seg in enumerate(highlights, 1):
+    args = ["-ss", f"{pass_start:.3f}", "-t", f"{pass_end - pass_start:.3f}", "-i", video_path,
+            "-filter_complex", ";".join(graph)]
+    for i, t in enumerate(tasks):
+        args += ["-map", f"[ov{i}]"]
+        if has_audio:
+            args += ["-map", f"[oa{i}]", "-c:a", "aac"]
+        args += ["-c:v", "libx264", "-preset", os.getenv("CUT_SINGLE_PASS_PRESET", "veryfast")]
+        if threads:
+            args += ["-threads", threads]
+        args += ["-movflags", "+faststart", t["output_path"]]
+
+    print(f"Render em passada única: {n} clipes em [{pass_start:.2f}s, {pass_end:.2f}s]")
+    started = time.perf_counter()
+    try:
+        run_ffmpeg(args)
+    except Exception as e:
+        print(f"[WARN] Passada única falhou ({e}); cortando clipe a clipe.")
+        return [render_clip(t) for t in tasks]
+
+    # um decode para todos: o tempo da passada é dividido entre os clipes
+    encode_seconds = (time.perf_counter() - started) / n
+    results = []
+    for t in tasks:
+        print(f"Vídeo salvo em {t['output_path']} (passada única)")
+        output_path = _move_to_output_dir(t["output_path"], t.get("output_dir"))
+        results.append({**t, "output_path": output_path, "mode": "single_pass", "encode_seconds": encode_seconds})
+    return results
+
+def _render_unit(unit):
+    """Unidade de trabalho do pool: um clipe (per_clip) ou um grupo de clipes (single_pass)."""
+    if isinstance(unit, list):
+        return render_pass(unit)
+    return [render_clip(unit)]
+
+def _unit_ids(unit):
+    return [t["idx"] for t in unit] if isinstance(unit, list) else [unit["idx"]]
+
+def group_single_pass(tasks, max_outputs):
+    """Agrupa os clipes em ordem de início; cada grupo vira uma passada com até max_outputs saídas."""
+    ordered = sorted(tasks, key=lambda t: t["start"])
+    if max_outputs <= 0:
+        return [ordered] if ordered else []
+    return [ordered[i:i + max_outputs] for i in range(0, len(ordered), max_outputs)]
+
+def _init_worker():
+    # registrado em cada worker para liberar os readers do MoviePy
+    import atexit
+    atexit.register(_close_videos)
+
+def resolve_workers(workers=None, threads=None):
+    """Número de processos de render e threads do encoder por processo."""
+    cpus = os.cpu_count() or 1
+    workers = int(workers or os.getenv("CUT_WORKERS", "0") or 0) or min(4, cpus)
+    threads = int(threads or os.getenv("CUT_THREADS_PER_WORKER", "0") or 0) or max(1, cpus // workers)
+    return max(1, workers), max(1, threads)
+
+# --------------------------
+# Orquestração dos cortes
+# --------------------------
+class ClipRenderer:
+    """
+    Renderiza highlights à medida que chegam (`submit`) ou em lote.
+
+    A numeração (_highlight{idx}) segue a ordem de submissão e é fixada antes do
+    render, sem depender da ordem de término. Com `background=True` (ou mais de um
+    worker) os clipes rodam num pool de processos e `submit` não bloqueia — usado
+    para cortar enquanto o LLM ainda está gerando os próximos highlights.
+    """
+    def __init__(self, video_path, job_id=None, output_dir=None, cut_mode=None,
+                 workers=None, threads=None, plan=None, background=False, timings=None,
+                 video_hash=None):
+        self.video_path = video_path
+        self.job_id, self.output_dir = job_id, output_dir
+        self.base, self.ext = os.path.splitext(video_path)
+        self.cut_mode = resolve_cut_mode(cut_mode)
+        self.plan = resolve_cut_plan(plan)
+        self.workers, self.threads = resolve_workers(workers, threads)
+        print(f"Modo de corte: {self.cut_mode} | plano: {self.plan} | workers: {self.workers} | threads/worker: {self.threads}")
+
+        self.keyframes, self.stream_info, self.has_audio = [], {}, True
+        if self.cut_mode != "reencode" or self.plan == "single_pass":
+            try:
+                self.video_duration = probe_duration(video_path)
+                self.stream_info = probe_video_stream(video_path)
+                self.has_audio = probe_has_audio(video_path)
+                if self.cut_mode != "reencode":
+                    self.keyframes = probe_keyframes(video_path)
+                    print(f"{len(self.keyframes)} keyframes encontrados ({self.stream_info.get('codec_name')})")
+            except Exception as e:
+                print(f"[WARN] Falha ao inspecionar o vídeo com ffprobe ({e}); usando reencode por clipe.")
+                self.cut_mode, self.plan = "reencode", "per_clip"
+        if not self.stream_info:
+            self.video_duration = _get_video(video_path).duration
+            _close_videos()  # cada worker abre o seu
+        print(f"Duração do vídeo: {self.video_duration:.2f}s")
+
+        # tolerância para considerar um corte "em cima" do keyframe: ~1 frame
+        fps = self.stream_info.get("fps") or 30.0
+        self.tolerance = float(os.getenv("CUT_KEYFRAME_TOLERANCE", f"{1.0 / fps:.4f}"))
+
+        # ajuste dos cortes em fronteiras de palavra/pausa (lookup em memória, sem tocar na mídia)
+        self.timings = resolve_snap(timings, video_path)
+        self.snap_max_shift = float(os.getenv("CUT_SNAP_MAX_SHIFT", "1.0"))
+        self.snap_pad = float(os.getenv("CUT_SNAP_PAD", "0.15"))
+        # e a trocas de cena próximas (preferindo as que caem em keyframe, que o corte smart copia sem reencode)
+        self.scenes = resolve_scenes(video_path, video_hash, self.keyframes)
+        self.scene_max_shift = float(os.getenv("CUT_SCENE_MAX_SHIFT", "0.5"))
+
+        self._next_idx = 1
+        self._pending = []     # tasks ainda não enviadas (plano single_pass / modo em lote)
+        self._futures = {}
+        self._results = []
+        self._submitted = 0
+        self._lock = threading.Lock()
+        self._pool = None
+        if (background or self.workers > 1) and self.plan == "per_clip":
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker)
+
+    def make_task(self, idx, seg):
         start = float(seg["start"])
         end = float(seg["end"])
-        if start >= video_duration:
+        if self.timings is not None:
+            snapped = self.timings.snap(start, end, self.snap_max_shift, self.snap_pad)
+            if snapped != (start, end):
+                print(f"Corte {idx} ajustado às palavras: {start:.2f}-{end:.2f}s -> {snapped[0]:.2f}-{snapped[1]:.2f}s")
+                start, end = snapped
+        if self.scenes is not None:
+            snapped = self.scenes.snap(start, end, self.scene_max_shift)
+            if snapped != (start, end):
+                print(f"Corte {idx} alinhado às trocas de cena: {start:.2f}-{end:.2f}s -> {snapped[0]:.2f}-{snapped[1]:.2f}s")
+                start, end = snapped
+        if start >= self.video_duration:
             print(f"IGNORADO: Corte {idx} começa em {start:.2f}s (fora do vídeo)")
-            continue
-        if end > video_duration:
-            print(f"AVISO: Corte {idx} fim ajustado de {end:.2f}s para {video_duration:.2f}s (fim do vídeo)")
-            end = video_duration
+            return None
+        if end > self.video_duration:
+            print(f"AVISO: Corte {idx} fim ajustado de {end:.2f}s para {self.video_duration:.2f}s (fim do vídeo)")
+            end = self.video_duration
         if start >= end:
             print(f"IGNORADO: Corte {idx} start >= end ({start:.2f}s >= {end:.2f}s)")
-            continue
-        output_path = f"{base}_highlight{idx}{ext}"
-        progress = 80 + int((idx-1)/total * 15)  # 80 a 95%
-        try_update_status(job_id, f"Cortando vídeo ({idx}/{total})...", progress, output_dir)
-        print(f"Cortando de {start:.2f}s a {end:.2f}s -> {output_path}")
-        subclip = video.subclip(start, end)
-        subclip.write_videofile(output_path, codec="libx264")
-        print(f"Vídeo salvo em {output_path}")
-        clip_count += 1
-
-        # NOVO BLOCO: move highlight já para processed/output_dir se fornecido
-        if output_dir:
-            dest = os.path.join(output_dir, os.path.basename(output_path))
-            if os.path.abspath(output_path) != os.path.abspath(dest):
+            return None
+        return {
+            "idx": idx, "video_path": self.video_path, "start": start, "end": end,
+            "output_path": f"{self.base}_highlight{idx}{self.ext}", "output_dir": self.output_dir,
+            "cut_mode": self.cut_mode, "threads": self.threads, "keyframes": self.keyframes,
+            "stream_info": self.stream_info, "tolerance": self.tolerance, "has_audio": self.has_audio,
+            "score": seg.get("score"),
+        }
+
+    def submit(self, seg):
+        """Registra um highlight; no modo per_clip com pool o render começa imediatamente."""
+        idx = self._next_idx
+        self._next_idx += 1
+        task = self.make_task(idx, seg)
+        if task is None:
+            return
+        self._submitted += 1
+        if self._pool is not None:
+            future = self._pool.submit(_render_unit, task)
+            self._futures[future] = task
+            future.add_done_callback(self._on_future_done)
+        else:
+            self._pending.append(task)
+
+    def _on_future_done(self, future):
+        try:
+            results = future.result()
+        except Exception as e:
+            print(f"Erro ao cortar highlight(s) {_unit_ids(self._futures[future])}: {e}")
+            results = []
+        self._record(results)
+
+    def _record(self, results):
+        with self._lock:
+            self._results.extend(results)
+            done, total = len(self._results), self._submitted
+        progress = 80 + int(done / max(total, 1) * 15)  # 80 a 95%
+        for r in results:
+            meta = {k: r.get(k) for k in ("idx", "start", "end", "score", "mode")}
+            self._record_metrics(r)
+            try_add_highlight_clip(self.job_id, r["output_path"], self.output_dir, meta)
+        try_update_status(self.job_id, f"Cortando vídeo ({done}/{total})...", progress, self.output_dir)
+
+    def _record_metrics(self, r):
+        """Tempo de render e tamanho do clipe (o render roda no pool; o registro fica no processo do job)."""
+        try:
+            size = os.path.getsize(r["output_path"])
+        except OSError:
+            size = 0
+        seconds = r.get("encode_seconds") or 0.0
+        metrics.observe("clip_encode_seconds", seconds, mode=r["mode"])
+        metrics.observe("clip_output_bytes", size, mode=r["mode"])
+        metrics.record_span("clip_encode", seconds, job_id=self.job_id, mode=r["mode"], idx=r["idx"],
+                            clip_seconds=round(r["end"] - r["start"], 3), bytes=size)
+
+    def finish(self) -> list:
+        """Renderiza o que estiver pendente, espera o pool e retorna os caminhos em ordem de idx."""
+        try_update_status(self.job_id, f"Cortando vídeo ({len(self._results)}/{self._submitted})...", 80, self.output_dir)
+        if self.plan == "single_pass":
+            units = group_single_pass(self._pending, int(os.getenv("CUT_SINGLE_PASS_MAX_OUTPUTS", "8")))
+        else:
+            units = self._pending
+        self._pending = []
+
+        if self._pool is None and self.workers > 1 and len(units) > 1:
+            with ProcessPoolExecutor(max_workers=min(self.workers, len(units)), initializer=_init_worker) as pool:
+                futures = {pool.submit(_render_unit, unit): unit for unit in units}
+                for future in as_completed(futures):
+                    try:
+                        self._record(future.result())
+                    except Exception as e:
+                        print(f"Erro ao cortar highlight(s) {_unit_ids(futures[future])}: {e}")
+                        self._record([])
+        else:
+            for unit in units:
                 try:
-                    shutil.move(output_path, dest)
-                    print(f"Highlight movido: {output_path} -> {dest}")
+                    self._record(_render_unit(unit))
                 except Exception as e:
-                    print(f"Erro ao mover highlight {output_path}: {e}")
+                    print(f"Erro ao cortar highlight(s) {_unit_ids(unit)}: {e}")
+                    self._record([])
+            _close_videos()
+
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+
+        results = sorted(self._results, key=lambda r: r["idx"])
+        print(f"{len(results)} clipes gerados com sucesso.")
+        return [r["output_path"] for r in results]
 
-    print(f"{clip_count} clipes gerados com sucesso.")
+def cut_video_segments(video_path, highlights, job_id=None, output_dir=None, cut_mode=None,
+                       workers=None, threads=None, plan=None, timings=None, video_hash=None):
+    renderer = ClipRenderer(video_path, job_id, output_dir, cut_mode=cut_mode,
+                            workers=workers, threads=threads, plan=plan, timings=timings,
+                            video_hash=video_hash)
+    for seg in highlights:
+        renderer.submit(seg)
+    return renderer.finish()
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Corta os highlights de um vídeo.")
@@ -65,7 +493,16 @@ if __name__ == "__main__":
     parser.add_argument("highlight_path", help="Arquivo .json com os highlights")
     parser.add_argument("--job_id", default=None, help="Identificador do job (opcional)")
     parser.add_argument("--output_dir", default=None, help="Diretório dos status (opcional)")
+    parser.add_argument("--cut_mode", default=None, choices=CUT_MODES,
+                        help="Modo de corte: smart | copy | reencode (padrão: ENV CUT_MODE ou smart)")
+    parser.add_argument("--plan", default=None, choices=CUT_PLANS,
+                        help="Plano de render: per_clip | single_pass (padrão: ENV CUT_PLAN ou per_clip)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Processos de render em paralelo (padrão: ENV CUT_WORKERS ou min(4, CPUs))")
+    parser.add_argument("--threads", type=int, default=None,
+                        help="Threads do encoder por worker (padrão: ENV CUT_THREADS_PER_WORKER ou CPUs/workers)")
 
     args = parser.parse_args()
     highlights = read_highlight_times(args.highlight_path)
-    cut_video_segments(args.video_path, highlights, args.job_id, args.output_dir)
+    cut_video_segments(args.video_path, highlights, args.job_id, args.output_dir, cut_mode=args.cut_mode,
+                       workers=args.workers, threads=args.threads, plan=args.plan)
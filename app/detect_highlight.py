@@ -1,12 +1,18 @@
 import os
 import sys
 import logging
-import requests
 import re
 import json
 import time
 import argparse
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional
+import llm_cache
+import metrics
+import ollama_ready
+from http_session import get_session
+from transcript import load_srt
+from utils import env_flag
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -14,45 +20,40 @@ logger = logging.getLogger(__name__)
 # --------------------------
 # Utilidades
 # --------------------------
-def env_flag(name: str, default: str = "false") -> bool:
-    return os.getenv(name, default).strip().lower() in ("1", "true", "yes", "y", "on")
+
+def prescore_mode() -> str:
+    """DETECT_PRESCORE: off | focus (só as regiões candidatas do áudio) | annotate."""
+    mode = os.getenv("DETECT_PRESCORE", "off").strip().lower()
+    return mode if mode in ("off", "focus", "annotate") else "off"
 
 # --------------------------
 # Utilidades de transcrição
 # --------------------------
 def read_srt_transcription(srt_path: str) -> str:
-    transcription = []
-    with open(srt_path, "r", encoding="utf-8") as f:
-        for line in f:
-            if re.match(r"^\d+$", line.strip()) or "-->" in line:
-                continue
-            text = line.strip()
-            if text:
-                transcription.append(text)
-    return " ".join(transcription)
+    return load_srt(srt_path).text
 
 def get_audio_duration_from_srt(srt_path: str) -> float:
-    end_time = 0.0
-    pattern = r"(\d{2}):(\d{2}):(\d{2}),(\d{3})\s-->\s(\d{2}):(\d{2}):(\d{2}),(\d{3})"
-    with open(srt_path, "r", encoding="utf-8") as f:
-        lines = f.readlines()
-    for line in reversed(lines):
-        match = re.search(pattern, line)
-        if match:
-            hours = int(match.group(5))
-            minutes = int(match.group(6))
-            seconds = int(match.group(7))
-            millis = int(match.group(8))
-            end_time = hours * 3600 + minutes * 60 + seconds + millis / 1000.0
-            break
-    return end_time
+    return load_srt(srt_path).duration
+
+def read_srt_cues(srt_path: str) -> list:
+    """Lê o SRT como lista de (start, end, texto)."""
+    return load_srt(srt_path).cues()
 
 # --------------------------
 # Prompt helpers
 # --------------------------
+_PROMPT_CACHE = {}  # caminho -> (mtime, tamanho, texto)
+
 def load_prompt_from_file(prompt_path: str) -> str:
+    """Texto do prompt; relido só quando o arquivo muda (jobs em lote compartilham a leitura)."""
+    st = os.stat(prompt_path)
+    cached = _PROMPT_CACHE.get(prompt_path)
+    if cached and cached[:2] == (st.st_mtime_ns, st.st_size):
+        return cached[2]
     with open(prompt_path, "r", encoding="utf-8") as f:
-        return f.read()
+        text = f.read()
+    _PROMPT_CACHE[prompt_path] = (st.st_mtime_ns, st.st_size, text)
+    return text
 
 def resolve_prompt_text(prompt_path: Optional[str], prompt_inline: Optional[str]) -> str:
     """
@@ -85,38 +86,11 @@ def generate_prompt(prompt_template: str, transcription_text: str, audio_duratio
 # Ollama (padrão atual)
 # --------------------------
 def ensure_ollama_model() -> bool:
-    OLLAMA_HOSTNAME = os.getenv("OLLAMA_HOSTNAME")
-    OLLAMA_PORT = os.getenv("OLLAMA_PORT")
-    OLLAMA_MODEL = os.getenv("OLLAMA_MODEL")
-    url_tags = f"http://{OLLAMA_HOSTNAME}:{OLLAMA_PORT}/api/tags"
-    url_pull = f"http://{OLLAMA_HOSTNAME}:{OLLAMA_PORT}/api/pull"
-    try:
-        logger.info(f"Verificando se modelo '{OLLAMA_MODEL}' já está disponível no Ollama...")
-        response = requests.get(url_tags, timeout=60)
-        response.raise_for_status()
-        tags = response.json().get("models", [])
-        if any(model.get("name") == OLLAMA_MODEL for model in tags):
-            logger.info(f"Modelo '{OLLAMA_MODEL}' já está disponível!")
-            return True
-        logger.info(f"Modelo '{OLLAMA_MODEL}' não encontrado, tentando baixar automaticamente...")
-        pull_payload = {"name": OLLAMA_MODEL}
-        pull_resp = requests.post(url_pull, json=pull_payload, timeout=600)
-        pull_resp.raise_for_status()
-        logger.info(f"Download do modelo '{OLLAMA_MODEL}' iniciado. Aguardando concluir...")
-        for _ in range(60):
-            response = requests.get(url_tags, timeout=60)
-            tags = response.json().get("models", [])
-            if any(model.get("name") == OLLAMA_MODEL for model in tags):
-                logger.info(f"Modelo '{OLLAMA_MODEL}' agora está disponível!")
-                return True
-            time.sleep(5)
-        logger.error(f"Não foi possível baixar o modelo '{OLLAMA_MODEL}' em tempo hábil.")
-        return False
-    except Exception as e:
-        logger.error(f"Erro ao checar/baixar modelo '{OLLAMA_MODEL}': {e}")
-        return False
+    """Modelo disponível no Ollama (checagem em cache por OLLAMA_READY_TTL; ver ollama_ready.py)."""
+    return ollama_ready.ensure_model()
 
-def request_ollama(prompt: str) -> str:
+def ollama_request_parts(prompt: str, stream: bool = False) -> dict:
+    """URL, payload e timeout de uma geração no Ollama (com as opções do ENV)."""
     OLLAMA_HOSTNAME = os.getenv("OLLAMA_HOSTNAME")
     OLLAMA_PORT = os.getenv("OLLAMA_PORT")
     OLLAMA_MODEL = os.getenv("OLLAMA_MODEL")
@@ -134,31 +108,65 @@ def request_ollama(prompt: str) -> str:
     url = f"http://{OLLAMA_HOSTNAME}:{OLLAMA_PORT}/api/generate"
     payload = {
         "model": OLLAMA_MODEL,
-        "stream": False,
+        "stream": stream,
         "options": options,
         "prompt": prompt
     }
-    logger.info(f"Enviando prompt para {url} (Ollama)...")
-    response = requests.post(url, json=payload, timeout=OLLAMA_TIMEOUT)
-    response.raise_for_status()
-    data = response.json()
-    result = data.get("response", "").strip()
+    if ollama_ready.keep_alive() is not None:
+        payload["keep_alive"] = ollama_ready.keep_alive()  # mantém os pesos na memória entre jobs
+    return {"url": url, "payload": payload, "model": OLLAMA_MODEL, "options": options, "timeout": OLLAMA_TIMEOUT}
+
+def request_ollama(prompt: str) -> str:
+    parts = ollama_request_parts(prompt)
+    url, payload, OLLAMA_TIMEOUT = parts["url"], parts["payload"], parts["timeout"]
+
+    def generate():
+        logger.info(f"Enviando prompt para {url} (Ollama)...")
+        with metrics.span("llm_generate", model=parts["model"]) as attrs:
+            response = get_session().post(url, json=payload, timeout=OLLAMA_TIMEOUT)
+            if response.status_code == 404:
+                ollama_ready.invalidate()  # modelo sumiu do servidor: a próxima detecção checa/baixa de novo
+            response.raise_for_status()
+            data = response.json()
+            metrics.record_llm(attrs, "ollama", data.get("prompt_eval_count"), data.get("eval_count"),
+                               load_seconds=ollama_ready.load_seconds(data))
+        return data.get("response", "").strip()
+
+    result = llm_cache.cached_generate("ollama", parts["model"], parts["options"], prompt, generate)
     logger.info(f"Resposta do Ollama: {result[:500]}{'...' if len(result) > 500 else ''}")
     return result
 
+def request_ollama_stream(prompt: str):
+    """Gera os pedaços de texto da resposta do Ollama à medida que chegam (stream=true)."""
+    parts = ollama_request_parts(prompt, stream=True)
+
+    def stream():
+        logger.info(f"Enviando prompt para {parts['url']} (Ollama, stream)...")
+        with metrics.span("llm_generate", model=parts["model"], stream=True) as attrs, \
+                get_session().post(parts["url"], json=parts["payload"], timeout=parts["timeout"], stream=True) as response:
+            if response.status_code == 404:
+                ollama_ready.invalidate()
+            response.raise_for_status()
+            started, first = time.perf_counter(), None
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                data = json.loads(line)
+                if data.get("response"):
+                    if first is None:
+                        first = time.perf_counter() - started
+                    yield data["response"]
+                if data.get("done"):
+                    metrics.record_llm(attrs, "ollama", data.get("prompt_eval_count"), data.get("eval_count"), first,
+                                       load_seconds=ollama_ready.load_seconds(data))
+                    break
+
+    yield from llm_cache.cached_stream("ollama", parts["model"], parts["options"], prompt, stream)
+
 # --------------------------
 # ChatGPT API (alternativa)
 # --------------------------
-def request_chatgpt(prompt: str) -> str:
-    """
-    Faz chamada à API de Chat Completions compatível com OpenAI.
-    Variáveis de ambiente necessárias:
-      - OPENAI_API_KEY (obrigatória)
-      - CHATGPT_MODEL (ex.: 'gpt-4o-mini' | 'gpt-4o')
-      - OPENAI_BASE_URL (opcional; padrão https://api.openai.com/v1)
-      - CHATGPT_TEMPERATURE (opcional; padrão 0.2)
-      - CHATGPT_TIMEOUT (opcional; padrão 240s)
-    """
+def chatgpt_request_parts(prompt: str, stream: bool = False) -> dict:
     api_key = os.getenv("OPENAI_API_KEY")
     if not api_key:
         raise RuntimeError("OPENAI_API_KEY não definido. Defina-o para usar USE_CHATGPT=true.")
@@ -192,31 +200,86 @@ def request_chatgpt(prompt: str) -> str:
         "temperature": temperature,
         "response_format": {"type": "json_object"}  # ajuda a evitar texto solto; pode retornar dict
     }
+    if stream:
+        payload["stream"] = True
+    return {
+        "endpoint": endpoint, "headers": headers, "payload": payload, "model": model, "timeout": timeout,
+        # prompt renderizado = mensagens completas (system + user)
+        "options": {"temperature": temperature, "response_format": payload["response_format"]},
+        "cache_prompt": json.dumps(messages, ensure_ascii=False),
+    }
 
-    logger.info(f"Enviando prompt para {endpoint} (ChatGPT: {model})...")
-    resp = requests.post(endpoint, headers=headers, json=payload, timeout=timeout)
-    try:
-        resp.raise_for_status()
-    except Exception as e:
-        logger.error(f"Erro HTTP ChatGPT: {resp.status_code} - {resp.text}")
-        raise e
-
-    data = resp.json()
-    # Pode voltar um objeto JSON por conta do response_format. Vamos extrair texto com fallback.
-    try:
-        content = data["choices"][0]["message"]["content"]
-        # content pode ser JSON (string JSON) ou um objeto serializado pelo servidor
-        if isinstance(content, dict):
-            result = json.dumps(content, ensure_ascii=False)
-        else:
-            result = str(content)
-    except Exception:
-        # fallback para formatos alternativos
-        result = json.dumps(data, ensure_ascii=False)
+def request_chatgpt(prompt: str) -> str:
+    """
+    Faz chamada à API de Chat Completions compatível com OpenAI.
+    Variáveis de ambiente necessárias:
+      - OPENAI_API_KEY (obrigatória)
+      - CHATGPT_MODEL (ex.: 'gpt-4o-mini' | 'gpt-4o')
+      - OPENAI_BASE_URL (opcional; padrão https://api.openai.com/v1)
+      - CHATGPT_TEMPERATURE (opcional; padrão 0.2)
+      - CHATGPT_TIMEOUT (opcional; padrão 240s)
+    """
+    parts = chatgpt_request_parts(prompt)
+    endpoint, headers, payload = parts["endpoint"], parts["headers"], parts["payload"]
+    model, timeout = parts["model"], parts["timeout"]
+
+    def generate():
+        logger.info(f"Enviando prompt para {endpoint} (ChatGPT: {model})...")
+        with metrics.span("llm_generate", model=model) as attrs:
+            resp = get_session().post(endpoint, headers=headers, json=payload, timeout=timeout)
+            try:
+                resp.raise_for_status()
+            except Exception as e:
+                logger.error(f"Erro HTTP ChatGPT: {resp.status_code} - {resp.text}")
+                raise e
+            data = resp.json()
+            usage = data.get("usage") or {}
+            metrics.record_llm(attrs, "chatgpt", usage.get("prompt_tokens"), usage.get("completion_tokens"))
+        # Pode voltar um objeto JSON por conta do response_format. Vamos extrair texto com fallback.
+        try:
+            content = data["choices"][0]["message"]["content"]
+            # content pode ser JSON (string JSON) ou um objeto serializado pelo servidor
+            if isinstance(content, dict):
+                return json.dumps(content, ensure_ascii=False)
+            return str(content)
+        except Exception:
+            # fallback para formatos alternativos
+            return json.dumps(data, ensure_ascii=False)
+
+    result = llm_cache.cached_generate("chatgpt", model, parts["options"], parts["cache_prompt"], generate)
 
     logger.info(f"Resposta do ChatGPT: {result[:500]}{'...' if len(result) > 500 else ''}")
     return result.strip()
 
+def request_chatgpt_stream(prompt: str):
+    """Gera os pedaços de texto da resposta (Server-Sent Events da API compatível com OpenAI)."""
+    parts = chatgpt_request_parts(prompt, stream=True)
+
+    def stream():
+        logger.info(f"Enviando prompt para {parts['endpoint']} (ChatGPT: {parts['model']}, stream)...")
+        # o stream não traz `usage`: tokens estimados pelo tamanho do texto
+        with metrics.span("llm_generate", model=parts["model"], stream=True, estimated_tokens=True) as attrs, \
+                get_session().post(parts["endpoint"], headers=parts["headers"], json=parts["payload"],
+                              timeout=parts["timeout"], stream=True) as resp:
+            resp.raise_for_status()
+            started, first, output = time.perf_counter(), None, []
+            for line in resp.iter_lines(decode_unicode=True):
+                if not line or not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    break
+                delta = json.loads(data)["choices"][0].get("delta", {})
+                if delta.get("content"):
+                    if first is None:
+                        first = time.perf_counter() - started
+                    output.append(delta["content"])
+                    yield delta["content"]
+            metrics.record_llm(attrs, "chatgpt", estimate_tokens(parts["cache_prompt"]),
+                               estimate_tokens("".join(output)), first)
+
+    yield from llm_cache.cached_stream("chatgpt", parts["model"], parts["options"], parts["cache_prompt"], stream)
+
 # --------------------------
 # Parsing do retorno
 # --------------------------
@@ -247,6 +310,325 @@ def extract_json_list(text: str):
         raise ValueError("Formato inválido: esperado array JSON de objetos {start, end}.")
     return obj
 
+class HighlightStreamParser:
+    """
+    Parser incremental: recebe pedaços do texto gerado e devolve cada objeto
+    {start, end} assim que ele fecha, sem esperar o array completo.
+    Aceita tanto `[{...}, ...]` quanto `{"clips": [{...}]}`.
+    """
+    def __init__(self):
+        self.buffer = ""
+        self.pos = 0
+        self.starts = []        # posições dos "{" abertos
+        self.in_string = False
+        self.escape = False
+
+    def feed(self, chunk: str) -> list:
+        self.buffer += chunk
+        found = []
+        while self.pos < len(self.buffer):
+            ch = self.buffer[self.pos]
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif ch == "\\":
+                    self.escape = True
+                elif ch == '"':
+                    self.in_string = False
+            elif ch == '"':
+                self.in_string = True
+            elif ch == "{":
+                self.starts.append(self.pos)
+            elif ch == "}" and self.starts:
+                begin = self.starts.pop()
+                try:
+                    obj = json.loads(self.buffer[begin:self.pos + 1])
+                except ValueError:
+                    obj = None
+                if isinstance(obj, dict) and "start" in obj and "end" in obj:
+                    found.append(obj)
+            self.pos += 1
+        return found
+
+# --------------------------
+# API (usada pelo pipeline em processo)
+# --------------------------
+def request_model(prompt: str, check_ready: bool = True) -> str:
+    """Envia o prompt ao backend configurado (USE_CHATGPT) e retorna o texto bruto."""
+    if env_flag("USE_CHATGPT", "false"):
+        logger.info("USE_CHATGPT=true → usando API do ChatGPT.")
+        return request_chatgpt(prompt)
+    logger.info("USE_CHATGPT=false → usando Ollama local.")
+    if check_ready and not ensure_ollama_model():
+        raise RuntimeError("O modelo Ollama não está disponível e não pôde ser baixado.")
+    return request_ollama(prompt)
+
+def stream_model(prompt: str):
+    """Como request_model, mas gera os pedaços do texto à medida que o modelo responde."""
+    if env_flag("USE_CHATGPT", "false"):
+        logger.info("USE_CHATGPT=true → usando API do ChatGPT (stream).")
+        yield from request_chatgpt_stream(prompt)
+        return
+    logger.info("USE_CHATGPT=false → usando Ollama local (stream).")
+    if not ensure_ollama_model():
+        raise RuntimeError("O modelo Ollama não está disponível e não pôde ser baixado.")
+    yield from request_ollama_stream(prompt)
+
+def detect_highlights_stream(transcription: str, duration: float, prompt_template: str, cues: Optional[list] = None,
+                             regions: Optional[list] = None):
+    """
+    Gera os highlights um a um, assim que cada {start, end} fica completo no
+    stream do modelo. No modo em janelas os cortes só saem depois do reduce.
+    """
+    if cues and regions and prescore_mode() == "focus":
+        yield from detect_highlights_windowed(cues, prompt_template, regions)
+        return
+    annotate_regions = regions if cues and regions and prescore_mode() == "annotate" else None
+    if annotate_regions:
+        transcription = annotate_transcription(cues, annotate_regions)
+    if cues and use_windowed_detection(transcription, prompt_template):
+        yield from detect_highlights_windowed(cues, prompt_template, annotate_regions=annotate_regions)
+        return
+    prompt = generate_prompt(prompt_template, transcription, duration)
+    parser = HighlightStreamParser()
+    text = []
+    emitted = 0
+    for chunk in stream_model(prompt):
+        text.append(chunk)
+        for item in parser.feed(chunk):
+            emitted += 1
+            logger.info(f"Highlight {emitted} recebido do stream: {item}")
+            yield item
+    if emitted == 0:
+        # nada completo no stream: tenta o parser tolerante no texto inteiro
+        result = "".join(text)
+        try:
+            yield from extract_json_list(result)
+        except ValueError as e:
+            raise ValueError(f"Não foi possível processar o resultado do modelo: {result} - erro: {e}")
+
+def detect_highlights(transcription: str, duration: float, prompt_template: str, cues: Optional[list] = None,
+                      regions: Optional[list] = None) -> list:
+    """
+    Gera o prompt, consulta o modelo e retorna a lista de cortes [{start, end}, ...].
+    Com `cues` [(start, end, texto), ...] e uma transcrição maior que o contexto do
+    modelo (ou DETECT_MODE=windowed), usa a detecção em janelas (map-reduce).
+    Com `regions` da pré-pontuação do áudio (audio_analysis), DETECT_PRESCORE=focus
+    envia ao modelo só os trechos dessas regiões e annotate marca-as na transcrição.
+    """
+    if cues and regions and prescore_mode() == "focus":
+        return detect_highlights_windowed(cues, prompt_template, regions)
+    annotate_regions = regions if cues and regions and prescore_mode() == "annotate" else None
+    if annotate_regions:
+        transcription = annotate_transcription(cues, annotate_regions)
+    if cues and use_windowed_detection(transcription, prompt_template):
+        return detect_highlights_windowed(cues, prompt_template, annotate_regions=annotate_regions)
+    prompt = generate_prompt(prompt_template, transcription, duration)
+    result = request_model(prompt)
+    try:
+        return extract_json_list(result)
+    except ValueError as e:
+        raise ValueError(f"Não foi possível processar o resultado do modelo: {result} - erro: {e}")
+
+# --------------------------
+# Detecção em janelas (map-reduce) para transcrições maiores que o contexto
+# --------------------------
+def estimate_tokens(text: str) -> int:
+    chars_per_token = float(os.getenv("DETECT_CHARS_PER_TOKEN", "3.5"))
+    return int(len(text) / chars_per_token) + 1
+
+def context_token_budget(prompt_template: str) -> int:
+    """Tokens disponíveis para a transcrição dentro do contexto do modelo."""
+    if env_flag("USE_CHATGPT", "false"):
+        num_ctx = int(os.getenv("CHATGPT_NUM_CTX", "128000"))
+        num_predict = 4096
+    else:
+        num_ctx = int(os.getenv("OLLAMA_NUM_CTX", "8192"))
+        num_predict = int(os.getenv("OLLAMA_NUM_PREDICT", "512"))
+    margin = int(os.getenv("DETECT_CONTEXT_MARGIN", "256"))
+    return max(256, num_ctx - num_predict - estimate_tokens(prompt_template) - margin)
+
+def use_windowed_detection(transcription: str, prompt_template: str) -> bool:
+    mode = os.getenv("DETECT_MODE", "auto").strip().lower()
+    if mode == "windowed":
+        return True
+    if mode == "single":
+        return False
+    needed = estimate_tokens(transcription)
+    budget = context_token_budget(prompt_template)
+    if needed > budget:
+        logger.info(f"Transcrição (~{needed} tokens) excede o contexto (~{budget} tokens): detecção em janelas.")
+        return True
+    return False
+
+def plan_windows(cues: list, budget_tokens: int, overlap_seconds: float) -> list:
+    """
+    Agrupa os cues em janelas de tempo que cabem em `budget_tokens`, com
+    `overlap_seconds` de sobreposição entre janelas vizinhas.
+    Retorna [(início, fim, [cues]), ...].
+    """
+    windows = []
+    i, n = 0, len(cues)
+    while i < n:
+        tokens, j = 0, i
+        while j < n:
+            cost = estimate_tokens(cues[j][2])
+            if j > i and tokens + cost > budget_tokens:
+                break
+            tokens += cost
+            j += 1
+        chunk = cues[i:j]
+        windows.append((chunk[0][0], max(c[1] for c in chunk), chunk))
+        if j >= n:
+            break
+        # próxima janela recomeça `overlap_seconds` antes do fim desta; a sobreposição fica
+        # limitada à metade da janela, senão cada janela avançaria só um cue
+        overlap = min(overlap_seconds, (cues[j][0] - cues[i][0]) / 2)
+        next_start = cues[j][0] - overlap
+        k = j
+        while k - 1 > i and cues[k - 1][0] >= next_start:
+            k -= 1
+        i = k
+    return windows
+
+def plan_region_windows(cues: list, regions: list, budget_tokens: int, overlap_seconds: float) -> list:
+    """Janelas só com os cues dentro das regiões candidatas (regiões grandes são subdivididas)."""
+    windows = []
+    for region in regions:
+        chunk = [c for c in cues if c[1] > region["start"] and c[0] < region["end"]]
+        if chunk:
+            windows.extend(plan_windows(chunk, budget_tokens, overlap_seconds))
+    return windows
+
+def annotate_transcription(cues: list, regions: list) -> str:
+    """Transcrição com marcações [ÁUDIO EM DESTAQUE nota=X]...[/ÁUDIO] em volta das regiões candidatas."""
+    parts, r = [], 0
+    regions = sorted(regions, key=lambda x: x["start"])
+    inside = False
+    for start, end, text in cues:
+        while r < len(regions) and regions[r]["end"] <= start:
+            if inside:
+                parts.append("[/ÁUDIO]")
+                inside = False
+            r += 1
+        if r < len(regions) and not inside and end > regions[r]["start"]:
+            parts.append(f"[ÁUDIO EM DESTAQUE nota={regions[r]['score']:.1f}]")
+            inside = True
+        if text:
+            parts.append(text)
+    if inside:
+        parts.append("[/ÁUDIO]")
+    return " ".join(parts)
+
+def _detect_window(window, prompt_template: str, annotate_regions: Optional[list] = None) -> list:
+    w_start, w_end, chunk = window
+    if annotate_regions:
+        text = annotate_transcription(chunk, annotate_regions)
+    else:
+        text = " ".join(c[2] for c in chunk if c[2])
+    prompt = generate_prompt(prompt_template, text, w_end - w_start)
+    result = request_model(prompt, check_ready=False)
+    try:
+        items = extract_json_list(result)
+    except ValueError as e:
+        logger.warning(f"Janela {w_start:.1f}-{w_end:.1f}s sem JSON válido: {e}")
+        return []
+    candidates = []
+    for item in items:
+        try:
+            # tempos do modelo são relativos ao início da janela (DURATION = duração da janela)
+            start = float(item["start"]) + w_start
+            end = float(item["end"]) + w_start
+        except (KeyError, TypeError, ValueError):
+            continue
+        start, end = max(start, w_start), min(end, w_end)
+        if end > start:
+            candidates.append({**item, "start": round(start, 1), "end": round(end, 1)})
+    logger.info(f"Janela {w_start:.1f}-{w_end:.1f}s: {len(candidates)} candidato(s)")
+    return candidates
+
+def _overlap_ratio(a: dict, b: dict) -> float:
+    inter = min(a["end"], b["end"]) - max(a["start"], b["start"])
+    if inter <= 0:
+        return 0.0
+    return inter / min(a["end"] - a["start"], b["end"] - b["start"])
+
+def _candidate_score(cand: dict) -> float:
+    """`score` informado pelo modelo como número; texto que não é número ("alta", None) conta como 0."""
+    try:
+        score = float(cand.get("score", 0))
+    except (TypeError, ValueError):
+        return 0.0
+    return score if score == score else 0.0  # NaN
+
+def reduce_candidates(candidates: list, max_clips: int = 0, dedup_ratio: float = 0.5) -> list:
+    """
+    Junta candidatos de janelas diferentes: duplicatas (sobreposição ≥ dedup_ratio do
+    menor) viram um só corte com `support` somado; o ranking usa support e, se o
+    modelo informou, `score`. Seleciona cortes sem sobreposição e ordena por start.
+    """
+    merged = []
+    for cand in sorted(candidates, key=lambda c: (c["start"], c["end"])):
+        for m in merged:
+            if _overlap_ratio(m, cand) >= dedup_ratio:
+                m["support"] += 1
+                m["score"] = max(m["score"], _candidate_score(cand))
+                break
+        else:
+            merged.append({**cand, "support": 1, "score": _candidate_score(cand)})
+
+    ranked = sorted(merged, key=lambda c: (c["support"], c["score"], c["end"] - c["start"]), reverse=True)
+    selected = []
+    for cand in ranked:
+        if any(_overlap_ratio(cand, s) > 0 for s in selected):
+            continue
+        selected.append(cand)
+        if max_clips and len(selected) >= max_clips:
+            break
+    selected.sort(key=lambda c: c["start"])
+    return [{"start": c["start"], "end": c["end"]} for c in selected]
+
+def detect_highlights_windowed(cues: list, prompt_template: str, regions: Optional[list] = None,
+                               annotate_regions: Optional[list] = None) -> list:
+    """
+    `regions` (DETECT_PRESCORE=focus) restringe as janelas às regiões candidatas;
+    `annotate_regions` (annotate) mantém a transcrição inteira e marca as regiões no texto de cada janela.
+    """
+    budget = int(os.getenv("DETECT_WINDOW_TOKENS", "0")) or context_token_budget(prompt_template)
+    overlap = float(os.getenv("DETECT_WINDOW_OVERLAP", "30"))
+    concurrency = int(os.getenv("DETECT_CONCURRENCY", "2"))
+    if regions:
+        windows = plan_region_windows(cues, regions, budget, overlap)
+        sent = sum(estimate_tokens(c[2]) for w in windows for c in w[2])
+        total = sum(estimate_tokens(c[2]) for c in cues)
+        logger.info(f"Pré-pontuação: enviando ~{sent} de ~{total} tokens da transcrição ({len(regions)} região(ões))")
+    else:
+        windows = plan_windows(cues, budget, overlap)
+    logger.info(f"Detecção em {len(windows)} janela(s) de até ~{budget} tokens "
+                f"(sobreposição {overlap:.0f}s, concorrência {concurrency})")
+
+    if not env_flag("USE_CHATGPT", "false") and not ensure_ollama_model():
+        raise RuntimeError("O modelo Ollama não está disponível e não pôde ser baixado.")
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        # contextvars não passam para as threads do pool: carry_job mantém os spans no job
+        detect = metrics.carry_job(lambda w: _detect_window(w, prompt_template, annotate_regions))
+        per_window = list(pool.map(detect, windows))
+
+    candidates = [c for items in per_window for c in items]
+    highlights = reduce_candidates(
+        candidates,
+        max_clips=int(os.getenv("DETECT_MAX_CLIPS", "0")),
+        dedup_ratio=float(os.getenv("DETECT_DEDUP_RATIO", "0.5")),
+    )
+    logger.info(f"{len(candidates)} candidato(s) → {len(highlights)} highlight(s) após o reduce")
+    return highlights
+
+def save_highlights(highlights: list, highlight_path: str) -> str:
+    with open(highlight_path, "w", encoding="utf-8") as f:
+        json.dump(highlights, f, ensure_ascii=False, indent=2)
+    logger.info(f"Highlight(s) salvo(s) em {highlight_path}")
+    return highlight_path
+
 # --------------------------
 # Main (CLI)
 # --------------------------
@@ -277,33 +659,16 @@ def main():
         logger.error(str(e))
         sys.exit(1)
 
-    prompt = generate_prompt(prompt_template, transcription, duration)
-
-    use_chatgpt = env_flag("USE_CHATGPT", "false")
     try:
-        if use_chatgpt:
-            logger.info("USE_CHATGPT=true → usando API do ChatGPT.")
-            result = request_chatgpt(prompt)
-        else:
-            logger.info("USE_CHATGPT=false → usando Ollama local.")
-            if ensure_ollama_model():
-                result = request_ollama(prompt)
-            else:
-                logger.error("O modelo Ollama não está disponível e não pôde ser baixado.")
-                sys.exit(1)
+        highlight_data = detect_highlights(transcription, duration, prompt_template, read_srt_cues(srt_path))
+    except ValueError as e:
+        logger.error(str(e))
+        sys.exit(1)
     except Exception as e:
         logger.error(f"Falha ao obter resposta do modelo: {e}")
         sys.exit(1)
 
-    highlight_path = os.path.splitext(srt_path)[0] + ".highlight.json"
-    try:
-        highlight_data = extract_json_list(result)
-        with open(highlight_path, "w", encoding="utf-8") as f:
-            json.dump(highlight_data, f, ensure_ascii=False, indent=2)
-        logger.info(f"Highlight(s) salvo(s) em {highlight_path}")
-    except Exception as e:
-        logger.error(f"Não foi possível processar o resultado do modelo: {result} - erro: {e}")
-        sys.exit(1)
+    save_highlights(highlight_data, os.path.splitext(srt_path)[0] + ".highlight.json")
 
 if __name__ == "__main__":
     main()
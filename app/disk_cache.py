@@ -0,0 +1,116 @@
+import os
+import json
+import time
+import hashlib
+import threading
+import tempfile
+from pathlib import Path
+
+BASE_DIR = Path(__file__).parent
+
+def cache_root() -> Path:
+    return Path(os.getenv("CACHE_DIR", str(BASE_DIR / "cache")))
+
+def hash_file(path, chunk_size: int = 4 * 1024 * 1024) -> str:
+    """sha256 do conteúdo do arquivo (leitura em blocos grandes)."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(chunk_size), b""):
+            h.update(block)
+    return h.hexdigest()
+
+def hash_json(obj) -> str:
+    """sha256 estável de um objeto JSON (chaves ordenadas)."""
+    return hashlib.sha256(json.dumps(obj, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+class DiskCache:
+    """
+    Cache chave → JSON em disco, um arquivo por entrada.
+
+    - LRU: o mtime da entrada é atualizado a cada hit; ao passar de `max_bytes`
+      as entradas menos usadas são removidas.
+    - TTL opcional: entradas mais antigas que `ttl` segundos (desde a gravação) expiram.
+    - Aliases: chaves secundárias que apontam para uma entrada principal.
+    """
+    def __init__(self, name: str, max_bytes: int, ttl: float | None = None):
+        self.directory = cache_root() / name
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._lock = threading.Lock()
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}.json"
+
+    def _alias_path(self, alias: str) -> Path:
+        return self.directory / f"{alias}.alias"
+
+    def get(self, key: str):
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+        if self.ttl is not None and time.time() - entry.get("created", 0) > self.ttl:
+            self.delete(key)
+            return None
+        try:
+            os.utime(path)  # marca como usado recentemente (LRU)
+        except OSError:
+            pass
+        return entry.get("value")
+
+    def set(self, key: str, value) -> None:
+        entry = {"created": time.time(), "value": value}
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(entry, f, ensure_ascii=False)
+        os.replace(tmp, self._path(key))
+        self.evict()
+
+    def delete(self, key: str) -> None:
+        try:
+            self._path(key).unlink()
+        except FileNotFoundError:
+            pass
+
+    def set_alias(self, alias: str, key: str) -> None:
+        self._alias_path(alias).write_text(key, encoding="utf-8")
+
+    def get_alias(self, alias: str):
+        try:
+            key = self._alias_path(alias).read_text(encoding="utf-8").strip()
+        except FileNotFoundError:
+            return None
+        return self.get(key)
+
+    def evict(self) -> None:
+        """Remove as entradas menos usadas até caber em max_bytes (e aliases órfãos)."""
+        with self._lock:
+            entries = []
+            total = 0
+            for p in self.directory.glob("*.json"):
+                try:
+                    st = p.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, p))
+                total += st.st_size
+            if total > self.max_bytes:
+                entries.sort()
+                for _, size, p in entries:
+                    if total <= self.max_bytes:
+                        break
+                    try:
+                        p.unlink()
+                        total -= size
+                    except FileNotFoundError:
+                        pass
+                for alias in self.directory.glob("*.alias"):
+                    try:
+                        key = alias.read_text(encoding="utf-8").strip()
+                        if not self._path(key).exists():
+                            alias.unlink()
+                    except FileNotFoundError:
+                        pass
@@ -0,0 +1,65 @@
+import time
+import asyncio
+import threading
+
+# Pub/sub em memória do progresso dos jobs. O pipeline (threads dos workers)
+# publica; cada conexão SSE assina com uma asyncio.Queue no event loop do servidor.
+# O último estado de cada job fica guardado para o /status e para quem conecta depois.
+MAX_FINISHED_JOBS = 500
+
+_LOCK = threading.Lock()
+_STATE = {}        # job_id -> {"step", "progress", "highlights", "updated_at"}
+_SUBSCRIBERS = {}  # job_id -> [(loop, queue)]
+
+def _notify(job_id, event):
+    for loop, queue in _SUBSCRIBERS.get(job_id, []):
+        try:
+            loop.call_soon_threadsafe(queue.put_nowait, event)
+        except RuntimeError:
+            pass  # loop já encerrado
+
+def _prune():
+    finished = [(s["updated_at"], jid) for jid, s in _STATE.items()
+                if s.get("progress", 0) >= 100 and jid not in _SUBSCRIBERS]
+    for _, jid in sorted(finished)[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+        del _STATE[jid]
+
+def publish_status(job_id, step, progress) -> dict:
+    """Atualiza etapa/progresso do job e avisa os assinantes. Retorna o estado atual."""
+    with _LOCK:
+        state = _STATE.setdefault(job_id, {"highlights": []})
+        state.update(step=step, progress=progress, updated_at=time.time())
+        _notify(job_id, ("status", {"step": step, "progress": progress}))
+        if progress >= 100:
+            _prune()
+        return dict(state, highlights=list(state["highlights"]))
+
+def publish_clip(job_id, filename, meta=None) -> dict:
+    """Registra um clipe finalizado do job e avisa os assinantes."""
+    with _LOCK:
+        state = _STATE.setdefault(job_id, {"step": "", "progress": 0, "highlights": []})
+        if filename not in state["highlights"]:
+            state["highlights"].append(filename)
+            state["updated_at"] = time.time()
+            _notify(job_id, ("clip", {**(meta or {}), "filename": filename}))
+        return dict(state, highlights=list(state["highlights"]))
+
+def snapshot(job_id) -> dict | None:
+    with _LOCK:
+        state = _STATE.get(job_id)
+        return dict(state, highlights=list(state["highlights"])) if state else None
+
+def subscribe(job_id) -> asyncio.Queue:
+    """Assina os eventos do job (chamar de dentro do event loop)."""
+    queue = asyncio.Queue()
+    with _LOCK:
+        _SUBSCRIBERS.setdefault(job_id, []).append((asyncio.get_running_loop(), queue))
+    return queue
+
+def unsubscribe(job_id, queue) -> None:
+    with _LOCK:
+        subs = [s for s in _SUBSCRIBERS.get(job_id, []) if s[1] is not queue]
+        if subs:
+            _SUBSCRIBERS[job_id] = subs
+        else:
+            _SUBSCRIBERS.pop(job_id, None)
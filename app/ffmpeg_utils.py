@@ -0,0 +1,251 @@
+import os
+import json
+import queue
+import tempfile
+import threading
+import subprocess
+from bisect import bisect_left, bisect_right
+
+# --------------------------
+# Binários (configuráveis via ENV)
+# --------------------------
+def ffmpeg_bin() -> str:
+    return os.getenv("FFMPEG_BIN", "ffmpeg")
+
+def ffprobe_bin() -> str:
+    return os.getenv("FFPROBE_BIN", "ffprobe")
+
+def run_ffmpeg(args, timeout=None) -> subprocess.CompletedProcess:
+    """Executa o ffmpeg com saída silenciosa; levanta RuntimeError se falhar."""
+    cmd = [ffmpeg_bin(), "-hide_banner", "-loglevel", "error", "-nostdin", "-y", *[str(a) for a in args]]
+    result = subprocess.run(cmd, capture_output=True, text=True, timeout=timeout)
+    if result.returncode != 0:
+        raise RuntimeError(f"ffmpeg falhou ({result.returncode}): {result.stderr.strip()[-800:]}")
+    return result
+
+def run_ffprobe(args) -> str:
+    cmd = [ffprobe_bin(), "-v", "error", *[str(a) for a in args]]
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"ffprobe falhou ({result.returncode}): {result.stderr.strip()[-800:]}")
+    return result.stdout
+
+# --------------------------
+# Probe
+# --------------------------
+def probe_duration(path) -> float:
+    out = run_ffprobe(["-show_entries", "format=duration", "-of", "default=nw=1:nk=1", path])
+    return float(out.strip())
+
+def probe_video_stream(path) -> dict:
+    """Retorna codec, resolução, pix_fmt e fps do primeiro stream de vídeo."""
+    out = run_ffprobe([
+        "-select_streams", "v:0",
+        "-show_entries", "stream=codec_name,profile,width,height,pix_fmt,avg_frame_rate",
+        "-of", "json", path,
+    ])
+    streams = json.loads(out).get("streams", [])
+    if not streams:
+        raise RuntimeError(f"Nenhum stream de vídeo encontrado em {path}")
+    info = streams[0]
+    num, _, den = str(info.get("avg_frame_rate", "0/1")).partition("/")
+    try:
+        info["fps"] = float(num) / float(den or 1)
+    except (ValueError, ZeroDivisionError):
+        info["fps"] = 0.0
+    return info
+
+def probe_start_time(path) -> float:
+    """start_time do contêiner (não-zero em muitos .ts/.flv); 0.0 se o ffprobe não informar."""
+    out = run_ffprobe(["-show_entries", "format=start_time", "-of", "default=nw=1:nk=1", path])
+    try:
+        return float(out.strip())
+    except ValueError:
+        return 0.0
+
+def probe_keyframes(path) -> list:
+    """
+    Lista os timestamps (s) dos keyframes do vídeo lendo apenas os pacotes
+    (sem decodificar), ordenados e relativos ao início do arquivo (pts_time menos
+    o start_time do contêiner), na mesma base de tempo dos cortes.
+    """
+    offset = probe_start_time(path)
+    out = run_ffprobe([
+        "-select_streams", "v:0",
+        "-show_entries", "packet=pts_time,flags",
+        "-of", "csv=p=0", path,
+    ])
+    keyframes = []
+    for line in out.splitlines():
+        pts, _, flags = line.partition(",")
+        if "K" in flags and pts not in ("", "N/A"):
+            keyframes.append(round(float(pts) - offset, 6))
+    keyframes.sort()
+    return keyframes
+
+def keyframe_at_or_after(keyframes, t: float, tolerance: float = 0.0):
+    """Primeiro keyframe >= t - tolerance (ou None)."""
+    i = bisect_left(keyframes, t - tolerance)
+    return keyframes[i] if i < len(keyframes) else None
+
+def keyframe_at_or_before(keyframes, t: float, tolerance: float = 0.0):
+    """Último keyframe <= t + tolerance (ou None)."""
+    i = bisect_right(keyframes, t + tolerance)
+    return keyframes[i - 1] if i > 0 else None
+
+def probe_has_audio(path) -> bool:
+    out = run_ffprobe(["-select_streams", "a", "-show_entries", "stream=index", "-of", "csv=p=0", path])
+    return bool(out.strip())
+
+# --------------------------
+# Áudio
+# --------------------------
+# Formatos compactos aceitos pelo /asr (mono 16 kHz, o que o Whisper usa internamente)
+# bitexact: sem serial aleatório do Ogg nem tag de versão do encoder, então extrair de novo
+# o mesmo vídeo gera os mesmos bytes (o cache de transcrição é indexado pelo sha256 do áudio)
+BITEXACT_ARGS = ["-fflags", "+bitexact", "-flags:a", "+bitexact"]
+
+AUDIO_FORMATS = {
+    "opus": (".ogg", ["-c:a", "libopus", "-b:a", "24k", "-application", "voip", *BITEXACT_ARGS]),
+    "wav": (".wav", ["-c:a", "pcm_s16le", *BITEXACT_ARGS]),
+}
+
+def extract_audio_track(video_path, audio_path, fmt="opus", sample_rate=16000):
+    """Demuxa o áudio direto para mono/16 kHz no formato pedido, sem abrir o vídeo."""
+    _, codec_args = AUDIO_FORMATS[fmt]
+    run_ffmpeg([
+        "-i", video_path, "-map", "0:a:0", "-vn", "-sn", "-dn",
+        "-ac", "1", "-ar", sample_rate, *codec_args, audio_path,
+    ])
+    return audio_path
+
+class AudioPipe:
+    """
+    ffmpeg lendo o vídeo pelo stdin enquanto ele ainda chega (upload) e gravando o
+    áudio mono 16 kHz. Uma thread escreve no stdin a partir de uma fila limitada,
+    para quem produz os blocos nunca bloquear no pipe.
+    """
+    def __init__(self, audio_path, fmt="opus", sample_rate=16000, max_pending=8, put_timeout=30.0):
+        _, codec_args = AUDIO_FORMATS[fmt]
+        cmd = [ffmpeg_bin(), "-hide_banner", "-loglevel", "error", "-y", "-i", "pipe:0",
+               "-map", "0:a:0", "-vn", "-sn", "-dn", "-ac", "1", "-ar", str(sample_rate), *codec_args, str(audio_path)]
+        self.audio_path = str(audio_path)
+        self.error = None
+        self._put_timeout = put_timeout
+        self._stderr = tempfile.TemporaryFile()
+        self._proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=self._stderr)
+        self._queue = queue.Queue(max_pending)
+        self._writer = threading.Thread(target=self._write_loop, name="audio-pipe", daemon=True)
+        self._writer.start()
+
+    def _write_loop(self):
+        while True:
+            block = self._queue.get()
+            if block is None:
+                break
+            if self.error:
+                continue  # descarta até o fim
+            try:
+                self._proc.stdin.write(block)
+            except (BrokenPipeError, OSError) as e:
+                self.error = f"ffmpeg encerrou a leitura do stdin ({e})"
+        try:
+            self._proc.stdin.close()
+        except OSError:
+            pass
+
+    def write(self, block: bytes) -> bool:
+        """Envia um bloco ao ffmpeg; False se o pipe já falhou ou não acompanha o ritmo."""
+        if self.error:
+            return False
+        try:
+            self._queue.put(block, timeout=self._put_timeout)
+        except queue.Full:
+            self.abort("ffmpeg não acompanhou o upload")
+            return False
+        return True
+
+    def close(self, timeout=None) -> bool:
+        """Fecha o stdin e espera o ffmpeg; True se o áudio foi gravado por completo."""
+        self._queue.put(None)
+        self._writer.join()
+        try:
+            returncode = self._proc.wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            self.abort("ffmpeg não terminou a tempo")
+            return False
+        if returncode != 0 and not self.error:
+            self._stderr.seek(0)
+            self.error = f"ffmpeg falhou ({returncode}): {self._stderr.read().decode(errors='replace').strip()[-800:]}"
+        self._stderr.close()
+        ok = not self.error and os.path.exists(self.audio_path) and os.path.getsize(self.audio_path) > 0
+        if not ok:
+            self._remove_output()
+        return ok
+
+    def abort(self, reason="cancelado"):
+        self.error = self.error or reason
+        if self._proc.poll() is None:
+            self._proc.kill()
+        self._remove_output()
+
+    def _remove_output(self):
+        try:
+            os.remove(self.audio_path)
+        except OSError:
+            pass
+
+def mp4_index_position(head: bytes):
+    """
+    Para MP4/MOV (ISO BMFF), diz onde está o índice (moov) olhando os boxes de topo
+    do início do arquivo: "start" (faststart, dá para ler em stream), "end" (mdat
+    antes do moov) ou None se não é MP4 ou não deu para decidir com esses bytes.
+    """
+    if len(head) < 8 or head[4:8] != b"ftyp":
+        return None
+    offset = 0
+    while offset + 8 <= len(head):
+        size = int.from_bytes(head[offset:offset + 4], "big")
+        box = head[offset + 4:offset + 8]
+        if box == b"moov":
+            return "start"
+        if box == b"mdat":
+            return "end"
+        if size == 1:
+            if offset + 16 > len(head):
+                return None
+            size = int.from_bytes(head[offset + 8:offset + 16], "big")
+        elif size == 0:
+            return None
+        if size < 8:
+            return None
+        offset += size
+    return None
+
+def extract_audio_segment(audio_path, dest_path, start: float, duration: float, fmt="opus", sample_rate=16000):
+    """Recorta [start, start+duration) do áudio já extraído, no mesmo formato compacto."""
+    _, codec_args = AUDIO_FORMATS[fmt]
+    run_ffmpeg([
+        "-ss", f"{start:.3f}", "-t", f"{duration:.3f}", "-i", audio_path,
+        "-ac", "1", "-ar", sample_rate, *codec_args, dest_path,
+    ])
+    return dest_path
+
+def detect_silences(path, noise_db: float = -35.0, min_duration: float = 0.4) -> list:
+    """Retorna [(início, fim), ...] dos trechos de silêncio (filtro silencedetect)."""
+    cmd = [
+        ffmpeg_bin(), "-hide_banner", "-nostdin", "-loglevel", "info", "-i", str(path),
+        "-af", f"silencedetect=noise={noise_db}dB:d={min_duration}", "-f", "null", "-",
+    ]
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"ffmpeg silencedetect falhou ({result.returncode}): {result.stderr.strip()[-800:]}")
+    silences, current = [], None
+    for line in result.stderr.splitlines():
+        if "silence_start:" in line:
+            current = float(line.split("silence_start:")[1].split()[0])
+        elif "silence_end:" in line and current is not None:
+            end = float(line.split("silence_end:")[1].split()[0])
+            silences.append((current, end))
+            current = None
+    return silences
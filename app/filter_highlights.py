@@ -2,6 +2,11 @@ import os
 import json
 import sys
 
+def filter_by_score(highlights, min_score=None):
+    """Mantém apenas os cortes com nota >= MIN_SCORE."""
+    min_score = int(os.getenv("MIN_SCORE", 7)) if min_score is None else min_score
+    return [h for h in highlights if h.get("score", 0) >= min_score]
+
 def main():
     if len(sys.argv) < 3:
         print("Uso: python filter_highlights.py input.classified.json output.filtered.json")
@@ -14,11 +19,7 @@ def main():
     with open(input_file, "r", encoding="utf-8") as f:
         highlights = json.load(f)
 
-    filtered = [
-        {"start": h["start"], "end": h["end"]}
-        for h in highlights
-        if h.get("score", 0) >= min_score
-    ]
+    filtered = [{"start": h["start"], "end": h["end"]} for h in filter_by_score(highlights, min_score)]
 
     with open(output_file, "w", encoding="utf-8") as f:
         json.dump(filtered, f, ensure_ascii=False, indent=2)
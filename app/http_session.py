@@ -0,0 +1,25 @@
+import os
+import threading
+
+# Sessão HTTP única do processo (keep-alive) para Whisper, Ollama e ChatGPT: jobs
+# concorrentes e os lotes do batch.py reaproveitam as conexões em vez de abrir
+# uma nova por chamada. HTTP_POOL_SIZE limita as conexões mantidas por host.
+# O requests só é importado na 1ª sessão: os módulos que a usam carregam sem ele.
+_SESSION = None
+_SESSION_LOCK = threading.Lock()
+
+def pool_size() -> int:
+    return max(1, int(os.getenv("HTTP_POOL_SIZE", "16")))
+
+def get_session() -> "requests.Session":
+    global _SESSION
+    with _SESSION_LOCK:
+        if _SESSION is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=8, pool_maxsize=pool_size())
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _SESSION = session
+        return _SESSION
@@ -0,0 +1,254 @@
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+from dataclasses import asdict
+from pathlib import Path
+
+from pipeline import JobRequest, run_pipeline_safe
+from utils import update_status
+import manifest
+import metrics
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = Path(__file__).parent
+
+# --------------------------
+# Fila persistente (SQLite)
+# --------------------------
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id          TEXT PRIMARY KEY,
+    status      TEXT NOT NULL,          -- queued | running | done | failed | expired
+    request     TEXT NOT NULL,          -- JobRequest serializado
+    error       TEXT,
+    created_at  REAL NOT NULL,
+    started_at  REAL,
+    finished_at REAL,
+    video_hash  TEXT,
+    prompt_hash TEXT,
+    spans       TEXT                    -- spans de tempo do job (JSON, ver metrics.py)
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status_created ON jobs (status, created_at);
+"""
+# colunas adicionadas depois da primeira versão do schema
+MIGRATIONS = {"video_hash": "TEXT", "prompt_hash": "TEXT", "spans": "TEXT"}
+
+class JobQueue:
+    def __init__(self, db_path: str | None = None):
+        self.db_path = db_path or os.getenv("JOB_DB_PATH", str(BASE_DIR / "jobs.db"))
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+            columns = {r["name"] for r in conn.execute("PRAGMA table_info(jobs)")}
+            for name, kind in MIGRATIONS.items():
+                if name not in columns:
+                    conn.execute(f"ALTER TABLE jobs ADD COLUMN {name} {kind}")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_hashes ON jobs (video_hash, prompt_hash)")
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def enqueue(self, req: JobRequest) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, status, request, created_at, video_hash, prompt_hash) "
+                "VALUES (?, 'queued', ?, ?, ?, ?)",
+                (req.job_id, json.dumps(asdict(req)), time.time(), req.video_hash, req.prompt_hash),
+            )
+
+    def claim_next(self) -> JobRequest | None:
+        """Pega o job mais antigo da fila (atômico entre workers)."""
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT id, request FROM jobs WHERE status = 'queued' ORDER BY created_at LIMIT 1"
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            conn.execute("UPDATE jobs SET status = 'running', started_at = ? WHERE id = ?", (time.time(), row["id"]))
+            conn.execute("COMMIT")
+            return JobRequest(**json.loads(row["request"]))
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def finish(self, job_id: str, ok: bool, error: str | None = None, spans: list | None = None) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, finished_at = ?, spans = ? WHERE id = ?",
+                ("done" if ok else "failed", error, time.time(), json.dumps(spans) if spans else None, job_id),
+            )
+
+    def retry(self, job_id: str) -> JobRequest | None:
+        """Devolve um job falho ao fim da fila; a execução retoma do manifesto do job."""
+        with self._connect() as conn:
+            cur = conn.execute(
+                "UPDATE jobs SET status = 'queued', error = NULL, started_at = NULL, finished_at = NULL, "
+                "created_at = ? WHERE id = ? AND status = 'failed'", (time.time(), job_id))
+            if cur.rowcount == 0:
+                return None
+            row = conn.execute("SELECT request FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return JobRequest(**json.loads(row["request"]))
+
+    def expired_failures(self, finished_before: float) -> list:
+        """Jobs falhos terminados antes de `finished_before` (retenção vencida)."""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT id, request FROM jobs WHERE status = 'failed' AND finished_at < ?", (finished_before,)
+            ).fetchall()
+        return [JobRequest(**json.loads(r["request"])) for r in rows]
+
+    def mark_expired(self, job_id: str) -> None:
+        with self._connect() as conn:
+            conn.execute("UPDATE jobs SET status = 'expired' WHERE id = ? AND status = 'failed'", (job_id,))
+
+    def spans(self, job_id: str) -> list:
+        """Spans gravados no registro do job (sobrevivem a restarts, ao contrário dos em memória)."""
+        with self._connect() as conn:
+            row = conn.execute("SELECT spans FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return json.loads(row["spans"]) if row and row["spans"] else []
+
+    def recover(self) -> int:
+        """Após restart: jobs que estavam rodando voltam para a fila (na posição original)."""
+        with self._connect() as conn:
+            cur = conn.execute("UPDATE jobs SET status = 'queued', started_at = NULL WHERE status = 'running'")
+            requeued = cur.rowcount
+            queued = conn.execute("SELECT COUNT(*) FROM jobs WHERE status = 'queued'").fetchone()[0]
+        if queued:
+            logger.info(f"Fila recuperada: {queued} job(s) pendente(s) ({requeued} interrompido(s) no restart)")
+        return queued
+
+    def find_duplicates(self, video_hash: str, prompt_hash: str) -> list:
+        """Jobs (mais recentes primeiro) do mesmo vídeo + prompt que não falharam."""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT id, status FROM jobs WHERE video_hash = ? AND prompt_hash = ? "
+                "AND status NOT IN ('failed', 'expired') "
+                "ORDER BY created_at DESC", (video_hash, prompt_hash)
+            ).fetchall()
+        return [dict(r) for r in rows]
+
+    def get(self, job_id: str) -> dict | None:
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return dict(row) if row else None
+
+    def position(self, job_id: str) -> int | None:
+        """Posição na fila (1 = próximo a rodar); None se não está na fila."""
+        with self._connect() as conn:
+            row = conn.execute("SELECT created_at FROM jobs WHERE id = ? AND status = 'queued'", (job_id,)).fetchone()
+            if row is None:
+                return None
+            ahead = conn.execute(
+                "SELECT COUNT(*) FROM jobs WHERE status = 'queued' AND created_at < ?", (row["created_at"],)
+            ).fetchone()[0]
+        return ahead + 1
+
+    def average_duration(self, last: int = 20) -> float | None:
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT finished_at - started_at AS d FROM jobs WHERE status = 'done' AND started_at IS NOT NULL "
+                "ORDER BY finished_at DESC LIMIT ?", (last,)
+            ).fetchall()
+        durations = [r["d"] for r in rows if r["d"] is not None]
+        return sum(durations) / len(durations) if durations else None
+
+    def queue_info(self, job_id: str, workers: int) -> dict:
+        """Posição na fila e ETA (segundos) estimados pela duração média dos últimos jobs."""
+        job = self.get(job_id)
+        if job is None:
+            return {}
+        info = {"queue_status": job["status"]}
+        avg = self.average_duration()
+        if job["status"] == "queued":
+            pos = self.position(job_id)
+            info["queue_position"] = pos
+            if avg is not None and pos is not None:
+                # jobs à frente divididos entre os workers + o próprio job
+                info["eta_seconds"] = round(((pos - 1) // max(workers, 1) + 1) * avg)
+        elif job["status"] == "running" and avg is not None and job["started_at"]:
+            info["eta_seconds"] = max(0, round(avg - (time.time() - job["started_at"])))
+        return info
+
+# --------------------------
+# Workers
+# --------------------------
+class JobWorkers:
+    """
+    Pool de threads que consome a fila. Os limites por recurso (ASR, LLM, encode)
+    ficam nas etapas do pipeline (pipeline.STAGE_LIMITS), então vários jobs podem
+    estar em etapas diferentes ao mesmo tempo.
+    """
+    def __init__(self, queue: JobQueue, workers: int | None = None):
+        self.queue = queue
+        self.workers = workers or int(os.getenv("JOB_WORKERS", "3"))
+        self._wakeup = threading.Condition()
+        self._stop = False
+        self._threads = []
+        self._sweep_lock = threading.Lock()
+        self._last_sweep = 0.0
+        self.sweep_interval = float(os.getenv("JOB_SWEEP_INTERVAL", "3600"))
+
+    def start(self):
+        self.queue.recover()
+        self.sweep()
+        for i in range(self.workers):
+            t = threading.Thread(target=self._loop, name=f"job-worker-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def notify(self):
+        with self._wakeup:
+            self._wakeup.notify()
+
+    def stop(self):
+        self._stop = True
+        with self._wakeup:
+            self._wakeup.notify_all()
+
+    def sweep(self) -> int:
+        """Apaga os intermediários de jobs falhos cuja retenção (JOB_RETENTION_HOURS) venceu."""
+        if not self._sweep_lock.acquire(blocking=False):
+            return 0  # outro worker já está varrendo
+        try:
+            self._last_sweep = time.time()
+            expired = self.queue.expired_failures(time.time() - manifest.retention_seconds())
+            for req in expired:
+                job_manifest = manifest.load(req.output_dir, req.job_id)
+                removed = job_manifest.expire() if job_manifest else 0
+                self.queue.mark_expired(req.job_id)
+                logger.info(f"Retenção vencida do job {req.job_id}: {removed} intermediário(s) apagado(s)")
+            return len(expired)
+        except Exception as e:
+            logger.error(f"Erro ao expirar jobs falhos: {e}")
+            return 0
+        finally:
+            self._sweep_lock.release()
+
+    def _loop(self):
+        while not self._stop:
+            try:
+                req = self.queue.claim_next()
+            except Exception as e:
+                logger.error(f"Erro ao ler a fila de jobs: {e}")
+                req = None
+            if req is None:
+                if time.time() - self._last_sweep >= self.sweep_interval:
+                    self.sweep()
+                with self._wakeup:
+                    self._wakeup.wait(timeout=5)
+                continue
+            logger.info(f"Iniciando job {req.job_id}")
+            update_status(req.job_id, "Iniciando processamento...", 1, req.output_dir)
+            result = run_pipeline_safe(req)
+            self.queue.finish(req.job_id, result.ok, result.error, metrics.job_spans(req.job_id))
@@ -0,0 +1,150 @@
+import os
+import fcntl
+import hashlib
+import logging
+import threading
+from contextlib import contextmanager
+from concurrent.futures import Future
+from disk_cache import DiskCache, hash_json
+from utils import env_flag
+
+logger = logging.getLogger(__name__)
+
+# Chave = backend + modelo + opções de geração + sha256 do prompt renderizado.
+# Requisições idênticas em andamento são coalescidas: dentro do processo via Future
+# compartilhado e entre processos via flock no arquivo .lock da chave.
+_CACHE = None
+_INFLIGHT = {}
+_INFLIGHT_LOCK = threading.Lock()
+
+def get_cache() -> DiskCache:
+    global _CACHE
+    if _CACHE is None:
+        max_mb = float(os.getenv("LLM_CACHE_MAX_MB", "128"))
+        ttl = float(os.getenv("LLM_CACHE_TTL", str(7 * 24 * 3600)))
+        _CACHE = DiskCache("llm", int(max_mb * 1024 * 1024), ttl=ttl if ttl > 0 else None)
+    return _CACHE
+
+def enabled() -> bool:
+    return env_flag("LLM_CACHE", "true")
+
+def cache_key(backend: str, model: str, options: dict, prompt: str) -> str:
+    prompt_hash = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+    return hash_json({"backend": backend, "model": model, "options": options, "prompt": prompt_hash})
+
+def _claim(key: str):
+    """(future, dono): o primeiro a pedir a chave gera; os outros esperam o Future dele."""
+    with _INFLIGHT_LOCK:
+        future = _INFLIGHT.get(key)
+        if future is not None:
+            return future, False
+        future = _INFLIGHT[key] = Future()
+        return future, True
+
+def _release(key: str):
+    with _INFLIGHT_LOCK:
+        _INFLIGHT.pop(key, None)
+
+@contextmanager
+def _key_lock(cache: DiskCache, key: str):
+    """flock no arquivo .lock da chave: outro processo gerando a mesma chave → espera."""
+    lock_path = cache.directory / f"{key}.lock"
+    with open(lock_path, "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+    try:
+        lock_path.unlink()
+    except FileNotFoundError:
+        pass
+
+def cached_generate(backend: str, model: str, options: dict, prompt: str, generate) -> str:
+    """
+    Retorna a resposta em cache ou chama `generate()` uma única vez por chave,
+    mesmo com várias requisições idênticas simultâneas.
+    """
+    if not enabled():
+        return generate()
+
+    key = cache_key(backend, model, options, prompt)
+    cache = get_cache()
+    hit = cache.get(key)
+    if hit is not None:
+        logger.info(f"Resposta do LLM encontrada no cache ({backend}/{model}, {key[:12]}…)")
+        return hit
+
+    future, owner = _claim(key)
+    if not owner:
+        logger.info(f"Requisição idêntica já em andamento ({key[:12]}…); aguardando o resultado.")
+        return future.result()
+
+    try:
+        with _key_lock(cache, key):
+            result = cache.get(key)
+            if result is None:
+                result = generate()
+                if result:  # resposta vazia não vai para o cache
+                    cache.set(key, result)
+        future.set_result(result)
+        return result
+    except BaseException as e:
+        future.set_exception(e)
+        raise
+    finally:
+        _release(key)
+
+def cached_stream(backend: str, model: str, options: dict, prompt: str, stream):
+    """
+    Versão em stream: num hit devolve a resposta inteira de uma vez; senão repassa
+    os pedaços de `stream()` e grava a resposta completa no final. Streams idênticos
+    simultâneos são coalescidos como no cached_generate: quem chega depois espera o
+    dono terminar e recebe a resposta inteira (se o dono parar no meio, gera de novo).
+    """
+    if not enabled():
+        yield from stream()
+        return
+    key = cache_key(backend, model, options, prompt)
+    cache = get_cache()
+    hit = cache.get(key)
+    if hit is not None:
+        logger.info(f"Resposta do LLM encontrada no cache ({backend}/{model}, {key[:12]}…)")
+        yield hit
+        return
+
+    future, owner = _claim(key)
+    if not owner:
+        logger.info(f"Stream idêntico já em andamento ({key[:12]}…); aguardando o resultado.")
+        result = future.result()
+        if result is None:  # o dono abandonou o stream antes do fim
+            yield from cached_stream(backend, model, options, prompt, stream)
+        elif result:
+            yield result
+        return
+
+    result = None
+    try:
+        with _key_lock(cache, key):
+            hit = cache.get(key)  # outro processo pode ter acabado de gerar
+            if hit is not None:
+                result = hit
+                yield hit
+            else:
+                parts = []
+                for chunk in stream():
+                    parts.append(chunk)
+                    yield chunk
+                result = "".join(parts).strip()
+                if result:
+                    cache.set(key, result)
+    except GeneratorExit:
+        result = None  # consumidor parou de ler: quem espera gera por conta própria
+        raise
+    except BaseException as e:
+        future.set_exception(e)
+        raise
+    finally:
+        if not future.done():
+            future.set_result(result)
+        _release(key)
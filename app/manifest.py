@@ -0,0 +1,112 @@
+import os
+import json
+import time
+import threading
+from pathlib import Path
+
+from disk_cache import hash_json
+
+# Manifesto do job: para cada etapa concluída, a impressão digital das entradas
+# (encadeada com a da etapa anterior) e os artefatos gerados. Um retry ou o
+# restart depois de uma queda retoma da primeira etapa cuja impressão digital
+# mudou ou cujo artefato sumiu. Os intermediários só são apagados quando o job
+# termina com sucesso ou quando a retenção de jobs falhos expira.
+
+def manifest_path(output_dir, job_id) -> Path:
+    return Path(output_dir) / f"manifest_{job_id}.json"
+
+def env_fingerprint(*prefixes) -> dict:
+    """Variáveis de ambiente que começam com algum dos prefixos (entram na impressão digital da etapa)."""
+    return {k: v for k, v in sorted(os.environ.items()) if k.startswith(prefixes)}
+
+def file_identity(path) -> dict | None:
+    """Identidade barata de um arquivo (caminho + tamanho + mtime), sem ler o conteúdo."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return {"path": os.path.abspath(path), "size": st.st_size, "mtime": st.st_mtime_ns}
+
+def fingerprint(*parts) -> str:
+    return hash_json(list(parts))
+
+class JobManifest:
+    def __init__(self, output_dir, job_id):
+        self.path = manifest_path(output_dir, job_id)
+        self._lock = threading.Lock()
+        self.data = {"job_id": job_id, "status": "running", "created_at": time.time(),
+                     "attempts": 0, "stages": {}, "intermediates": []}
+        if self.path.exists():
+            try:
+                with open(self.path, encoding="utf-8") as f:
+                    self.data.update(json.load(f))
+            except (OSError, ValueError) as e:
+                print(f"[WARN] Manifesto inválido em {self.path} ({e}); recomeçando o job do início.")
+
+    def _save(self):
+        self.data["updated_at"] = time.time()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(f".{self.path.name}.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.data, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, self.path)
+
+    def begin(self, intermediates=()):
+        """Nova tentativa do job; `intermediates` são os arquivos a apagar no sucesso ou na expiração."""
+        with self._lock:
+            self.data["status"] = "running"
+            self.data["attempts"] = self.data.get("attempts", 0) + 1
+            known = set(self.data["intermediates"])
+            self.data["intermediates"] += [str(p) for p in intermediates if str(p) not in known]
+            self._save()
+
+    def completed(self, stage: str, fp: str) -> dict | None:
+        """Saídas da etapa se ela já terminou com as mesmas entradas e os arquivos ainda existem."""
+        entry = self.data["stages"].get(stage)
+        if not entry or entry.get("fingerprint") != fp:
+            return None
+        if not all(os.path.exists(p) for p in entry.get("files", [])):
+            return None
+        return entry["outputs"]
+
+    def record(self, stage: str, fp: str, outputs: dict, files=(), intermediate: bool = True):
+        """
+        Marca a etapa como concluída; `files` são os artefatos que precisam existir para
+        reaproveitá-la. Com `intermediate=False` (clipes finais) eles não entram na limpeza.
+        """
+        files = [str(f) for f in files if f]
+        with self._lock:
+            self.data["stages"][stage] = {"fingerprint": fp, "outputs": outputs, "files": files,
+                                          "completed_at": time.time()}
+            if intermediate:
+                known = set(self.data["intermediates"])
+                self.data["intermediates"] += [f for f in files if f not in known]
+            self._save()
+
+    def finish(self, ok: bool, error: str | None = None):
+        with self._lock:
+            self.data["status"] = "done" if ok else "failed"
+            self.data["error"] = error
+            self._save()
+
+    def expire(self) -> int:
+        """Apaga os intermediários (retenção vencida) e marca o job como expirado; retorna quantos apagou."""
+        removed = 0
+        with self._lock:
+            for path in self.data["intermediates"]:
+                try:
+                    os.remove(path)
+                    removed += 1
+                except OSError:
+                    pass
+            self.data["status"] = "expired"
+            self.data["stages"] = {}
+            self._save()
+        return removed
+
+def load(output_dir, job_id) -> JobManifest | None:
+    return JobManifest(output_dir, job_id) if manifest_path(output_dir, job_id).exists() else None
+
+def retention_seconds() -> float:
+    """JOB_RETENTION_HOURS: por quanto tempo um job falho mantém os intermediários para retry (padrão 72h)."""
+    return float(os.getenv("JOB_RETENTION_HOURS", "72")) * 3600
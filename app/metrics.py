@@ -0,0 +1,201 @@
+import time
+import threading
+import contextvars
+from bisect import bisect_left
+from collections import OrderedDict
+from contextlib import contextmanager
+
+# Instrumentação em memória: spans com duração e atributos por job (etapas do
+# pipeline e chamadas externas) e histogramas/contadores agregados, expostos em
+# formato texto do Prometheus pelo /metrics do webapp. Só stdlib; o custo por
+# observação é um bisect + incremento sob lock.
+PREFIX = "highlight_"
+MAX_JOBS = 500
+MAX_SPANS_PER_JOB = 2000
+
+SECONDS_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800)
+BYTES_BUCKETS = tuple(2 ** p for p in range(16, 34, 2))  # 64 KiB .. 8 GiB
+TOKENS_BUCKETS = (16, 64, 256, 512, 1024, 2048, 4096, 8192, 16384, 32768, 131072)
+
+# nome → (tipo, ajuda, buckets)
+METRICS = {
+    "span_seconds": ("histogram", "Duração das etapas do pipeline e chamadas externas", SECONDS_BUCKETS),
+    "span_errors_total": ("counter", "Etapas/chamadas que terminaram com erro", None),
+    "asr_upload_bytes": ("histogram", "Tamanho do áudio enviado ao /asr", BYTES_BUCKETS),
+    "llm_prompt_tokens": ("histogram", "Tokens do prompt por geração do LLM", TOKENS_BUCKETS),
+    "llm_output_tokens": ("histogram", "Tokens gerados por chamada ao LLM", TOKENS_BUCKETS),
+    "llm_first_token_seconds": ("histogram", "Tempo até o primeiro pedaço da resposta (stream)", SECONDS_BUCKETS),
+    "llm_load_seconds": ("histogram", "Carga do modelo antes da geração (load_duration do Ollama)", SECONDS_BUCKETS),
+    "clip_encode_seconds": ("histogram", "Tempo de render de cada clipe", SECONDS_BUCKETS),
+    "clip_output_bytes": ("histogram", "Tamanho de cada clipe gerado", BYTES_BUCKETS),
+    "jobs_total": ("counter", "Jobs finalizados por resultado", None),
+}
+
+# atributos de span que viram label do histograma (baixa cardinalidade); o resto fica só no job
+HISTOGRAM_LABELS = ("backend", "mode", "resource", "start")
+# geração com carga do modelo acima disso conta como partida a frio (start="cold")
+COLD_LOAD_SECONDS = 0.5
+
+_LOCK = threading.Lock()
+_HISTOGRAMS = {}     # (nome, labels) -> [contagens por bucket..., +Inf], soma
+_COUNTERS = {}       # (nome, labels) -> valor
+_JOB_SPANS = OrderedDict()  # job_id -> [span, ...]
+_CURRENT_JOB = contextvars.ContextVar("metrics_job", default=None)
+
+def _key(name, labels):
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items() if v is not None))
+
+def observe(name: str, value: float, **labels):
+    """Registra `value` no histograma `name` (buckets definidos em METRICS)."""
+    buckets = METRICS[name][2]
+    key = _key(name, labels)
+    with _LOCK:
+        entry = _HISTOGRAMS.get(key)
+        if entry is None:
+            entry = _HISTOGRAMS[key] = [[0] * (len(buckets) + 1), 0.0]
+        entry[0][bisect_left(buckets, value)] += 1
+        entry[1] += value
+
+def inc(name: str, amount: float = 1, **labels):
+    key = _key(name, labels)
+    with _LOCK:
+        _COUNTERS[key] = _COUNTERS.get(key, 0) + amount
+
+# --------------------------
+# Spans por job
+# --------------------------
+@contextmanager
+def bind_job(job_id):
+    """Associa os spans abertos nesta thread (e em contextos copiados dela) ao `job_id`."""
+    token = _CURRENT_JOB.set(job_id)
+    try:
+        yield
+    finally:
+        _CURRENT_JOB.reset(token)
+
+def current_job():
+    return _CURRENT_JOB.get()
+
+def carry_job(fn):
+    """`fn` associado ao job atual também quando roda numa thread de pool."""
+    job_id = _CURRENT_JOB.get()
+
+    def run(*args, **kwargs):
+        with bind_job(job_id):
+            return fn(*args, **kwargs)
+    return run
+
+def record_span(name: str, duration: float, job_id=None, error=None, **attrs):
+    """Registra um span já medido (ex.: render num processo do pool) no histograma e no job."""
+    job_id = job_id or _CURRENT_JOB.get()
+    labels = {k: v for k, v in attrs.items() if k in HISTOGRAM_LABELS}
+    observe("span_seconds", duration, span=name, **labels)
+    if error is not None:
+        inc("span_errors_total", span=name)
+    if not job_id:
+        return
+    span = {"name": name, "duration": round(duration, 4), "ended_at": round(time.time(), 3), **attrs}
+    if error is not None:
+        span["error"] = str(error)[:300]
+    with _LOCK:
+        spans = _JOB_SPANS.setdefault(job_id, [])
+        _JOB_SPANS.move_to_end(job_id)
+        if len(spans) < MAX_SPANS_PER_JOB:
+            spans.append(span)
+        while len(_JOB_SPANS) > MAX_JOBS:
+            _JOB_SPANS.popitem(last=False)
+
+@contextmanager
+def span(name: str, **attrs):
+    """
+    Mede o bloco e registra o span ao sair (com `error` se houve exceção).
+    O dict devolvido aceita atributos preenchidos durante o bloco (tokens, bytes...).
+    """
+    attrs = dict(attrs)
+    started = time.perf_counter()
+    error = None
+    try:
+        yield attrs
+    except GeneratorExit:
+        raise  # consumidor de um stream parou de ler: não é erro da etapa
+    except BaseException as e:
+        error = e
+        raise
+    finally:
+        record_span(name, time.perf_counter() - started, error=error, **attrs)
+
+def record_llm(attrs: dict, backend: str, prompt_tokens=None, output_tokens=None, first_token=None,
+               load_seconds=None):
+    """
+    Anota tokens (e tempo até o 1º token) no span da geração e nos histogramas do backend.
+    Com `load_seconds` (Ollama) o span ganha start=cold|warm, que separa a latência das
+    gerações que esperaram o modelo carregar no span_seconds.
+    """
+    attrs["backend"] = backend
+    if prompt_tokens is not None:
+        attrs["prompt_tokens"] = int(prompt_tokens)
+        observe("llm_prompt_tokens", prompt_tokens, backend=backend)
+    if output_tokens is not None:
+        attrs["output_tokens"] = int(output_tokens)
+        observe("llm_output_tokens", output_tokens, backend=backend)
+    if first_token is not None:
+        attrs["first_token_seconds"] = round(first_token, 4)
+        observe("llm_first_token_seconds", first_token, backend=backend)
+    if load_seconds is not None:
+        attrs["load_seconds"] = round(load_seconds, 4)
+        attrs["start"] = "cold" if load_seconds >= COLD_LOAD_SECONDS else "warm"
+        observe("llm_load_seconds", load_seconds, backend=backend)
+
+def job_spans(job_id) -> list:
+    with _LOCK:
+        return list(_JOB_SPANS.get(job_id, []))
+
+def job_summary(job_id) -> dict:
+    """Segundos totais por nome de span do job (para o /status)."""
+    summary = {}
+    for s in job_spans(job_id):
+        summary[s["name"]] = round(summary.get(s["name"], 0.0) + s["duration"], 3)
+    return summary
+
+# --------------------------
+# Exposição (Prometheus text format 0.0.4)
+# --------------------------
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _fmt_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+def _fmt_le(bound) -> str:
+    return f"{bound:g}" if isinstance(bound, float) else str(bound)
+
+def render() -> str:
+    with _LOCK:
+        histograms = {k: ([*v[0]], v[1]) for k, v in _HISTOGRAMS.items()}
+        counters = dict(_COUNTERS)
+    lines = []
+    for name, (kind, help_text, buckets) in METRICS.items():
+        series = histograms if kind == "histogram" else counters
+        keys = sorted(k for k in series if k[0] == name)
+        if not keys:
+            continue
+        lines.append(f"# HELP {PREFIX}{name} {help_text}")
+        lines.append(f"# TYPE {PREFIX}{name} {kind}")
+        for key in keys:
+            labels = key[1]
+            if kind == "counter":
+                lines.append(f"{PREFIX}{name}{_fmt_labels(labels)} {series[key]:g}")
+                continue
+            counts, total = series[key]
+            cumulative = 0
+            for bound, count in zip(buckets, counts):
+                cumulative += count
+                lines.append(f"{PREFIX}{name}_bucket{_fmt_labels(labels, [('le', _fmt_le(bound))])} {cumulative}")
+            cumulative += counts[-1]
+            lines.append(f"{PREFIX}{name}_bucket{_fmt_labels(labels, [('le', '+Inf')])} {cumulative}")
+            lines.append(f"{PREFIX}{name}_sum{_fmt_labels(labels)} {total:.6g}")
+            lines.append(f"{PREFIX}{name}_count{_fmt_labels(labels)} {cumulative}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,129 @@
+import os
+import time
+import logging
+import threading
+import metrics
+from http_session import get_session
+from utils import env_flag
+
+logger = logging.getLogger(__name__)
+
+# Prontidão do modelo no Ollama: a checagem em /api/tags (e o /api/pull, se faltar)
+# vale por OLLAMA_READY_TTL segundos para cada host+modelo, em vez de rodar a cada
+# detecção. O preload na subida do serviço carrega os pesos na memória e o
+# keep_alive enviado em toda geração os mantém lá entre um job e outro.
+_READY = {}   # (host:porta, modelo) -> instante (monotonic) em que a checagem expira
+_LOCKS = {}   # (host:porta, modelo) -> lock: jobs simultâneos esperam uma única checagem/pull
+_LOCKS_GUARD = threading.Lock()
+
+def base_url() -> str:
+    return f"http://{os.getenv('OLLAMA_HOSTNAME')}:{os.getenv('OLLAMA_PORT')}"
+
+def ready_ttl() -> float:
+    return float(os.getenv("OLLAMA_READY_TTL", "300"))
+
+def keep_alive():
+    """OLLAMA_KEEP_ALIVE no formato do Ollama ("30m", "24h", segundos; -1 = sempre); None = padrão do servidor."""
+    value = os.getenv("OLLAMA_KEEP_ALIVE", "30m").strip()
+    if not value:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        return value
+
+def _key(model=None):
+    return base_url(), model or os.getenv("OLLAMA_MODEL")
+
+def _lock_for(key) -> threading.Lock:
+    with _LOCKS_GUARD:
+        return _LOCKS.setdefault(key, threading.Lock())
+
+def is_ready(model=None) -> bool:
+    return _READY.get(_key(model), 0.0) > time.monotonic()
+
+def invalidate(model=None):
+    """Esquece a checagem (ex.: o Ollama respondeu 404 para o modelo); a próxima chamada consulta de novo."""
+    _READY.pop(_key(model), None)
+
+def load_seconds(data: dict):
+    """load_duration (ns) da resposta final do Ollama em segundos; None se o servidor não informou."""
+    load = data.get("load_duration")
+    return load / 1e9 if load is not None else None
+
+def ensure_model(model=None) -> bool:
+    """Modelo disponível no host atual (baixa se faltar); resultado positivo fica em cache pelo TTL."""
+    key = _key(model)
+    if is_ready(model):
+        return True
+    with _lock_for(key):
+        if is_ready(model):  # outro job acabou de checar
+            return True
+        with metrics.span("llm_ready_check", backend="ollama", model=key[1]) as attrs:
+            ready = _check_and_pull(*key)
+            attrs["ready"] = ready
+        if ready:
+            _READY[key] = time.monotonic() + ready_ttl()
+        return ready
+
+def _has_model(url: str, model: str) -> bool:
+    response = get_session().get(f"{url}/api/tags", timeout=60)
+    response.raise_for_status()
+    return any(m.get("name") == model for m in response.json().get("models", []))
+
+def _check_and_pull(url: str, model: str) -> bool:
+    try:
+        logger.info(f"Verificando se modelo '{model}' já está disponível no Ollama...")
+        if _has_model(url, model):
+            logger.info(f"Modelo '{model}' já está disponível!")
+            return True
+        logger.info(f"Modelo '{model}' não encontrado, tentando baixar automaticamente...")
+        pull_resp = get_session().post(f"{url}/api/pull", json={"name": model}, timeout=600)
+        pull_resp.raise_for_status()
+        logger.info(f"Download do modelo '{model}' iniciado. Aguardando concluir...")
+        for _ in range(60):
+            if _has_model(url, model):
+                logger.info(f"Modelo '{model}' agora está disponível!")
+                return True
+            time.sleep(5)
+        logger.error(f"Não foi possível baixar o modelo '{model}' em tempo hábil.")
+        return False
+    except Exception as e:
+        logger.error(f"Erro ao checar/baixar modelo '{model}': {e}")
+        return False
+
+# --------------------------
+# Preload (subida do serviço / início do lote)
+# --------------------------
+def preload(model=None) -> bool:
+    """
+    Garante o modelo e o carrega na memória com uma geração vazia (só carga, sem tokens),
+    já com o keep_alive; a primeira detecção de verdade encontra o modelo quente.
+    """
+    model = model or os.getenv("OLLAMA_MODEL")
+    if not ensure_model(model):
+        return False
+    payload = {"model": model, "stream": False}
+    if keep_alive() is not None:
+        payload["keep_alive"] = keep_alive()
+    try:
+        with metrics.span("llm_preload", backend="ollama", model=model) as attrs:
+            response = get_session().post(f"{base_url()}/api/generate", json=payload,
+                                          timeout=int(os.getenv("OLLAMA_TIMEOUT", "2400")))
+            response.raise_for_status()
+            metrics.record_llm(attrs, "ollama", load_seconds=load_seconds(response.json()))
+        logger.info(f"Modelo '{model}' carregado no Ollama (keep_alive={keep_alive()}).")
+        return True
+    except Exception as e:
+        logger.warning(f"Preload do modelo '{model}' falhou: {e}")
+        return False
+
+def preload_async(model=None) -> threading.Thread:
+    """preload numa thread daemon: a subida do serviço não espera o modelo carregar."""
+    thread = threading.Thread(target=preload, args=(model,), name="ollama-preload", daemon=True)
+    thread.start()
+    return thread
+
+def preload_enabled() -> bool:
+    """OLLAMA_PRELOAD (padrão true); sem efeito com USE_CHATGPT=true."""
+    return env_flag("OLLAMA_PRELOAD", "true") and not env_flag("USE_CHATGPT")
@@ -0,0 +1,462 @@
+"""
+Pipeline em processo: extração de áudio → transcrição → detecção → (classificação) → corte.
+
+Cada etapa é uma função importável com entrada/saída tipadas; transcrição e
+highlights trafegam em memória entre as etapas. `run_pipeline` executa um job
+completo no processo atual, sem subprocessos por etapa; os workers da fila
+(job_queue.py) chamam `run_pipeline_safe`.
+"""
+import os
+import time
+import logging
+import traceback
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import List, Optional, TypedDict
+
+from utils import env_flag, update_status
+from ffmpeg_utils import AUDIO_FORMATS, extract_audio_track
+from disk_cache import hash_file
+import transcript_cache
+from transcript import Transcript, timings_path_for
+import transcreve_whisper
+import detect_highlight
+import classify_segments
+import filter_highlights
+import cut_highlight
+import metrics
+from manifest import JobManifest, env_fingerprint, file_identity, fingerprint
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = Path(__file__).parent
+
+# --------------------------
+# Tipos
+# --------------------------
+class Highlight(TypedDict, total=False):
+    start: float
+    end: float
+    score: int
+    text: str
+
+@dataclass
+class JobRequest:
+    video_path: str
+    output_dir: str
+    job_id: str
+    prompt_path: Optional[str] = None
+    cut_mode: Optional[str] = None
+    video_hash: Optional[str] = None  # sha256 do vídeo (calculado no upload, se disponível)
+    prompt_hash: Optional[str] = None  # sha256 do prompt (deduplicação de uploads repetidos)
+    audio_path: Optional[str] = None  # áudio já extraído durante o upload (INGEST_MODE=pipelined)
+
+@dataclass
+class JobResult:
+    job_id: str
+    ok: bool = False
+    error: Optional[str] = None
+    audio_path: Optional[str] = None
+    transcript: Optional[Transcript] = None
+    regions: List[dict] = field(default_factory=list)  # pré-pontuação do áudio
+    highlights: List[Highlight] = field(default_factory=list)
+    clips: List[str] = field(default_factory=list)
+
+# --------------------------
+# Limites de concorrência por recurso
+# --------------------------
+# Jobs concorrentes no mesmo processo disputam Whisper, LLM e CPU (ffmpeg);
+# cada etapa pega uma vaga do seu recurso antes de rodar.
+STAGE_LIMITS = {
+    "asr": threading.BoundedSemaphore(int(os.getenv("STAGE_LIMIT_ASR", "1"))),
+    "llm": threading.BoundedSemaphore(int(os.getenv("STAGE_LIMIT_LLM", "1"))),
+    "encode": threading.BoundedSemaphore(int(os.getenv("STAGE_LIMIT_ENCODE", "1"))),
+}
+
+@contextmanager
+def stage_slot(*resources):
+    acquired = []
+    try:
+        for name in resources:
+            STAGE_LIMITS[name].acquire()
+            acquired.append(name)
+        yield
+    finally:
+        for name in reversed(acquired):
+            STAGE_LIMITS[name].release()
+
+@contextmanager
+def stage(name, *resources):
+    """Vaga nos recursos + span da etapa; a espera pela vaga vira um span `slot_wait` à parte."""
+    waiting = time.perf_counter()
+    with stage_slot(*resources):
+        if resources:
+            metrics.record_span("slot_wait", time.perf_counter() - waiting, resource="+".join(resources), stage=name)
+        with metrics.span(name) as attrs:
+            yield attrs
+
+# --------------------------
+# Helpers
+# --------------------------
+def safe_delete(filepath):
+    if os.path.exists(filepath):
+        try:
+            os.remove(filepath)
+            print(f"Arquivo deletado: {filepath}")
+        except Exception as e:
+            print(f"Erro ao deletar {filepath}: {e}")
+
+def resolve_prompt_path_or_fallback(prompt_path_cli: str | None) -> str:
+    """Resolve o caminho do prompt a usar no detect_highlight.py."""
+    if prompt_path_cli:
+        p = Path(prompt_path_cli)
+        if p.exists():
+            return str(p.resolve())
+        # se foi passado mas não existe, apenas logaremos e seguiremos pro fallback
+        print(f"[WARN] Prompt informado não encontrado: {prompt_path_cli}")
+
+    # tenta default.txt em app/prompts/detect_highlight
+    p_default = BASE_DIR / "prompts" / "detect_highlight" / "default.txt"
+    if p_default.exists():
+        return str(p_default.resolve())
+
+    # fallback legado
+    legacy = BASE_DIR / "prompts" / "prompt_detect_highlight.txt"
+    return str(legacy)  # pode não existir; detect_highlight.py vai acusar se faltar
+
+# --------------------------
+# Etapas
+# --------------------------
+def extrair_audio(video_path, audio_path=None, audio_format=None):
+    """
+    Extrai o áudio pronto para o ASR (mono 16 kHz).
+    AUDIO_FORMAT: opus (padrão, .ogg) | wav (PCM 16-bit) | mp3 (caminho legado via MoviePy).
+    """
+    audio_format = (audio_format or os.getenv("AUDIO_FORMAT", "opus")).strip().lower()
+    if audio_format in AUDIO_FORMATS:
+        if not audio_path:
+            audio_path = os.path.splitext(video_path)[0] + AUDIO_FORMATS[audio_format][0]
+        try:
+            extract_audio_track(video_path, audio_path, audio_format)
+            print(f"Áudio extraído para: {audio_path}")
+            return audio_path
+        except Exception as e:
+            print(f"[WARN] Falha ao extrair áudio com ffmpeg ({e}); usando MoviePy (mp3).")
+            audio_path = None
+
+    from moviepy.editor import VideoFileClip
+    if not audio_path:
+        audio_path = os.path.splitext(video_path)[0] + ".mp3"
+    video = VideoFileClip(video_path)
+    video.audio.write_audiofile(audio_path)
+    video.close()
+    print(f"Áudio extraído para: {audio_path}")
+    return audio_path
+
+def transcribe(audio_path: str, video_hash: Optional[str] = None) -> Transcript:
+    """
+    Transcreve o áudio no Whisper (ou recupera do cache pelo hash do áudio);
+    grava o .srt ao lado do áudio e retorna os segmentos.
+    """
+    srt_path = os.path.splitext(audio_path)[0] + ".srt"
+    segments, cache_key = transcript_cache.lookup_audio(audio_path)
+    if segments is None:
+        data = transcreve_whisper.request_transcription(audio_path)
+        if not transcreve_whisper.has_segments(data):
+            raise RuntimeError(f"Transcrição sem segmentos com tempo para {audio_path}")
+        segments = data["segments"]
+        transcript_cache.store(cache_key, segments, video_hash)
+    elif video_hash:
+        transcript_cache.store(cache_key, segments, video_hash)
+    transcreve_whisper.save_as_srt(segments, srt_path)
+    transcript = Transcript.from_segments(segments, srt_path)
+    transcript.save_timings(timings_path_for(srt_path))  # tempos de palavras para o ajuste dos cortes
+    return transcript
+
+def cached_transcript_for_video(video_path: str, video_hash: Optional[str]) -> Optional[Transcript]:
+    """Transcrição já conhecida para este vídeo (pula extração de áudio e ASR)."""
+    segments = transcript_cache.lookup_video(video_hash)
+    if segments is None:
+        return None
+    srt_path = os.path.splitext(video_path)[0] + ".srt"
+    transcreve_whisper.save_as_srt(segments, srt_path)
+    transcript = Transcript.from_segments(segments, srt_path)
+    transcript.save_timings(timings_path_for(srt_path))  # tempos de palavras para o ajuste dos cortes
+    return transcript
+
+def prescore(media_path: str, transcript: Transcript) -> list:
+    """Regiões candidatas pelo áudio (DETECT_PRESCORE); falha não impede a detecção."""
+    try:
+        import audio_analysis  # NumPy só é necessário com a pré-pontuação ligada
+        return audio_analysis.candidate_regions(media_path, transcript)
+    except Exception as e:
+        logger.warning(f"Pré-pontuação do áudio indisponível ({e}); enviando a transcrição inteira.")
+        return []
+
+def detect(transcript: Transcript, prompt_template: str, regions: Optional[list] = None) -> List[Highlight]:
+    logger.info(f"Duração estimada: {transcript.duration:.2f} segundos")
+    return detect_highlight.detect_highlights(transcript.text, transcript.duration, prompt_template,
+                                              transcript.cues(), regions)
+
+def classify(transcript: Transcript, highlights: List[Highlight]) -> List[Highlight]:
+    """Reclassifica os highlights (nota 0 a 10) e aplica o MIN_SCORE antes de qualquer corte."""
+    classified, ignored = classify_segments.classify_highlights(highlights, transcript)
+    kept = filter_highlights.filter_by_score(classified, classify_segments.min_score())
+    logger.info(f"Classificação: {len(kept)}/{len(highlights)} cortes com nota >= {classify_segments.min_score()}"
+                f" ({ignored} sem texto)")
+    return kept
+
+def cut(video_path: str, highlights: List[Highlight], job_id=None, output_dir=None, cut_mode=None,
+        timings: Optional[Transcript] = None, video_hash: Optional[str] = None) -> List[str]:
+    return cut_highlight.cut_video_segments(video_path, highlights, job_id, output_dir, cut_mode=cut_mode,
+                                            timings=timings, video_hash=video_hash)
+
+def detect_and_cut_streaming(video_path: str, transcript: Transcript, prompt_template: str,
+                             job_id=None, output_dir=None, cut_mode=None, regions: Optional[list] = None,
+                             video_hash: Optional[str] = None):
+    """
+    Detecção em stream com corte sobreposto: cada highlight é enviado ao pool de
+    render assim que o modelo termina de gerá-lo. Retorna (highlights, clips).
+    """
+    renderer = cut_highlight.ClipRenderer(video_path, job_id, output_dir, cut_mode=cut_mode, background=True,
+                                          timings=transcript, video_hash=video_hash)
+    cues = transcript.cues()
+    highlights = []
+    # com classificação, os highlights são pontuados em paralelo (em grupos de
+    # CLASSIFY_BATCH_SIZE) e só vão para o render se passarem no MIN_SCORE
+    # (submetidos na ordem de detecção)
+    classify_pool = None
+    if classify_segments.classify_enabled():
+        classify_pool = ThreadPoolExecutor(max_workers=classify_segments.classify_concurrency())
+        prompt_path = os.getenv("CLASSIFY_PROMPT_PATH", classify_segments.DEFAULT_PROMPT)
+        classify_template = classify_segments.load_prompt_from_file(prompt_path)
+        batch_size = classify_segments.classify_batch_size()
+        batch_template = classify_segments.load_batch_template() if batch_size > 1 else None
+    pending = deque()  # (highlight, future do grupo, posição no grupo)
+    batch = []         # highlights aguardando completar o grupo
+
+    def score(group):
+        texts = [classify_segments.get_text_for_segment(transcript, float(h["start"]), float(h["end"]))
+                 for h in group]
+        with_text = [i for i, t in enumerate(texts) if t.strip()]
+        scores = [None] * len(group)
+        if with_text:
+            found_scores = classify_segments.score_texts([texts[i] for i in with_text], classify_template,
+                                                        batch_template)
+            for i, value in zip(with_text, found_scores):
+                scores[i] = value
+        return scores
+
+    def submit_batch():
+        if not batch:
+            return
+        group = list(batch)
+        batch.clear()
+        future = classify_pool.submit(metrics.carry_job(score), group)
+        pending.extend((h, future, i) for i, h in enumerate(group))
+
+    def drain(wait=False):
+        while pending and (wait or pending[0][1].done()):
+            h, future, i = pending.popleft()
+            try:
+                h["score"] = future.result()[i]
+            except Exception as e:
+                logger.error(f"Falha ao classificar corte {h['start']}-{h['end']}s: {e}")
+                continue
+            if h["score"] is not None and h["score"] >= classify_segments.min_score():
+                highlights.append(h)
+                renderer.submit(h)
+
+    found = 0
+    try:
+        for h in detect_highlight.detect_highlights_stream(
+                transcript.text, transcript.duration, prompt_template, cues, regions):
+            found += 1
+            if classify_pool is None:
+                highlights.append(h)
+                renderer.submit(h)
+            else:
+                batch.append(h)
+                if len(batch) >= batch_size:
+                    submit_batch()
+                drain()
+            update_status(job_id, f"Detectando highlights e cortando ({found} encontrados)...", 40, output_dir)
+        if classify_pool is not None:
+            submit_batch()
+        drain(wait=True)
+    finally:
+        if classify_pool is not None:
+            classify_pool.shutdown(wait=True)
+        clips = renderer.finish()
+    return highlights, clips
+
+# --------------------------
+# Runner
+# --------------------------
+def run_pipeline(req: JobRequest) -> JobResult:
+    """
+    Executa o job; etapas e chamadas externas ficam registradas em `metrics` sob o job_id.
+    O manifesto do job (manifest.py) guarda o que cada etapa produziu: uma nova execução
+    do mesmo job (retry, restart depois de queda) retoma da primeira etapa incompleta.
+    """
+    job_manifest = JobManifest(req.output_dir, req.job_id)
+    with metrics.bind_job(req.job_id), metrics.span("job") as attrs:
+        try:
+            result = _run_stages(req, job_manifest)
+        except Exception as e:
+            job_manifest.finish(False, str(e))
+            raise
+        job_manifest.finish(result.ok, result.error)
+        attrs["ok"] = result.ok
+    metrics.inc("jobs_total", status="done" if result.ok else "failed")
+    return result
+
+def _run_stages(req: JobRequest, job_manifest: JobManifest) -> JobResult:
+    job_id, output_dir = req.job_id, req.output_dir
+    result = JobResult(job_id=job_id)
+    uploads_dir = Path(req.video_path).parent  # vídeo e prompt customizado do upload também são intermediários
+    job_manifest.begin([p for p in (req.video_path, req.prompt_path) if p and Path(p).parent == uploads_dir])
+    if job_manifest.data["attempts"] > 1:
+        logger.info(f"Job {job_id}: tentativa {job_manifest.data['attempts']}, retomando do manifesto")
+
+    # resolve prompt (arquivo)
+    prompt_path_resolved = resolve_prompt_path_or_fallback(req.prompt_path)
+    print(f"[detect_highlight] usando prompt: {prompt_path_resolved}")
+
+    base_name = os.path.splitext(req.video_path)[0]
+    video_hash = req.video_hash
+    if video_hash is None and transcript_cache.enabled():
+        video_hash = hash_file(req.video_path)
+
+    # impressões digitais encadeadas: mudar a entrada de uma etapa invalida ela e as seguintes
+    source = {"video": video_hash} if video_hash else file_identity(req.video_path)
+    fp_extract = fingerprint("extract", source, os.getenv("AUDIO_FORMAT", "opus"))
+    fp_transcribe = fingerprint("transcribe", fp_extract, transcript_cache.asr_cache_params())
+
+    # 1. Extrai áudio (pulado se a transcrição deste vídeo já está no cache ou no manifesto)
+    update_status(job_id, "Extraindo áudio...", 5, output_dir)
+    done = job_manifest.completed("transcribe", fp_transcribe)
+    if done:
+        result.transcript = Transcript.load_timings(done["timings_path"])
+        result.transcript.srt_path = done["srt_path"]
+        result.audio_path = (job_manifest.completed("extract", fp_extract) or {}).get("audio_path")
+        update_status(job_id, "Transcrição retomada do manifesto...", 20, output_dir)
+    else:
+        result.transcript = cached_transcript_for_video(req.video_path, video_hash)
+        if result.transcript is not None:
+            update_status(job_id, "Transcrição recuperada do cache...", 20, output_dir)
+        else:
+            done = job_manifest.completed("extract", fp_extract)
+            if done:
+                result.audio_path = done["audio_path"]
+            elif req.audio_path and os.path.exists(req.audio_path):
+                result.audio_path = req.audio_path  # extraído em paralelo com o upload
+            else:
+                with stage("extract", "encode"):
+                    result.audio_path = extrair_audio(req.video_path)
+            job_manifest.record("extract", fp_extract, {"audio_path": result.audio_path}, [result.audio_path])
+
+            # 2. Transcreve áudio (cache pelo hash do áudio antes de chamar o Whisper)
+            update_status(job_id, "Transcrevendo áudio...", 20, output_dir)
+            try:
+                with stage("transcribe", "asr"):
+                    result.transcript = transcribe(result.audio_path, video_hash)
+            except Exception as e:
+                result.error = str(e)
+                update_status(job_id, f"Arquivo {base_name}.srt não encontrado! Falhou.", 100, output_dir)
+                return result
+        srt_path = result.transcript.srt_path
+        job_manifest.record("transcribe", fp_transcribe,
+                            {"srt_path": srt_path, "timings_path": timings_path_for(srt_path)},
+                            [srt_path, timings_path_for(srt_path)])
+
+    # 3. Detecta highlights (4. e corta: em stream, os cortes começam durante a geração)
+    streaming = env_flag("DETECT_STREAM")
+    if detect_highlight.prescore_mode() != "off":
+        fp_prescore = fingerprint("prescore", fp_transcribe, env_fingerprint("PRESCORE_", "DETECT_PRESCORE"))
+        done = job_manifest.completed("prescore", fp_prescore)
+        if done:
+            result.regions = done["regions"]
+        else:
+            update_status(job_id, "Analisando o áudio...", 35, output_dir)
+            with stage("prescore", "encode"):
+                result.regions = prescore(result.audio_path or req.video_path, result.transcript)
+            job_manifest.record("prescore", fp_prescore, {"regions": result.regions})
+    update_status(job_id, "Detectando highlights...", 40, output_dir)
+    highlight_path = base_name + ".highlight.json"
+    try:
+        prompt_template = detect_highlight.resolve_prompt_text(prompt_path_resolved, None)
+        fp_detect = fingerprint("detect", fp_transcribe, result.regions, prompt_template, streaming,
+                                env_fingerprint("USE_CHATGPT", "OLLAMA_", "CHATGPT_", "DETECT_", "CLASSIFY_",
+                                                "MIN_SCORE"))
+        fp_cut = fingerprint("cut", fp_detect, req.cut_mode, env_fingerprint("CUT_", "SCENE_"))
+        done = job_manifest.completed("detect", fp_detect)
+        if done:
+            result.highlights = done["highlights"]
+            update_status(job_id, f"{len(result.highlights)} highlight(s) retomados do manifesto...", 60, output_dir)
+        elif streaming:
+            with stage("detect_cut", "llm", "encode"):
+                result.highlights, result.clips = detect_and_cut_streaming(
+                    req.video_path, result.transcript, prompt_template, job_id, output_dir, req.cut_mode,
+                    result.regions, video_hash)
+            job_manifest.record("cut", fp_cut, {"clips": result.clips}, result.clips, intermediate=False)
+        else:
+            with stage("detect", "llm") as attrs:
+                result.highlights = detect(result.transcript, prompt_template, result.regions)
+                attrs["highlights"] = len(result.highlights)
+                if classify_segments.classify_enabled():
+                    update_status(job_id, "Classificando cortes...", 60, output_dir)
+                    with metrics.span("classify"):
+                        result.highlights = classify(result.transcript, result.highlights)
+        if not done:
+            detect_highlight.save_highlights(result.highlights, highlight_path)
+            job_manifest.record("detect", fp_detect, {"highlights": result.highlights}, [highlight_path])
+    except Exception as e:
+        logger.error(f"Falha na detecção de highlights: {e}")
+        result.error = str(e)
+        update_status(job_id, "Detecção de highlights falhou!", 100, output_dir)
+        return result
+
+    # 4. Corta vídeo (pulado se os clipes destes highlights já estão prontos)
+    done = job_manifest.completed("cut", fp_cut)
+    if done:
+        result.clips = done["clips"]
+    elif not result.clips:
+        update_status(job_id, "Cortando vídeo...", 80, output_dir)
+        with stage("cut", "encode") as attrs:
+            result.clips = cut(req.video_path, result.highlights, job_id, output_dir, req.cut_mode,
+                               timings=result.transcript, video_hash=video_hash)
+            attrs["clips"] = len(result.clips)
+        job_manifest.record("cut", fp_cut, {"clips": result.clips}, result.clips, intermediate=False)
+
+    # 5. Limpa arquivos intermediários (só aqui, com o job concluído; falhas mantêm tudo para o retry)
+    update_status(job_id, "Finalizando e limpando arquivos...", 95, output_dir)
+    cleanup_intermediates(req.video_path)
+
+    update_status(job_id, "Concluído!", 100, output_dir)
+    print("Processamento concluído!")
+    result.ok = True
+    return result
+
+def cleanup_intermediates(video_file):
+    job_prefix = Path(video_file).stem
+    uploads_dir = Path(video_file).parent
+
+    # áudio, .srt, .highlight.json, .classified.json, .filtered.json e o próprio vídeo
+    for f in uploads_dir.glob(f"{job_prefix}*"):
+        safe_delete(str(f))
+    safe_delete(video_file)
+
+def run_pipeline_safe(req: JobRequest) -> JobResult:
+    """run_pipeline sem deixar exceções escaparem (status do job marcado como falho)."""
+    try:
+        return run_pipeline(req)
+    except Exception as e:
+        traceback.print_exc()
+        metrics.inc("jobs_total", status="failed")
+        update_status(req.job_id, f"Falhou: {e}", 100, req.output_dir)
+        return JobResult(job_id=req.job_id, error=str(e))
@@ -0,0 +1,159 @@
+import os
+import logging
+import subprocess
+from array import array
+from bisect import bisect_left
+
+import numpy as np
+
+from disk_cache import DiskCache, hash_json
+from ffmpeg_utils import ffmpeg_bin, keyframe_at_or_after
+
+logger = logging.getLogger(__name__)
+
+# Índice de trocas de cena: decode em baixa resolução/baixo fps (tons de cinza,
+# sem loop filter e sem quadros não-referência), diferença entre quadros + distância
+# de histograma vetorizadas em NumPy. Calculado uma vez por vídeo e guardado no cache.
+_CACHE = None
+
+def get_cache() -> DiskCache:
+    global _CACHE
+    if _CACHE is None:
+        max_mb = float(os.getenv("SCENE_CACHE_MAX_MB", "32"))
+        _CACHE = DiskCache("scenes", int(max_mb * 1024 * 1024))
+    return _CACHE
+
+def scene_params() -> dict:
+    return {
+        "fps": float(os.getenv("SCENE_FPS", "4")),
+        "width": int(os.getenv("SCENE_WIDTH", "64")),
+        "height": int(os.getenv("SCENE_HEIGHT", "36")),
+        "threshold": float(os.getenv("SCENE_THRESHOLD", "0.15")),
+        "min_scene": float(os.getenv("SCENE_MIN_SECONDS", "1.0")),
+    }
+
+class SceneIndex:
+    """Tempos das trocas de cena (ordenados); `on_keyframe` marca as que caem num keyframe."""
+    def __init__(self, boundaries, on_keyframe=None):
+        self.boundaries = array("d", boundaries)
+        self.on_keyframe = list(on_keyframe or [False] * len(self.boundaries))
+
+    def to_json(self) -> dict:
+        return {"boundaries": list(self.boundaries), "on_keyframe": self.on_keyframe}
+
+    @classmethod
+    def from_json(cls, data: dict) -> "SceneIndex":
+        return cls(data.get("boundaries", []), data.get("on_keyframe"))
+
+    def nearest(self, t: float, max_shift: float):
+        """Troca de cena mais próxima de `t` (até `max_shift`s), preferindo as alinhadas a keyframe."""
+        lo = bisect_left(self.boundaries, t - max_shift)
+        hi = bisect_left(self.boundaries, t + max_shift + 1e-9)
+        if lo >= hi:
+            return None
+        candidates = range(lo, hi)
+        keyed = [i for i in candidates if self.on_keyframe[i]]
+        best = min(keyed or candidates, key=lambda i: abs(self.boundaries[i] - t))
+        return self.boundaries[best]
+
+    def snap(self, start: float, end: float, max_shift: float = 0.5):
+        """Início/fim movidos para a troca de cena próxima: o clipe começa no 1º quadro da nova cena e termina antes da próxima."""
+        new_start = self.nearest(start, max_shift)
+        new_end = self.nearest(end, max_shift)
+        new_start = start if new_start is None else new_start
+        new_end = end if new_end is None else new_end
+        return (new_start, new_end) if new_end > new_start else (start, end)
+
+def decode_small_frames(video_path, fps: float, width: int, height: int, block_frames: int = 1024):
+    """Quadros em cinza `height`x`width` a `fps` quadros/s, em blocos (n, h, w) uint8."""
+    cmd = [ffmpeg_bin(), "-hide_banner", "-loglevel", "error", "-nostdin",
+           "-skip_frame", "nonref", "-skip_loop_filter", "all", "-flags2", "+fast",
+           "-i", str(video_path), "-map", "0:v:0", "-an", "-sn",
+           "-vf", f"fps={fps},scale={width}:{height}:flags=area,format=gray",
+           "-f", "rawvideo", "pipe:1"]
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    frame_size = width * height
+    try:
+        while True:
+            raw = proc.stdout.read(frame_size * block_frames)
+            n = len(raw) // frame_size
+            if n == 0:
+                break
+            yield np.frombuffer(raw[:n * frame_size], dtype=np.uint8).reshape(n, height, width)
+    finally:
+        proc.stdout.close()
+        if proc.wait() != 0:
+            raise RuntimeError(f"ffmpeg falhou ao decodificar quadros de {video_path}")
+
+def frame_distances(frames: np.ndarray, bins: int = 16) -> np.ndarray:
+    """Distância entre quadros consecutivos em [0, 1]: média da diferença absoluta + distância L1 dos histogramas."""
+    if len(frames) < 2:
+        return np.zeros(0)
+    flat = frames.reshape(len(frames), -1).astype(np.int16)
+    pixel = np.abs(np.diff(flat, axis=0)).mean(axis=1) / 255.0
+    idx = (flat // (256 // bins)) + bins * np.arange(len(frames))[:, None]
+    hist = np.bincount(idx.ravel(), minlength=bins * len(frames)).reshape(len(frames), bins) / flat.shape[1]
+    histo = np.abs(np.diff(hist, axis=0)).sum(axis=1) / 2.0
+    return 0.5 * pixel + 0.5 * histo
+
+def detect_boundaries(distances: np.ndarray, fps: float, threshold: float, min_scene: float) -> list:
+    """Índices (do 2º quadro do par) onde há troca de cena: acima do limiar e de um limiar adaptativo local."""
+    if distances.size == 0:
+        return []
+    med = np.median(distances)
+    mad = np.median(np.abs(distances - med)) * 1.4826
+    adaptive = np.maximum(threshold, med + 6 * mad)
+    # pico local (evita marcar vários quadros seguidos de uma transição)
+    padded = np.concatenate([[0.0], distances, [0.0]])
+    peaks = (distances >= padded[:-2]) & (distances >= padded[2:]) & (distances > adaptive)
+    min_gap = max(1, int(round(min_scene * fps)))
+    boundaries, last = [], -min_gap
+    for i in np.flatnonzero(peaks):
+        if i - last >= min_gap:
+            boundaries.append(int(i) + 1)
+            last = i
+    return boundaries
+
+def build_scene_index(video_path, keyframes=None, params=None) -> SceneIndex:
+    params = params or scene_params()
+    fps = params["fps"]
+    parts, last, n_frames = [], None, 0
+    for block in decode_small_frames(video_path, fps, params["width"], params["height"]):
+        frames = block if last is None else np.concatenate([last, block])
+        parts.append(frame_distances(frames))
+        last = block[-1:]
+        n_frames += len(block)
+    distances = np.concatenate(parts) if parts else np.zeros(0)
+    idx = detect_boundaries(distances, fps, params["threshold"], params["min_scene"])
+    boundaries, on_keyframe = [], []
+    for i in idx:
+        # a troca acontece entre os quadros amostrados i-1 e i; um keyframe nesse
+        # intervalo (encoders costumam pôr IDR na troca de cena) dá o tempo exato
+        t_prev, t = (i - 1) / fps, i / fps
+        key = keyframe_at_or_after(keyframes, t_prev + 1e-6) if keyframes else None
+        if key is not None and key <= t + 1e-6:
+            boundaries.append(round(key, 3))
+            on_keyframe.append(True)
+        else:
+            boundaries.append(round(t, 3))
+            on_keyframe.append(False)
+    logger.info(f"Índice de cenas: {len(boundaries)} troca(s) em {n_frames} quadro(s) amostrados "
+                f"({sum(on_keyframe)} em keyframe)")
+    return SceneIndex(boundaries, on_keyframe)
+
+def get_scene_index(video_path, video_hash=None, keyframes=None) -> SceneIndex:
+    """Índice do vídeo, do cache (hash do conteúdo ou caminho+tamanho+mtime) ou recém-calculado."""
+    params = scene_params()
+    if video_hash:
+        identity = {"video": video_hash}
+    else:
+        st = os.stat(video_path)
+        identity = {"path": os.path.abspath(video_path), "size": st.st_size, "mtime": st.st_mtime_ns}
+    key = hash_json({**identity, "params": params, "keyframes": bool(keyframes)})
+    cache = get_cache()
+    hit = cache.get(key)
+    if hit is not None:
+        return SceneIndex.from_json(hit)
+    index = build_scene_index(video_path, keyframes, params)
+    cache.set(key, index.to_json())
+    return index
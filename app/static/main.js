@@ -127,7 +127,7 @@ document.getElementById('uploadForm').addEventListener('submit', (e) => {
       uploadStatus.innerHTML = '<b>Upload concluído! Processando...</b>';
       progressBarFill.style.width = '100%';
       progressBarFill.textContent = '100%';
-      pollStatus();
+      watchStatus();
     } else {
       uploadStatus.innerHTML = '<b style="color:red;">Erro no upload</b>';
     }
@@ -135,29 +135,71 @@ document.getElementById('uploadForm').addEventListener('submit', (e) => {
   xhr.send(formData);
 });
 
+function showStatus(status) {
+  let info = '';
+  if (status.queue_position) info += ` (posição na fila: ${status.queue_position})`;
+  if (status.eta_seconds != null) info += ` — ETA ~${Math.ceil(status.eta_seconds / 60)} min`;
+  uploadStatus.innerHTML = `<b>${status.step}</b>${info}`;
+
+  if (status.progress > 0 && status.progress <= 100) {
+    progressBar.classList.remove('hidden');
+    progressBarFill.style.width = status.progress + '%';
+    progressBarFill.textContent = status.progress + '%';
+  }
+}
+
+function showHighlights(files) {
+  if (JSON.stringify(files) !== JSON.stringify(lastHighlights)) {
+    renderHighlights(files);
+    lastHighlights = files;
+  }
+}
+
+function finishStatus() {
+  uploadStatus.innerHTML = "<b>Processamento concluído!</b>";
+  setTimeout(() => window.location.reload(), 1200);
+}
+
+// Progresso empurrado pelo servidor (SSE); sem suporte ou com erro, volta ao polling
+function watchStatus() {
+  if (!jobId) return;
+  if (!window.EventSource) return pollStatus();
+
+  const source = new EventSource(`/events/${jobId}`);
+  let finished = false;
+  source.addEventListener('status', (e) => {
+    const status = JSON.parse(e.data);
+    showStatus(status);
+    if (status.highlights) showHighlights(status.highlights);
+    if (status.progress >= 100) {
+      finished = true;
+      source.close();
+      finishStatus();
+    }
+  });
+  source.addEventListener('clip', (e) => {
+    const { filename } = JSON.parse(e.data);
+    if (!lastHighlights.includes(filename)) showHighlights([...lastHighlights, filename]);
+  });
+  source.onerror = () => {
+    if (finished) return;
+    source.close();
+    pollStatus();
+  };
+}
+
 function pollStatus() {
   if (!jobId) return;
   fetch(`/status/${jobId}`)
     .then(res => res.json())
     .then(status => {
-      uploadStatus.innerHTML = `<b>${status.step}</b>`;
-
-      if (status.progress > 0 && status.progress <= 100) {
-        progressBar.classList.remove('hidden');
-        progressBarFill.style.width = status.progress + '%';
-        progressBarFill.textContent = status.progress + '%';
-      }
-
-      if (JSON.stringify(status.highlights) !== JSON.stringify(lastHighlights)) {
-        renderHighlights(status.highlights);
-        lastHighlights = status.highlights;
-      }
+      showStatus(status);
+      showHighlights(status.highlights);
 
       if (status.progress < 100 && status.step !== "Concluído") {
         setTimeout(pollStatus, 1500);
       } else {
-        uploadStatus.innerHTML = "<b>Processamento concluído!</b>";
-        setTimeout(() => window.location.reload(), 1200);
+        finishStatus();
       }
     });
 }
@@ -169,9 +211,9 @@ function renderHighlights(files) {
     grid.innerHTML += `
       <div class="relative border-2 border-darkborder bg-darkcontainer rounded-xl p-4 flex flex-col items-center w-full">
         <a class="text-blue-400 font-semibold underline hover:text-blueglow block text-center break-all text-sm mb-2"
-          href="/download/${f}" download>${f}</a>
+          href="/download/${jobId}/${f}" download>${f}</a>
         <video class="w-full rounded" style="aspect-ratio: 16 / 9; height:auto;" controls>
-          <source src="/download/${f}" type="video/mp4">
+          <source src="/download/${jobId}/${f}" type="video/mp4">
         </video>
       </div>
     `;
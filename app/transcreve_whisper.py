@@ -1,7 +1,13 @@
 import os
 import sys
+import re
+import time
 import logging
-import requests
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+import metrics
+from http_session import get_session
+from ffmpeg_utils import AUDIO_FORMATS, probe_duration, detect_silences, extract_audio_segment
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -22,7 +28,39 @@ def save_as_srt(segments, srt_path):
             f.write(f"{idx}\n{start} --> {end}\n{text}\n\n")
     logger.info(f"Legenda SRT salva em {srt_path}")
 
-def transcribe_audio_whisper(file_path):
+def asr_params():
+    return {
+        'task': 'transcribe',
+        'language': os.getenv('API_TRANSCRIBE_LANGUAGE', 'pt'),
+        'encode': 'true',
+        'output': 'json',
+        'word_timestamps': 'true',
+    }
+
+def post_asr(file_path, api_url, timeout):
+    """POST de um arquivo no /asr; levanta exceção em erro HTTP."""
+    headers = {'accept': 'application/json'}
+    upload_bytes = os.path.getsize(file_path)
+    metrics.observe("asr_upload_bytes", upload_bytes)
+    # span inteiro = envio + processamento no Whisper + download; `response_after` = até os cabeçalhos da resposta
+    with metrics.span("asr_request", endpoint=api_url, upload_bytes=upload_bytes) as attrs:
+        with open(file_path, 'rb') as audio_file:
+            files = {'audio_file': audio_file}
+            response = get_session().post(api_url, params=asr_params(), headers=headers, files=files, timeout=timeout)
+        attrs.update(status=response.status_code, response_bytes=len(response.content),
+                     response_after=round(response.elapsed.total_seconds(), 4))
+    if response.status_code != 200:
+        raise RuntimeError(f"Status {response.status_code}. Resposta: {response.text}")
+    try:
+        return response.json()
+    except ValueError:
+        return {"text": response.text}
+
+def request_transcription(file_path):
+    """Envia o áudio para o /asr e retorna o JSON da resposta (ou None em caso de falha)."""
+    if os.getenv("ASR_MODE", "single").strip().lower() == "chunked":
+        return request_transcription_chunked(file_path)
+
     # Lê configs do ENV
     API_TRANSCRIBE_URL = os.getenv("API_TRANSCRIBE_URL", "localhost")
     API_TRANSCRIBE_PORT = os.getenv("API_TRANSCRIBE_PORT", "9000")
@@ -33,43 +71,174 @@ def transcribe_audio_whisper(file_path):
     logger.info(f"Enviando {file_path} para {api_url}...")
 
     try:
-        headers = {'accept': 'application/json'}
-        params = {
-            'task': 'transcribe',
-            'language': 'pt',
-            'encode': 'true',
-            'output': 'json',
-            'word_timestamps': 'true',
-        }
-        with open(file_path, 'rb') as audio_file:
-            files = {'audio_file': audio_file}
-            response = requests.post(api_url, params=params, headers=headers, files=files, timeout=API_TRANSCRIBE_TIMEOUT)
-        
-        if response.status_code == 200:
-            data = response.json()
-            if "segments" in data and isinstance(data["segments"], list) and len(data["segments"]) > 0:
-                # Salva como SRT segmentado (com tempo!)
-                srt_path = os.path.splitext(file_path)[0] + ".srt"
-                save_as_srt(data["segments"], srt_path)
-                return srt_path
-            else:
-                # Fallback: só texto bruto, sem tempo
-                transcription = data.get("text", response.text)
-                sst_path = os.path.splitext(file_path)[0] + ".sst"
-                with open(sst_path, "w", encoding="utf-8") as f:
-                    f.write(transcription)
-                logger.info(f"Transcrição salva em {sst_path}")
-                return sst_path
-        else:
-            logger.error(f"Erro na transcrição: Status {response.status_code}. Resposta: {response.text}")
-            return None
+        return post_asr(file_path, api_url, API_TRANSCRIBE_TIMEOUT)
     except Exception as e:
         logger.error(f"Erro durante a transcrição: {e}")
         return None
 
+# --------------------------
+# Modo em chunks (ASR_MODE=chunked)
+# --------------------------
+def asr_endpoints() -> list:
+    """
+    API_TRANSCRIBE_ENDPOINTS="whisper1:9000,whisper2:9000" (opcional);
+    padrão: API_TRANSCRIBE_URL:API_TRANSCRIBE_PORT.
+    """
+    raw = os.getenv("API_TRANSCRIBE_ENDPOINTS", "").strip()
+    if raw:
+        hosts = [h.strip() for h in raw.split(",") if h.strip()]
+    else:
+        hosts = [f"{os.getenv('API_TRANSCRIBE_URL', 'localhost')}:{os.getenv('API_TRANSCRIBE_PORT', '9000')}"]
+    return [h if h.startswith("http") else f"http://{h}" for h in hosts]
+
+def plan_chunks(duration: float, silences: list, chunk_seconds: float, overlap: float) -> list:
+    """
+    Divide [0, duration] em chunks de até chunk_seconds, cortando no meio do último
+    silêncio da segunda metade de cada janela. Sem silêncio disponível, corta no
+    limite e sobrepõe `overlap` segundos com o próximo chunk.
+    Retorna [(início, fim), ...].
+    """
+    if chunk_seconds <= 0:
+        raise ValueError(f"ASR_CHUNK_SECONDS precisa ser positivo (recebido {chunk_seconds})")
+    # sobreposição ≥ chunk faria o corte sem silêncio nunca avançar
+    overlap = min(max(overlap, 0.0), chunk_seconds / 2)
+    chunks, pos = [], 0.0
+    mids = sorted((s + e) / 2 for s, e in silences)
+    while duration - pos > chunk_seconds:
+        limit = pos + chunk_seconds
+        candidates = [m for m in mids if pos + chunk_seconds / 2 <= m <= limit]
+        if candidates:
+            cut = candidates[-1]
+            chunks.append((pos, cut))
+            pos = cut
+        else:
+            chunks.append((pos, limit))
+            pos = limit - overlap
+    chunks.append((pos, duration))
+    return chunks
+
+def _normalize(text: str) -> str:
+    return re.sub(r"[^\w]+", " ", text.lower()).strip()
+
+def merge_chunk_segments(chunk_results: list) -> list:
+    """
+    Junta os segmentos dos chunks (já na ordem) corrigindo os offsets e removendo
+    texto duplicado nas emendas (trechos de sobreposição).
+    chunk_results: [(offset, segments), ...]
+    """
+    merged = []
+    last_end = 0.0
+    for offset, segments in chunk_results:
+        for seg in segments:
+            start = float(seg.get("start", 0)) + offset
+            end = float(seg.get("end", 0)) + offset
+            text = seg.get("text", "")
+            if merged:
+                # inteiro dentro da região já coberta → duplicado da emenda
+                if end <= last_end + 0.05:
+                    continue
+                prev = _normalize(merged[-1]["text"])
+                cur = _normalize(text)
+                if start < last_end and cur and (cur in prev or prev.endswith(cur)):
+                    continue
+                start = max(start, last_end)
+            words = [
+                {**w, "start": float(w.get("start", 0)) + offset, "end": float(w.get("end", 0)) + offset}
+                for w in seg.get("words") or []
+            ]
+            words = [w for w in words if w["end"] > start]
+            merged.append({**seg, "id": len(merged), "start": start, "end": end, "text": text, "words": words})
+            last_end = end
+    return merged
+
+def _transcribe_chunk(chunk_path, endpoints, first_endpoint, retries, timeout):
+    """Transcreve um chunk, com retry próprio e rodízio de endpoints."""
+    last_error = None
+    for attempt in range(retries + 1):
+        api_url = f"{endpoints[(first_endpoint + attempt) % len(endpoints)]}/asr"
+        try:
+            data = post_asr(chunk_path, api_url, timeout)
+            return data.get("segments") or []
+        except Exception as e:
+            last_error = e
+            logger.warning(f"Chunk {os.path.basename(chunk_path)} falhou em {api_url} "
+                           f"(tentativa {attempt + 1}/{retries + 1}): {e}")
+            if attempt < retries:
+                time.sleep(min(2 ** attempt, 30))
+    raise RuntimeError(f"Chunk {os.path.basename(chunk_path)} falhou após {retries + 1} tentativas: {last_error}")
+
+def request_transcription_chunked(file_path):
+    """
+    Divide o áudio em silêncios (chunks de até ASR_CHUNK_SECONDS), envia os chunks
+    em paralelo (ASR_CONCURRENCY) para um ou mais endpoints e junta o resultado.
+    Retorna o mesmo formato do /asr ({"segments": [...], "text": ...}) ou None.
+    """
+    chunk_seconds = float(os.getenv("ASR_CHUNK_SECONDS", "300"))
+    overlap = float(os.getenv("ASR_CHUNK_OVERLAP", "1.0"))
+    retries = int(os.getenv("ASR_CHUNK_RETRIES", "2"))
+    timeout = int(os.getenv("ASR_CHUNK_TIMEOUT", os.getenv("API_TRANSCRIBE_TIMEOUT", "2400")))
+    endpoints = asr_endpoints()
+    concurrency = int(os.getenv("ASR_CONCURRENCY", str(len(endpoints) * 2)))
+
+    try:
+        duration = probe_duration(file_path)
+        silences = detect_silences(
+            file_path,
+            float(os.getenv("ASR_SILENCE_DB", "-35")),
+            float(os.getenv("ASR_SILENCE_MIN", "0.4")),
+        )
+    except Exception as e:
+        logger.error(f"Erro ao analisar o áudio para chunking: {e}")
+        return None
+    chunks = plan_chunks(duration, silences, chunk_seconds, overlap)
+    logger.info(f"Transcrição em {len(chunks)} chunks (≤ {chunk_seconds:.0f}s) "
+                f"em {len(endpoints)} endpoint(s), concorrência {concurrency}")
+
+    fmt = os.getenv("AUDIO_FORMAT", "opus").strip().lower()
+    fmt = fmt if fmt in AUDIO_FORMATS else "opus"
+    ext = AUDIO_FORMATS[fmt][0]
+    with tempfile.TemporaryDirectory(prefix="asr_chunks_") as tmp:
+        @metrics.carry_job
+        def work(i):
+            start, end = chunks[i]
+            chunk_path = os.path.join(tmp, f"chunk{i:04d}{ext}")
+            with metrics.span("asr_chunk_extract", chunk=i):
+                extract_audio_segment(file_path, chunk_path, start, end - start, fmt)
+            return _transcribe_chunk(chunk_path, endpoints, i, retries, timeout)
+
+        try:
+            with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+                results = list(pool.map(work, range(len(chunks))))
+        except Exception as e:
+            logger.error(f"Erro durante a transcrição em chunks: {e}")
+            return None
+
+    segments = merge_chunk_segments([(chunks[i][0], segs) for i, segs in enumerate(results)])
+    return {"segments": segments, "text": " ".join(s.get("text", "").strip() for s in segments)}
+
+def has_segments(data) -> bool:
+    return bool(data) and isinstance(data.get("segments"), list) and len(data["segments"]) > 0
+
+def transcribe_audio_whisper(file_path):
+    data = request_transcription(file_path)
+    if data is None:
+        return None
+    if has_segments(data):
+        # Salva como SRT segmentado (com tempo!)
+        srt_path = os.path.splitext(file_path)[0] + ".srt"
+        save_as_srt(data["segments"], srt_path)
+        return srt_path
+    # Fallback: só texto bruto, sem tempo
+    transcription = data.get("text", "")
+    sst_path = os.path.splitext(file_path)[0] + ".sst"
+    with open(sst_path, "w", encoding="utf-8") as f:
+        f.write(transcription)
+    logger.info(f"Transcrição salva em {sst_path}")
+    return sst_path
+
 if __name__ == "__main__":
     if len(sys.argv) < 2:
-        print("Uso: python transcribe_audio_whisper.py caminho/do/audio.mp3")
+        print("Uso: python transcreve_whisper.py caminho/do/audio.(ogg|wav|mp3)")
         sys.exit(1)
-    mp3_path = sys.argv[1]
-    transcribe_audio_whisper(mp3_path)
+    audio_path = sys.argv[1]
+    transcribe_audio_whisper(audio_path)
@@ -0,0 +1,249 @@
+import os
+import re
+import sys
+import struct
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from typing import Iterable, List, Optional
+
+# Modelo único de transcrição: colunas start/end (array de double) + tabela de textos,
+# ordenadas por início. Consultas por intervalo de tempo usam busca binária nos
+# inícios e no máximo acumulado dos fins (cues podem se sobrepor), então custam
+# O(log n + cues no intervalo) mesmo com dezenas de milhares de cues.
+SRT_TIME = re.compile(r"(\d{2}):(\d{2}):(\d{2}),(\d{3})\s-->\s(\d{2}):(\d{2}):(\d{2}),(\d{3})")
+
+class Transcript:
+    __slots__ = ("starts", "ends", "texts", "_max_ends", "word_starts", "word_ends", "words",
+                 "segments", "srt_path")
+
+    def __init__(self, starts: Iterable[float], ends: Iterable[float], texts: Iterable[str],
+                 segments: Optional[List[dict]] = None, srt_path: Optional[str] = None,
+                 words: Optional[Iterable[tuple]] = None):
+        rows = sorted(zip(starts, ends, texts), key=lambda r: r[0])
+        self.starts = array("d", (r[0] for r in rows))
+        self.ends = array("d", (r[1] for r in rows))
+        self.texts = [r[2] for r in rows]
+        self._max_ends = array("d")
+        running = float("-inf")
+        for end in self.ends:
+            running = max(running, end)
+            self._max_ends.append(running)
+        # palavras (start, end, texto) ordenadas, quando o ASR devolve word_timestamps
+        word_rows = sorted(words or (), key=lambda w: w[0])
+        self.word_starts = array("d", (w[0] for w in word_rows))
+        self.word_ends = array("d", (w[1] for w in word_rows))
+        self.words = [w[2] for w in word_rows]
+        self.segments = segments  # segmentos brutos do ASR (cache), se houver
+        self.srt_path = srt_path
+
+    @classmethod
+    def from_segments(cls, segments: List[dict], srt_path: Optional[str] = None) -> "Transcript":
+        words = [(float(w.get("start", 0)), float(w.get("end", 0)), (w.get("word") or w.get("text") or "").strip())
+                 for s in segments for w in (s.get("words") or [])]
+        return cls((float(s.get("start", 0)) for s in segments),
+                   (float(s.get("end", 0)) for s in segments),
+                   (s.get("text", "").strip() for s in segments),
+                   segments=segments, srt_path=srt_path, words=words)
+
+    @classmethod
+    def from_cues(cls, cues: Iterable[tuple]) -> "Transcript":
+        cues = list(cues)
+        return cls((c[0] for c in cues), (c[1] for c in cues), (c[2] for c in cues))
+
+    @classmethod
+    def from_srt(cls, srt_path: str) -> "Transcript":
+        starts, ends, texts = [], [], []
+        current = None
+        with open(srt_path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                match = SRT_TIME.search(line)
+                if match:
+                    if current is not None:
+                        texts.append(" ".join(current))
+                    g = [int(x) for x in match.groups()]
+                    starts.append(g[0] * 3600 + g[1] * 60 + g[2] + g[3] / 1000.0)
+                    ends.append(g[4] * 3600 + g[5] * 60 + g[6] + g[7] / 1000.0)
+                    current = []
+                elif current is not None:
+                    if line:
+                        current.append(line)
+                    else:
+                        texts.append(" ".join(current))
+                        current = None
+        if current is not None:
+            texts.append(" ".join(current))
+        return cls(starts, ends, texts, srt_path=str(srt_path))
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+    def __iter__(self):
+        return iter(self.cues())
+
+    def cues(self) -> list:
+        """Lista de (start, end, texto), formato usado pela detecção em janelas."""
+        return list(zip(self.starts, self.ends, self.texts))
+
+    @property
+    def text(self) -> str:
+        return " ".join(t for t in self.texts if t)
+
+    @property
+    def duration(self) -> float:
+        return self._max_ends[-1] if self._max_ends else 0.0
+
+    def overlapping(self, start: float, end: float) -> range:
+        """Índices candidatos a cues que cruzam (start, end); filtrar com `ends[i] > start`."""
+        lo = bisect_right(self._max_ends, start)  # antes disso, todos os cues já terminaram
+        hi = bisect_left(self.starts, end)        # a partir daqui, todos começam depois
+        return range(lo, max(lo, hi))
+
+    def text_between(self, start: float, end: float) -> str:
+        """Texto dos cues que se sobrepõem a (start, end)."""
+        return " ".join(self.texts[i] for i in self.overlapping(start, end)
+                        if self.ends[i] > start and self.texts[i])
+
+    # --------------------------
+    # Ajuste de cortes em fronteiras de palavra/pausa
+    # --------------------------
+    def _boundaries(self):
+        """(inícios, fins) das palavras; sem word timestamps, usa os cues."""
+        if self.words:
+            return self.word_starts, self.word_ends
+        return self.starts, self.ends
+
+    def snap_start(self, t: float, max_shift: float = 1.0, pad: float = 0.15) -> float:
+        """
+        Início do corte fora do meio de uma palavra: se `t` cai dentro de uma palavra,
+        recua para o início dela (até `max_shift`s; senão avança para a próxima) e
+        então entra `pad`s na pausa anterior, sem invadir a palavra de trás.
+        """
+        starts, ends = self._boundaries()
+        i = bisect_right(starts, t) - 1  # palavra que começa em ou antes de t
+        if i >= 0 and ends[i] > t:      # t está dentro da palavra i
+            if t - starts[i] <= max_shift:
+                target = i
+            elif i + 1 < len(starts) and starts[i + 1] - t <= max_shift:
+                target = i + 1
+            else:
+                return t
+        else:                           # t está numa pausa: alinha com a próxima palavra
+            target = i + 1
+            if target >= len(starts) or starts[target] - t > max_shift:
+                return t
+        prev_end = ends[target - 1] if target > 0 else 0.0
+        return max(prev_end, starts[target] - pad, 0.0)
+
+    def snap_end(self, t: float, max_shift: float = 1.0, pad: float = 0.15) -> float:
+        """Espelho de `snap_start`: fim do corte depois da última palavra, `pad`s dentro da pausa seguinte."""
+        starts, ends = self._boundaries()
+        i = bisect_left(ends, t)         # primeira palavra que termina em ou depois de t
+        if i < len(ends) and starts[i] < t:  # t está dentro da palavra i
+            if ends[i] - t <= max_shift:
+                target = i
+            elif i > 0 and t - ends[i - 1] <= max_shift:
+                target = i - 1
+            else:
+                return t
+        else:                            # t está numa pausa: alinha com a palavra anterior
+            target = i - 1
+            if target < 0 or t - ends[target] > max_shift:
+                return t
+        next_start = starts[target + 1] if target + 1 < len(starts) else float("inf")
+        return min(next_start, ends[target] + pad)
+
+    def snap(self, start: float, end: float, max_shift: float = 1.0, pad: float = 0.15):
+        """(start, end) ajustados; mantém os originais se o ajuste inverter o intervalo."""
+        new_start = self.snap_start(start, max_shift, pad)
+        new_end = self.snap_end(end, max_shift, pad)
+        return (new_start, new_end) if new_end > new_start else (start, end)
+
+    # --------------------------
+    # Artefato binário de tempos (ao lado do .srt)
+    # --------------------------
+    def save_timings(self, path: str) -> str:
+        """
+        Grava cues e palavras em formato colunar binário: cabeçalho com as contagens,
+        colunas float64 little-endian e os textos em UTF-8 separados por \\0.
+        """
+        columns = [self.starts, self.ends, self.word_starts, self.word_ends]
+        texts = "\0".join(self.texts).encode("utf-8")
+        words = "\0".join(self.words).encode("utf-8")
+        tmp = f"{path}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(TIMINGS_HEADER.pack(TIMINGS_MAGIC, len(self.starts), len(self.word_starts), len(texts), len(words)))
+            for col in columns:
+                col = array("d", col)
+                if sys.byteorder != "little":
+                    col.byteswap()
+                f.write(col.tobytes())
+            f.write(texts)
+            f.write(words)
+        os.replace(tmp, path)
+        return path
+
+    @classmethod
+    def load_timings(cls, path: str) -> "Transcript":
+        with open(path, "rb") as f:
+            magic, n_cues, n_words, texts_len, words_len = TIMINGS_HEADER.unpack(f.read(TIMINGS_HEADER.size))
+            if magic != TIMINGS_MAGIC:
+                raise ValueError(f"Arquivo de tempos inválido: {path}")
+            cols = []
+            for n in (n_cues, n_cues, n_words, n_words):
+                col = array("d")
+                col.frombytes(f.read(8 * n))
+                if sys.byteorder != "little":
+                    col.byteswap()
+                cols.append(col)
+            texts = f.read(texts_len).decode("utf-8").split("\0") if n_cues else []
+            words = f.read(words_len).decode("utf-8").split("\0") if n_words else []
+        return cls(cols[0], cols[1], texts, words=zip(cols[2], cols[3], words))
+
+TIMINGS_MAGIC = b"TRT1"
+TIMINGS_HEADER = struct.Struct("<4sIIII")
+TIMINGS_EXT = ".timings.bin"
+
+def timings_path_for(srt_path: str) -> str:
+    return os.path.splitext(srt_path)[0] + TIMINGS_EXT
+
+def load_timings_for(media_path: str) -> Optional[Transcript]:
+    """Tempos gravados ao lado do vídeo/SRT (mesmo nome base), se existirem."""
+    path = timings_path_for(media_path)
+    if not os.path.exists(path):
+        return None
+    try:
+        return Transcript.load_timings(path)
+    except (OSError, ValueError, struct.error) as e:
+        print(f"[WARN] Não foi possível ler {path}: {e}")
+        return None
+
+# --------------------------
+# Cache por arquivo
+# --------------------------
+_SRT_CACHE = OrderedDict()  # caminho -> (mtime_ns, tamanho, Transcript)
+_SRT_CACHE_LOCK = threading.Lock()
+SRT_CACHE_ENTRIES = 16
+
+def load_srt(srt_path: str) -> Transcript:
+    """Transcrição do SRT, lida uma vez por versão do arquivo (mtime + tamanho)."""
+    path = os.path.abspath(srt_path)
+    st = os.stat(path)
+    with _SRT_CACHE_LOCK:
+        hit = _SRT_CACHE.get(path)
+        if hit and hit[0] == st.st_mtime_ns and hit[1] == st.st_size:
+            _SRT_CACHE.move_to_end(path)
+            return hit[2]
+    transcript = Transcript.from_srt(path)
+    with _SRT_CACHE_LOCK:
+        _SRT_CACHE[path] = (st.st_mtime_ns, st.st_size, transcript)
+        _SRT_CACHE.move_to_end(path)
+        while len(_SRT_CACHE) > SRT_CACHE_ENTRIES:
+            _SRT_CACHE.popitem(last=False)
+    return transcript
+
+def as_transcript(blocks) -> Transcript:
+    """Aceita um Transcript ou uma lista de cues (start, end, texto)."""
+    return blocks if isinstance(blocks, Transcript) else Transcript.from_cues(blocks)
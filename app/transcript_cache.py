@@ -0,0 +1,59 @@
+import os
+import logging
+from disk_cache import DiskCache, hash_file, hash_json
+from utils import env_flag
+
+logger = logging.getLogger(__name__)
+
+# Chave = sha256(conteúdo do áudio) + parâmetros do ASR que podem mudar o resultado.
+# Um alias por hash do vídeo permite pular também a extração de áudio num re-run.
+_CACHE = None
+
+def get_cache() -> DiskCache:
+    global _CACHE
+    if _CACHE is None:
+        max_mb = float(os.getenv("TRANSCRIPT_CACHE_MAX_MB", "512"))
+        _CACHE = DiskCache("transcripts", int(max_mb * 1024 * 1024))
+    return _CACHE
+
+def enabled() -> bool:
+    return env_flag("TRANSCRIPT_CACHE", "true")
+
+def asr_cache_params() -> dict:
+    return {
+        "language": os.getenv("API_TRANSCRIBE_LANGUAGE", "pt"),
+        "model": os.getenv("API_TRANSCRIBE_MODEL", "turbo"),
+        "word_timestamps": True,
+    }
+
+def audio_key(audio_hash: str) -> str:
+    return hash_json({"audio": audio_hash, "asr": asr_cache_params()})
+
+def video_alias(video_hash: str) -> str:
+    return "video_" + hash_json({"video": video_hash, "asr": asr_cache_params()})
+
+def lookup_audio(audio_path: str):
+    """Retorna (segments | None, chave) para o áudio informado."""
+    key = audio_key(hash_file(audio_path))
+    if not enabled():
+        return None, key
+    segments = get_cache().get(key)
+    if segments is not None:
+        logger.info(f"Transcrição encontrada no cache ({key[:12]}…)")
+    return segments, key
+
+def lookup_video(video_hash: str):
+    if not enabled() or not video_hash:
+        return None
+    segments = get_cache().get_alias(video_alias(video_hash))
+    if segments is not None:
+        logger.info(f"Transcrição encontrada no cache pelo hash do vídeo ({video_hash[:12]}…)")
+    return segments
+
+def store(key: str, segments: list, video_hash: str | None = None) -> None:
+    if not enabled():
+        return
+    cache = get_cache()
+    cache.set(key, segments)
+    if video_hash:
+        cache.set_alias(video_alias(video_hash), key)
@@ -0,0 +1,192 @@
+import os
+import hashlib
+from pathlib import Path
+
+from starlette.concurrency import run_in_threadpool
+
+from ffmpeg_utils import AUDIO_FORMATS, AudioPipe, mp4_index_position
+
+try:  # python-multipart >= 0.0.13
+    from python_multipart.multipart import MultipartParser, parse_options_header
+except ImportError:  # versões antigas expõem o pacote como `multipart`
+    from multipart.multipart import MultipartParser, parse_options_header
+
+# Recebe o multipart/form-data direto do corpo da requisição: o arquivo vai para
+# o disco em blocos grandes (sem spool em arquivo temporário) e o sha256 é
+# calculado no mesmo passo; campos de texto ficam em memória.
+MAX_FIELD_BYTES = 1024 * 1024
+
+def chunk_bytes() -> int:
+    return int(float(os.getenv("UPLOAD_CHUNK_MB", "4")) * 1024 * 1024)
+
+def ingest_mode() -> str:
+    """INGEST_MODE: buffered (extrai o áudio depois do upload) | pipelined (durante o upload)."""
+    mode = os.getenv("INGEST_MODE", "buffered").strip().lower()
+    return mode if mode in ("buffered", "pipelined") else "buffered"
+
+class IngestAudioTee:
+    """
+    Recebe os blocos do upload e os repassa a um ffmpeg que extrai o áudio em paralelo.
+    Desiste (e o pipeline extrai do arquivo depois) se o contêiner não dá para ler em
+    stream, como MP4 sem faststart (moov no fim), ou se o ffmpeg falhar.
+    """
+    def __init__(self, audio_base: Path, fmt: str | None = None):
+        fmt = (fmt or os.getenv("AUDIO_FORMAT", "opus")).strip().lower()
+        self.fmt = fmt if fmt in AUDIO_FORMATS else None
+        self.audio_path = Path(f"{audio_base}{AUDIO_FORMATS[self.fmt][0]}") if self.fmt else None
+        self.reason = None if self.fmt else f"AUDIO_FORMAT={fmt} não suportado no modo pipelined"
+        self._pipe = None
+        self._started = False
+
+    def __call__(self, block: bytes):
+        if self.reason:
+            return
+        if not self._started:
+            self._started = True
+            if mp4_index_position(block) == "end":
+                self.reason = "MP4 sem faststart (índice no fim do arquivo)"
+                return
+            try:
+                self._pipe = AudioPipe(self.audio_path, self.fmt)
+            except Exception as e:
+                self.reason = f"não foi possível iniciar o ffmpeg ({e})"
+                return
+        if not self._pipe.write(block):
+            self.reason = self._pipe.error
+
+    def finish(self, timeout=None) -> Path | None:
+        """Espera o ffmpeg terminar; retorna o áudio extraído ou None (fallback)."""
+        if self._pipe is not None and self._pipe.close(timeout) and not self.reason:
+            return self.audio_path
+        reason = self.reason or (self._pipe.error if self._pipe else "upload vazio")
+        print(f"[WARN] Extração de áudio durante o upload indisponível ({reason}); extraindo depois.")
+        return None
+
+    def discard(self):
+        if self._pipe is not None:
+            self._pipe.abort()
+
+class UploadedFile:
+    def __init__(self, filename: str, path: Path, sha256: str, size: int):
+        self.filename, self.path, self.sha256, self.size = filename, path, sha256, size
+
+class StreamingUpload:
+    """
+    Parser incremental de multipart/form-data para um único arquivo.
+    `dest_for(filename)` decide o caminho de gravação quando o cabeçalho da parte chega.
+    """
+    def __init__(self, content_type: str, file_field: str, dest_for, on_block=None):
+        ctype, params = parse_options_header(content_type or "")
+        if ctype != b"multipart/form-data" or b"boundary" not in params:
+            raise ValueError("Requisição precisa ser multipart/form-data")
+        self.file_field, self.dest_for = file_field, dest_for
+        self.on_block = on_block  # recebe cada bloco gravado (ex.: IngestAudioTee)
+        self.fields = {}
+        self.file = None
+        self._parser = MultipartParser(params[b"boundary"], {
+            "on_part_begin": self._on_part_begin,
+            "on_header_field": self._on_header_field,
+            "on_header_value": self._on_header_value,
+            "on_header_end": self._on_header_end,
+            "on_headers_finished": self._on_headers_finished,
+            "on_part_data": self._on_part_data,
+            "on_part_end": self._on_part_end,
+        })
+        self._chunk = chunk_bytes()
+        self._pending = bytearray()  # dados do arquivo aguardando escrita em bloco
+        self._file_ended = False
+        self._out = None
+        self._hash = None
+        self._size = 0
+
+    # --- callbacks do parser (síncronos, só acumulam) ---
+    def _on_part_begin(self):
+        self._headers, self._header_field, self._header_value = {}, b"", b""
+        self._part_name, self._part_filename, self._is_file, self._value = None, None, False, bytearray()
+
+    def _on_header_field(self, data, start, end):
+        self._header_field += data[start:end]
+
+    def _on_header_value(self, data, start, end):
+        self._header_value += data[start:end]
+
+    def _on_header_end(self):
+        self._headers[self._header_field.lower()] = self._header_value
+        self._header_field, self._header_value = b"", b""
+
+    def _on_headers_finished(self):
+        _, params = parse_options_header(self._headers.get(b"content-disposition", b""))
+        self._part_name = params.get(b"name", b"").decode("utf-8", "replace")
+        filename = params.get(b"filename")
+        if self._part_name == self.file_field and filename is not None:
+            if self.file is not None or self._out is not None:
+                raise ValueError("Apenas um arquivo por upload")
+            self._is_file = True
+            self._part_filename = filename.decode("utf-8", "replace")
+            self._dest = Path(self.dest_for(self._part_filename))
+            self._out = open(self._dest, "wb")
+            self._hash = hashlib.sha256()
+
+    def _on_part_data(self, data, start, end):
+        if self._is_file:
+            self._pending += data[start:end]
+        else:
+            self._value += data[start:end]
+            if len(self._value) > MAX_FIELD_BYTES:
+                raise ValueError(f"Campo '{self._part_name}' excede o tamanho máximo")
+
+    def _on_part_end(self):
+        if self._is_file:
+            self._file_ended = True  # último bloco é gravado por consume(), fora do event loop
+        elif self._part_name:
+            self.fields[self._part_name] = self._value.decode("utf-8", "replace")
+
+    def _finish_file(self):
+        self._flush()
+        self._out.close()
+        self._out = None
+        self.file = UploadedFile(self._part_filename, self._dest, self._hash.hexdigest(), self._size)
+
+    def _flush(self):
+        if self._pending:
+            block = bytes(self._pending)
+            self._pending.clear()
+            self._hash.update(block)
+            self._out.write(block)
+            self._size += len(block)
+            if self.on_block is not None:
+                self.on_block(block)
+
+    # --- API ---
+    async def consume(self, stream) -> "StreamingUpload":
+        """Consome `request.stream()`; hash e escrita de cada bloco rodam fora do event loop."""
+        try:
+            async for chunk in stream:
+                if chunk:
+                    self._parser.write(chunk)
+                    if self._file_ended and self.file is None:
+                        await run_in_threadpool(self._finish_file)
+                    elif len(self._pending) >= self._chunk:
+                        await run_in_threadpool(self._flush)
+            self._parser.finalize()
+            if self._file_ended and self.file is None:
+                await run_in_threadpool(self._finish_file)
+        except BaseException:
+            self.abort()
+            raise
+        if self.file is None:
+            self.abort()
+            raise ValueError(f"Campo de arquivo '{self.file_field}' não encontrado")
+        return self
+
+    def abort(self):
+        """Descarta o arquivo parcial (cliente desconectou, corpo inválido...)."""
+        if self._out is not None:
+            self._out.close()
+            self._out = None
+        if self._hash is not None:
+            try:
+                os.remove(self._dest)
+            except OSError:
+                pass
+        self.file = None
@@ -1,8 +1,28 @@
+import os
 import json
 from pathlib import Path
 
-def update_status(job_id, step, progress, output_dir="processed"):
-    """Salva o status do processamento no arquivo status_{job_id}.json"""
+import events
+import artifacts
+
+def env_flag(name: str, default: str = "false") -> bool:
+    """Flag booleana do .env: 1/true/yes/y/on (sem diferenciar maiúsculas) liga."""
+    return os.getenv(name, default).strip().lower() in ("1", "true", "yes", "y", "on")
+
+def _write_status(job_id, state, output_dir):
     status_path = Path(output_dir) / f"status_{job_id}.json"
+    data = {"step": state.get("step", ""), "progress": state.get("progress", 0),
+            "highlights": state.get("highlights", [])}
     with open(status_path, "w", encoding="utf-8") as f:
-        json.dump({"step": step, "progress": progress}, f)
+        json.dump(data, f)
+
+def update_status(job_id, step, progress, output_dir="processed"):
+    """Publica o status do job (SSE/memória) e salva em status_{job_id}.json"""
+    state = events.publish_status(job_id, step, progress)
+    _write_status(job_id, state, output_dir)
+
+def add_highlight_clip(job_id, clip_path, output_dir="processed", meta=None):
+    """Registra um clipe recém-finalizado no índice de artefatos, publica e atualiza o status_{job_id}.json"""
+    clip = artifacts.add_clip(job_id, clip_path, meta)
+    state = events.publish_clip(job_id, clip["filename"], clip)
+    _write_status(job_id, state, output_dir)
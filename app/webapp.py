@@ -1,17 +1,27 @@
-from fastapi import FastAPI, UploadFile, File, BackgroundTasks, Request, Form
-from fastapi.responses import HTMLResponse, FileResponse, JSONResponse
+from fastapi import FastAPI, Request
+from fastapi.responses import HTMLResponse, FileResponse, JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from pathlib import Path
-import shutil
+import asyncio
 import os
 import uuid
-import subprocess
 import json
 from datetime import datetime
 
 # prompts loader
 from prompts.loader import list_detect_prompts, read_detect_prompt, resolve_by_name_or_default
+# pipeline em processo + fila persistente de jobs
+from pipeline import JobRequest, safe_delete
+from disk_cache import hash_json
+from upload_stream import StreamingUpload, IngestAudioTee, ingest_mode
+from starlette.concurrency import run_in_threadpool
+from job_queue import JobQueue, JobWorkers
+from utils import update_status
+import events
+import artifacts
+import metrics
+import ollama_ready
 
 app = FastAPI()
 BASE_DIR = Path(__file__).parent
@@ -22,9 +32,25 @@ TEMPLATES = Jinja2Templates(directory=str(BASE_DIR / "templates"))
 UPLOAD_DIR.mkdir(exist_ok=True)
 PROCESSED_DIR.mkdir(exist_ok=True)
 
+QUEUE = JobQueue()
+WORKERS = JobWorkers(QUEUE)
+
+@app.on_event("startup")
+def start_workers():
+    artifacts.load(PROCESSED_DIR)
+    # jobs pendentes/interrompidos antes do restart voltam a ser processados
+    WORKERS.start()
+    # carrega o modelo do Ollama em segundo plano: o primeiro job não paga a partida a frio
+    if ollama_ready.preload_enabled():
+        ollama_ready.preload_async()
+
+@app.on_event("shutdown")
+def stop_workers():
+    WORKERS.stop()
+
 @app.get("/", response_class=HTMLResponse)
 def index(request: Request):
-    highlights = sorted(PROCESSED_DIR.glob("*_highlight*.mp4"))
+    highlights = artifacts.recent(int(os.getenv("INDEX_RECENT_JOBS", "20")))
     return TEMPLATES.TemplateResponse("index.html", {"request": request, "highlights": highlights})
 
 # ---------- API de prompts detect_highlight ----------
@@ -43,79 +69,192 @@ def api_get_detect_prompt(name: str):
 
 # ---------- Upload recebe prompt_name OU prompt_text ----------
 @app.post("/upload")
-async def upload_video(
-    background_tasks: BackgroundTasks,
-    file: UploadFile = File(...),
-    prompt_name: str | None = Form(default=None),
-    prompt_text: str | None = Form(default=None),
-):
-    ext = Path(file.filename).suffix
+async def upload_video(request: Request):
+    """
+    Upload em stream (campos: file, prompt_name | prompt_text, cut_mode). O vídeo vai
+    direto para uploads/ com o sha256 calculado durante a cópia; se o mesmo vídeo já
+    foi (ou está sendo) processado com o mesmo prompt, devolve o job existente.
+    """
     uid = uuid.uuid4().hex
-    save_path = UPLOAD_DIR / f"{uid}{ext}"
-    with open(save_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
-
-    # limpa apenas highlights antigos quando novo upload chega
-    for f in PROCESSED_DIR.glob("*_highlight*.mp4"):
-        try:
-            f.unlink()
-        except:
-            pass
+    # INGEST_MODE=pipelined: o áudio é extraído enquanto o vídeo ainda está chegando
+    audio_tee = IngestAudioTee(UPLOAD_DIR / uid) if ingest_mode() == "pipelined" else None
+    try:
+        # Content-Type ausente ou não-multipart levanta ValueError já aqui → 400
+        upload = StreamingUpload(request.headers.get("content-type"), "file",
+                                 lambda filename: UPLOAD_DIR / f"{uid}{Path(filename).suffix}",
+                                 on_block=audio_tee)
+        await upload.consume(request.stream())
+    except BaseException as e:
+        if audio_tee:
+            audio_tee.discard()
+        if isinstance(e, ValueError):
+            return JSONResponse({"error": str(e)}, status_code=400)
+        raise
+    save_path, video_hash = upload.file.path, upload.file.sha256
+    prompt_name = upload.fields.get("prompt_name")
+    prompt_text = upload.fields.get("prompt_text")
+    cut_mode = upload.fields.get("cut_mode")
+    cut_mode = cut_mode if cut_mode in ("smart", "copy", "reencode") else None
 
     # Resolver prompt_path
     prompt_path = None
     if prompt_text and prompt_text.strip():
-        tmp_prompt = UPLOAD_DIR / f"{uid}_prompt.txt"
-        tmp_prompt.write_text(prompt_text, encoding="utf-8")
-        prompt_path = str(tmp_prompt)
+        prompt_content = prompt_text
     else:
         p = resolve_by_name_or_default(prompt_name)
         if p.exists():
             prompt_path = str(p.resolve())
+            prompt_content = p.read_text(encoding="utf-8")
         else:
             prompt_path = ""
+            prompt_content = ""
+    prompt_hash = hash_json({"prompt": prompt_content, "cut_mode": cut_mode})
+
+    # mesmo vídeo + mesmo prompt: reaproveita o job (na fila, rodando ou com clipes ainda em disco)
+    duplicate = find_reusable_job(video_hash, prompt_hash)
+    if duplicate:
+        if audio_tee:
+            audio_tee.discard()
+        safe_delete(str(save_path))
+        print(f"Upload duplicado de {video_hash[:12]}…; reaproveitando o job {duplicate}")
+        return {"message": "Vídeo já processado com este prompt! Reaproveitando os clipes...",
+                "id": duplicate, "duplicate": True}
+
+    if prompt_path is None:
+        tmp_prompt = UPLOAD_DIR / f"{uid}_prompt.txt"
+        tmp_prompt.write_text(prompt_text, encoding="utf-8")
+        prompt_path = str(tmp_prompt)
 
-    background_tasks.add_task(process_video, save_path, uid, prompt_path)
+    audio_path = None
+    if audio_tee:
+        audio_path = await run_in_threadpool(audio_tee.finish, float(os.getenv("INGEST_AUDIO_TIMEOUT", "300")))
+
+    # mesmo vídeo com outro prompt: o pipeline reaproveita a transcrição pelo video_hash
+    process_video(save_path, uid, prompt_path, cut_mode, video_hash, prompt_hash, audio_path)
     return {"message": "Arquivo recebido! Processando...", "id": uid}
 
-def process_video(video_path: Path, job_id: str, prompt_path: str):
+def find_reusable_job(video_hash: str, prompt_hash: str) -> str | None:
+    for job in QUEUE.find_duplicates(video_hash, prompt_hash):
+        if job["status"] in ("queued", "running"):
+            return job["id"]
+        clips = artifacts.clips(job["id"])
+        if all((PROCESSED_DIR / job["id"] / c["filename"]).exists() for c in clips):
+            return job["id"]
+    return None
+
+def process_video(video_path: Path, job_id: str, prompt_path: str, cut_mode: str | None = None,
+                  video_hash: str | None = None, prompt_hash: str | None = None, audio_path: Path | None = None):
     """
-    Chama o pipeline passando --prompt_path para o main.py.
+    Grava o job na fila persistente; os workers (job_queue.py) o executam em processo.
     """
-    cmd = [
-        "python", "main.py", str(video_path),
-        "--output_dir", str(PROCESSED_DIR),
-        "--job_id", str(job_id)
-    ]
-    if prompt_path:
-        cmd += ["--prompt_path", prompt_path]
-
-    subprocess.call(cmd)
-
-@app.get("/download/{filename}")
-def download_highlight(filename: str):
-    file_path = PROCESSED_DIR / filename
+    output_dir = str(artifacts.job_dir(PROCESSED_DIR, job_id))
+    QUEUE.enqueue(JobRequest(
+        video_path=str(video_path),
+        output_dir=output_dir,
+        job_id=str(job_id),
+        prompt_path=prompt_path or None,
+        cut_mode=cut_mode if cut_mode in ("smart", "copy", "reencode") else None,
+        video_hash=video_hash,
+        prompt_hash=prompt_hash,
+        audio_path=str(audio_path) if audio_path else None,
+    ))
+    update_status(job_id, "Na fila...", 0, output_dir)
+    WORKERS.notify()
+
+@app.get("/download/{job_id}/{filename}")
+def download_highlight(job_id: str, filename: str):
+    # só serve clipes registrados no índice do job (sem caminhos arbitrários)
+    if filename not in {c["filename"] for c in artifacts.clips(job_id)}:
+        return JSONResponse(content={"error": "Arquivo não encontrado!"}, status_code=404)
+    file_path = PROCESSED_DIR / job_id / filename
     if not file_path.exists():
         return JSONResponse(content={"error": "Arquivo não encontrado!"}, status_code=404)
     return FileResponse(str(file_path), media_type="video/mp4", filename=filename)
 
+def current_status(job_id: str) -> dict:
+    """Estado do job: memória (pub/sub) ou status_{job_id}.json, sem varrer o diretório."""
+    data = events.snapshot(job_id)
+    if data is None:
+        status_path = PROCESSED_DIR / Path(job_id).name / f"status_{job_id}.json"
+        if status_path.exists():
+            with open(status_path, encoding="utf-8") as f:
+                data = json.load(f)
+        else:
+            data = {"step": "Aguardando processamento...", "progress": 0}
+    data.pop("updated_at", None)
+    data.setdefault("highlights", [])
+    data["clips"] = artifacts.clips(job_id)
+    return data
+
 @app.get("/status/{job_id}")
 def job_status(job_id: str):
-    status_path = PROCESSED_DIR / f"status_{job_id}.json"
-    highlights = sorted(PROCESSED_DIR.glob("*_highlight*.mp4"))
-    highlight_names = [f.name for f in highlights]
-
-    if not status_path.exists():
-        return {
-            "step": "Aguardando processamento...",
-            "progress": 0,
-            "highlights": highlight_names
-        }
-
-    with open(status_path, encoding="utf-8") as f:
-        data = json.load(f)
-    data["highlights"] = highlight_names
+    data = current_status(job_id)
+    data.update(QUEUE.queue_info(job_id, WORKERS.workers))
+    timings = metrics.job_summary(job_id)
+    if timings:
+        data["timings"] = timings
     return data
 
+@app.post("/jobs/{job_id}/retry")
+def retry_job(job_id: str):
+    """Recoloca um job falho na fila; as etapas já concluídas (manifesto do job) não são refeitas."""
+    job = QUEUE.get(job_id)
+    if job is None:
+        return JSONResponse(content={"error": "Job não encontrado!"}, status_code=404)
+    if job["status"] != "failed":
+        return JSONResponse(content={"error": f"Job está '{job['status']}'; só jobs falhos podem ser retomados."},
+                            status_code=409)
+    if not Path(json.loads(job["request"])["video_path"]).exists():
+        return JSONResponse(content={"error": "Vídeo original não está mais disponível (retenção expirada)."},
+                            status_code=410)
+    req = QUEUE.retry(job_id)
+    if req is None:
+        return JSONResponse(content={"error": "Job já foi recolocado na fila."}, status_code=409)
+    update_status(job_id, "Na fila (retomando)...", 0, req.output_dir)
+    WORKERS.notify()
+    return {"message": "Job recolocado na fila.", "id": job_id}
+
+@app.get("/jobs/{job_id}/spans")
+def job_spans(job_id: str):
+    """Spans de tempo do job: em memória enquanto roda, do registro na fila depois de terminado."""
+    return {"job_id": job_id, "spans": metrics.job_spans(job_id) or QUEUE.spans(job_id)}
+
+@app.get("/metrics")
+def prometheus_metrics():
+    """Histogramas de duração por etapa/chamada externa, tokens do LLM e render dos clipes (formato Prometheus)."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+def sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@app.get("/events/{job_id}")
+async def job_events(job_id: str, request: Request):
+    """
+    Server-Sent Events do job: `status` (etapa/progresso) e `clip` (clipe pronto).
+    Envia o estado atual ao conectar e encerra quando o job termina (progress 100).
+    """
+    async def stream():
+        queue = events.subscribe(job_id)
+        try:
+            state = current_status(job_id)
+            state.update(QUEUE.queue_info(job_id, WORKERS.workers))
+            yield sse("status", state)
+            if state.get("progress", 0) >= 100:
+                return
+            while not await request.is_disconnected():
+                try:
+                    event, data = await asyncio.wait_for(queue.get(), timeout=15)
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"  # mantém a conexão viva atrás de proxies
+                    continue
+                yield sse(event, data)
+                if event == "status" and data.get("progress", 0) >= 100:
+                    break
+        finally:
+            events.unsubscribe(job_id, queue)
+
+    return StreamingResponse(stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
 # monta pasta static
 app.mount("/static", StaticFiles(directory=BASE_DIR / "static"), name="static")
@@ -0,0 +1,245 @@
+import re
+import json
+import time
+import zlib
+import argparse
+import tempfile
+import threading
+import subprocess
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Stand-ins locais do Whisper (/asr) e do Ollama (/api/tags, /api/generate, /api/pull)
+# para benchmark: respostas no mesmo formato dos serviços reais, com latência
+# configurável, sem GPU nem modelo. Os highlights e as notas são determinísticos
+# (derivados do próprio prompt), então duas execuções fazem o mesmo trabalho.
+WORDS = ("então", "isso", "aqui", "muito", "gente", "olha", "agora", "vamos", "ver", "como",
+         "funciona", "quando", "tudo", "mundo", "coisa", "legal", "pessoal", "jogo", "hoje", "sempre")
+
+def probe_seconds(data: bytes, default: float) -> float:
+    """Duração do áudio recebido (ffprobe num arquivo temporário); `default` se não der para ler."""
+    with tempfile.NamedTemporaryFile(suffix=".bin") as tmp:
+        tmp.write(data)
+        tmp.flush()
+        try:
+            out = subprocess.run(["ffprobe", "-v", "error", "-show_entries", "format=duration",
+                                  "-of", "default=nw=1:nk=1", tmp.name],
+                                 capture_output=True, text=True, timeout=30).stdout.strip()
+            return float(out)
+        except (OSError, ValueError, subprocess.SubprocessError):
+            return default
+
+def multipart_file(body: bytes, content_type: str, field: str = "audio_file") -> bytes:
+    """Conteúdo do campo de arquivo `field` de um corpo multipart/form-data."""
+    m = re.search(r'boundary="?([^";]+)"?', content_type or "")
+    if not m:
+        return body
+    for part in body.split(b"--" + m.group(1).encode()):
+        head, sep, data = part.partition(b"\r\n\r\n")
+        if sep and f'name="{field}"'.encode() in head:
+            return data[:-2] if data.endswith(b"\r\n") else data
+    return b""
+
+def fake_segments(duration: float, segment_seconds: float = 4.0, words_per_second: float = 2.5,
+                  pause_every: float = 7.0, pause_seconds: float = 1.2) -> list:
+    """Segmentos com word timestamps; deixa uma pausa a cada `pause_every`s (como o áudio sintético 'speech')."""
+    segments, t, n = [], 0.0, 0
+    step = 1.0 / words_per_second
+    while t < duration:
+        end = min(duration, t + segment_seconds)
+        words, w = [], t
+        while w + step * 0.8 <= end:
+            if (w % pause_every) >= pause_seconds:
+                word = WORDS[(n + len(words)) % len(WORDS)]
+                words.append({"word": f" {word}", "start": round(w, 2), "end": round(w + step * 0.8, 2),
+                              "probability": 0.9})
+            w += step
+        if words:
+            segments.append({"id": len(segments), "start": words[0]["start"], "end": words[-1]["end"],
+                             "text": "".join(x["word"] for x in words).strip(), "words": words})
+        n += len(words)
+        t = end
+    return segments
+
+def fake_highlights(duration: float, count: int, clip_seconds: float) -> list:
+    """`count` cortes espaçados igualmente em [0, duration]."""
+    if duration <= 0 or count <= 0:
+        return []
+    clip = min(clip_seconds, duration / count)
+    gap = duration / count
+    return [{"start": round(i * gap + (gap - clip) / 2, 1), "end": round(i * gap + (gap + clip) / 2, 1),
+             "reason": f"momento sintético {i + 1}"} for i in range(count)]
+
+def fake_llm_response(prompt: str, clips: int, clip_seconds: float) -> str:
+    batch = re.search(r"com (\d+) números inteiros", prompt)
+    if batch:  # classificação em lote
+        n = int(batch.group(1))
+        return json.dumps([(zlib.crc32(f"{prompt}{i}".encode()) % 6) + 4 for i in range(n)])
+    if '"start"' not in prompt:  # classificação de um trecho
+        return str((zlib.crc32(prompt.encode()) % 6) + 4)
+    # detecção: DURATION entra no prompt com 2 casas decimais
+    durations = [float(x) for x in re.findall(r"\b\d+\.\d{2}\b", prompt)]
+    return json.dumps(fake_highlights(max(durations, default=0.0), clips, clip_seconds), ensure_ascii=False)
+
+class FakeServices:
+    """
+    Sobe os dois servidores em portas livres de 127.0.0.1 (threads daemon).
+    `stats` conta requisições e segundos de latência simulada por endpoint.
+    """
+    def __init__(self, model="bench-model", asr_latency=0.2, asr_rtf=0.02, llm_latency=0.3,
+                 token_delay=0.002, clips=4, clip_seconds=20.0, default_duration=60.0, load_delay=0.0):
+        self.model = model
+        self.asr_latency, self.asr_rtf = asr_latency, asr_rtf
+        self.llm_latency, self.token_delay = llm_latency, token_delay
+        self.load_delay = load_delay  # "carga do modelo" na 1ª geração (frio)
+        self.clips, self.clip_seconds = clips, clip_seconds
+        self.default_duration = default_duration
+        self.stats = {}
+        self._lock = threading.Lock()
+        self._loaded = False
+        self.asr = ThreadingHTTPServer(("127.0.0.1", 0), self._handler(self._asr_routes()))
+        self.ollama = ThreadingHTTPServer(("127.0.0.1", 0), self._handler(self._ollama_routes()))
+
+    @property
+    def asr_port(self) -> int:
+        return self.asr.server_address[1]
+
+    @property
+    def ollama_port(self) -> int:
+        return self.ollama.server_address[1]
+
+    def env(self) -> dict:
+        """Variáveis de ambiente que apontam o pipeline para os stand-ins."""
+        return {
+            "API_TRANSCRIBE_URL": "127.0.0.1", "API_TRANSCRIBE_PORT": str(self.asr_port),
+            "API_TRANSCRIBE_ENDPOINTS": f"127.0.0.1:{self.asr_port}",
+            "OLLAMA_HOSTNAME": "127.0.0.1", "OLLAMA_PORT": str(self.ollama_port), "OLLAMA_MODEL": self.model,
+            "USE_CHATGPT": "false",
+        }
+
+    def start(self) -> "FakeServices":
+        for server in (self.asr, self.ollama):
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        for server in (self.asr, self.ollama):
+            server.shutdown()
+            server.server_close()
+
+    def _count(self, route: str, simulated: float):
+        with self._lock:
+            entry = self.stats.setdefault(route, {"requests": 0, "simulated_seconds": 0.0})
+            entry["requests"] += 1
+            entry["simulated_seconds"] = round(entry["simulated_seconds"] + simulated, 3)
+
+    # --------------------------
+    # Rotas
+    # --------------------------
+    def _asr_routes(self):
+        def asr(handler, body):
+            audio = multipart_file(body, handler.headers.get("Content-Type"))
+            duration = probe_seconds(audio, self.default_duration)
+            delay = self.asr_latency + duration * self.asr_rtf
+            time.sleep(delay)
+            self._count("POST /asr", delay)
+            segments = fake_segments(duration)
+            return 200, {"text": " ".join(s["text"] for s in segments), "segments": segments, "language": "pt"}
+        return {("POST", "/asr"): asr}
+
+    def _ollama_routes(self):
+        def tags(handler, body):
+            self._count("GET /api/tags", 0.0)
+            return 200, {"models": [{"name": self.model, "model": self.model}]}
+
+        def pull(handler, body):
+            self._count("POST /api/pull", 0.0)
+            return 200, {"status": "success"}
+
+        def generate(handler, body):
+            payload = json.loads(body or b"{}")
+            with self._lock:
+                cold, self._loaded = not self._loaded, True
+            load = self.load_delay if cold else 0.0
+            if "prompt" not in payload:  # só carga do modelo (preload), como o Ollama
+                time.sleep(load)
+                self._count("POST /api/generate (load)", load)
+                return 200, {"model": self.model, "done": True, "response": "", "load_duration": int(load * 1e9)}
+            text = fake_llm_response(payload.get("prompt", ""), self.clips, self.clip_seconds)
+            pieces = [text[i:i + 4] for i in range(0, len(text), 4)]  # ~1 token a cada 4 caracteres
+            delay = load + self.llm_latency + len(pieces) * self.token_delay
+            self._count("POST /api/generate", delay)
+            final = {"model": self.model, "done": True, "load_duration": int(load * 1e9),
+                     "prompt_eval_count": len(payload.get("prompt", "")) // 4, "eval_count": len(pieces),
+                     "total_duration": int(delay * 1e9)}
+            time.sleep(load + self.llm_latency)
+            if not payload.get("stream", True):
+                time.sleep(len(pieces) * self.token_delay)
+                return 200, {**final, "response": text}
+
+            def chunks():
+                for piece in pieces:
+                    time.sleep(self.token_delay)
+                    yield {"model": self.model, "response": piece, "done": False}
+                yield {**final, "response": ""}
+            return 200, chunks()
+        return {("GET", "/api/tags"): tags, ("POST", "/api/pull"): pull, ("POST", "/api/generate"): generate}
+
+    @staticmethod
+    def _handler(routes):
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def _dispatch(self, method):
+                route = routes.get((method, self.path.split("?", 1)[0]))
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length) if length else b""
+                if route is None:
+                    return self._send(404, {"error": "not found"})
+                status, data = route(self, body)
+                if isinstance(data, dict):
+                    return self._send(status, data)
+                # resposta em stream (NDJSON, como o Ollama com stream=true)
+                self.send_response(status)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                for item in data:
+                    line = json.dumps(item, ensure_ascii=False).encode() + b"\n"
+                    self.wfile.write(f"{len(line):x}\r\n".encode() + line + b"\r\n")
+                    self.wfile.flush()
+                self.wfile.write(b"0\r\n\r\n")
+
+            def _send(self, status, data):
+                raw = json.dumps(data, ensure_ascii=False).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(raw)))
+                self.end_headers()
+                self.wfile.write(raw)
+
+            def do_GET(self):
+                self._dispatch("GET")
+
+            def do_POST(self):
+                self._dispatch("POST")
+
+            def log_message(self, fmt, *args):
+                pass
+        return Handler
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sobe os stand-ins do Whisper e do Ollama até Ctrl+C.")
+    parser.add_argument("--asr-latency", type=float, default=0.2, help="Latência fixa do /asr (s)")
+    parser.add_argument("--asr-rtf", type=float, default=0.02, help="Segundos de latência por segundo de áudio")
+    parser.add_argument("--llm-latency", type=float, default=0.3, help="Latência até o 1º token (s)")
+    parser.add_argument("--token-delay", type=float, default=0.002, help="Segundos por token gerado")
+    parser.add_argument("--load-delay", type=float, default=0.0, help="Carga do modelo na 1ª geração (s)")
+    args = parser.parse_args()
+    services = FakeServices(asr_latency=args.asr_latency, asr_rtf=args.asr_rtf, llm_latency=args.llm_latency,
+                            token_delay=args.token_delay, load_delay=args.load_delay).start()
+    for name, value in services.env().items():
+        print(f"{name}={value}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        services.stop()
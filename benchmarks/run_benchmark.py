@@ -0,0 +1,340 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import resource
+import tempfile
+import functools
+import subprocess
+from pathlib import Path
+
+from synthetic_media import AUDIO_SOURCES, generate_video, media_name
+from fake_services import FakeServices
+
+# Benchmark ponta a ponta do main.main com mídia sintética e stand-ins locais do
+# Whisper/Ollama. Cada etapa do pipeline (extract, transcribe, detect, cut, ...)
+# é cronometrada e o resultado vai para um JSON comparável entre commits.
+ROOT = Path(__file__).resolve().parent.parent
+APP_DIR = ROOT / "app"
+BENCH_DIR = Path(__file__).resolve().parent
+
+# funções do pipeline.py cronometradas → nome da etapa no relatório
+STAGES = {
+    "extrair_audio": "extract",
+    "transcribe": "transcribe",
+    "prescore": "prescore",
+    "detect": "detect",
+    "classify": "classify",
+    "cut": "cut",
+    "detect_and_cut_streaming": "detect+cut",
+}
+
+def _usage() -> dict:
+    me = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)  # ffmpeg e workers de corte já finalizados
+    return {
+        "wall": time.perf_counter(),
+        "cpu": me.ru_utime + me.ru_stime + children.ru_utime + children.ru_stime,
+    }
+
+# Pico de memória por execução/etapa: ru_maxrss é o pico da vida inteira do processo (a 1ª
+# execução mascara as seguintes), então o pico vem do VmHWM do /proc, zerado antes de cada
+# trecho com "5" em /proc/self/clear_refs (Linux). Sem isso o pico fica como None.
+def _peak_rss_kb():
+    try:
+        with open("/proc/self/status", "r", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+def _reset_peak_rss() -> bool:
+    try:
+        with open("/proc/self/clear_refs", "w", encoding="ascii") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+class PeakRss:
+    """
+    Picos de RSS de trechos aninhados (execução → etapa → etapa chamada por outra).
+    Zerar o VmHWM para um trecho interno apagaria o pico já visto pelos externos, então
+    antes de cada reset o valor atual é repassado a todos os trechos abertos.
+    """
+    def __init__(self):
+        self.supported = _reset_peak_rss() and _peak_rss_kb() is not None
+        self._open = []
+
+    def _fold(self):
+        current = _peak_rss_kb() or 0
+        self._open = [max(peak, current) for peak in self._open]
+
+    def push(self):
+        if self.supported:
+            self._fold()
+            _reset_peak_rss()
+            self._open.append(_peak_rss_kb() or 0)
+
+    def pop(self):
+        if not self.supported:
+            return None
+        self._fold()
+        return round(self._open.pop() / 1024, 1)
+
+def _dir_bytes(path: Path) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+class StageTimer:
+    """
+    Envolve as funções de etapa do módulo `pipeline` e acumula tempo, CPU, pico de RSS e o
+    crescimento líquido do diretório de trabalho (gravado menos apagado; negativo quando a
+    etapa limpa intermediários).
+    """
+    def __init__(self, pipeline, workdir: Path, peaks: PeakRss):
+        self.pipeline, self.workdir, self.peaks = pipeline, workdir, peaks
+        self.stages = {}
+        self._originals = {}
+
+    def __enter__(self):
+        for attr, name in STAGES.items():
+            fn = getattr(self.pipeline, attr, None)
+            if fn is not None:
+                self._originals[attr] = fn
+                setattr(self.pipeline, attr, self._wrap(fn, name))
+        return self
+
+    def __exit__(self, *exc):
+        for attr, fn in self._originals.items():
+            setattr(self.pipeline, attr, fn)
+
+    def _wrap(self, fn, name):
+        @functools.wraps(fn)
+        def timed(*args, **kwargs):
+            before, bytes_before = _usage(), _dir_bytes(self.workdir)
+            self.peaks.push()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                peak = self.peaks.pop()
+                after = _usage()
+                entry = self.stages.setdefault(name, {"calls": 0, "wall_s": 0.0, "cpu_s": 0.0,
+                                                      "peak_rss_mb": None, "disk_growth_bytes": 0})
+                entry["calls"] += 1
+                entry["wall_s"] += after["wall"] - before["wall"]
+                entry["cpu_s"] += after["cpu"] - before["cpu"]
+                if peak is not None:
+                    entry["peak_rss_mb"] = max(entry["peak_rss_mb"] or 0.0, peak)
+                entry["disk_growth_bytes"] += _dir_bytes(self.workdir) - bytes_before
+        return timed
+
+def git_revision() -> dict:
+    def git(*args):
+        try:
+            return subprocess.run(["git", *args], cwd=ROOT, capture_output=True, text=True, timeout=30).stdout.strip()
+        except (OSError, subprocess.SubprocessError):
+            return ""
+    return {"commit": git("rev-parse", "HEAD"), "dirty": bool(git("status", "--porcelain", "--untracked-files=no"))}
+
+def ffmpeg_version() -> str:
+    try:
+        out = subprocess.run(["ffmpeg", "-version"], capture_output=True, text=True, timeout=30).stdout
+        return out.splitlines()[0] if out else ""
+    except (OSError, subprocess.SubprocessError):
+        return ""
+
+def load_env_file(path) -> dict:
+    """KEY=VALUE por linha (formato do .env do projeto); comentários e linhas vazias são ignorados."""
+    env = {}
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#") or "=" not in line:
+                continue
+            key, value = line.split("=", 1)
+            env[key.strip()] = value.split(" #", 1)[0].strip().strip('"').strip("'")
+    return env
+
+def use_cache_dir(cache_dir: Path):
+    """
+    Aponta os caches em disco para `cache_dir`. Os DiskCache são singletons criados no 1º
+    uso com o CACHE_DIR da época: sem zerá-los, as execuções "frias" reaproveitariam o da 1ª.
+    Módulos ainda não importados leem o CACHE_DIR novo quando forem usados.
+    """
+    os.environ["CACHE_DIR"] = str(cache_dir)
+    for name in ("transcript_cache", "llm_cache", "scene_index"):
+        module = sys.modules.get(name)
+        if module is not None:
+            module._CACHE = None
+
+def run_once(video: Path, run_idx: int, cache_dir: Path, keep: bool, prompt_path=None, cut_mode=None) -> dict:
+    import main
+    import pipeline
+
+    workdir = Path(tempfile.mkdtemp(prefix=f"bench_run{run_idx}_"))
+    use_cache_dir(cache_dir)
+    try:
+        local_video = workdir / video.name
+        shutil.copy2(video, local_video)
+        output_dir = workdir / "processed"
+        output_dir.mkdir()
+        job_id = f"bench{run_idx}"
+        peaks = PeakRss()
+        start, bytes_start = _usage(), _dir_bytes(workdir)
+        peaks.push()
+        with StageTimer(pipeline, workdir, peaks) as timer:
+            result = main.main(str(local_video), str(output_dir), job_id, prompt_path=prompt_path, cut_mode=cut_mode)
+        peak_rss = peaks.pop()
+        end = _usage()
+        clips = [Path(c) for c in (result.clips or [])]
+        return {
+            "run": run_idx,
+            "ok": bool(result.ok),
+            "error": result.error,
+            "wall_s": round(end["wall"] - start["wall"], 3),
+            "cpu_s": round(end["cpu"] - start["cpu"], 3),
+            "peak_rss_mb": peak_rss,
+            "disk_growth_bytes": _dir_bytes(workdir) - bytes_start,
+            "output_bytes": _dir_bytes(output_dir),
+            "highlights": len(result.highlights or []),
+            "clips": len(clips),
+            "stages": {name: {**s, "wall_s": round(s["wall_s"], 3), "cpu_s": round(s["cpu_s"], 3)}
+                       for name, s in timer.stages.items()},
+        }
+    finally:
+        if keep:
+            print(f"Arquivos da execução {run_idx} mantidos em {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+def summarize(runs: list) -> dict:
+    """Mediana por métrica (e por etapa) entre as execuções bem-sucedidas."""
+    ok = [r for r in runs if r["ok"]] or runs
+
+    def median(values):
+        values = sorted(v for v in values if v is not None)
+        if not values:
+            return None
+        mid = len(values) // 2
+        return values[mid] if len(values) % 2 else round((values[mid - 1] + values[mid]) / 2, 3)
+
+    summary = {key: median([r[key] for r in ok]) for key in
+               ("wall_s", "cpu_s", "peak_rss_mb", "disk_growth_bytes", "output_bytes", "clips")}
+    names = {name for r in ok for name in r["stages"]}
+    summary["stages"] = {name: {key: median([r["stages"][name][key] for r in ok if name in r["stages"]])
+                                for key in ("wall_s", "cpu_s", "peak_rss_mb", "disk_growth_bytes")}
+                         for name in sorted(names)}
+    return summary
+
+def compare(report: dict, baseline: dict):
+    """Imprime a variação (%) de cada métrica em relação a um relatório anterior."""
+    def line(label, new, old):
+        if old and new is not None:
+            print(f"  {label:<28} {old:>12} → {new:>12}  ({(new - old) / old * 100:+.1f}%)")
+        else:
+            print(f"  {label:<28} {old!s:>12} → {new!s:>12}")
+
+    cur, base = report["summary"], baseline["summary"]
+    print(f"Comparação com {baseline.get('git', {}).get('commit', '?')[:12]}:")
+    for key in ("wall_s", "cpu_s", "peak_rss_mb", "disk_growth_bytes"):
+        line(key, cur[key], base.get(key))
+    for name, stage in cur["stages"].items():
+        old = base.get("stages", {}).get(name, {})
+        line(f"{name}.wall_s", stage["wall_s"], old.get("wall_s"))
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do pipeline (main.main) com mídia sintética.")
+    parser.add_argument("--video", help="Vídeo de entrada (padrão: gera um sintético)")
+    parser.add_argument("--duration", type=float, default=300, help="Duração do vídeo sintético (s)")
+    parser.add_argument("--resolution", default="1280x720", help="Resolução do vídeo sintético")
+    parser.add_argument("--fps", type=int, default=30)
+    parser.add_argument("--audio", default="speech", choices=sorted(AUDIO_SOURCES))
+    parser.add_argument("--repeat", type=int, default=3, help="Execuções (o resumo usa a mediana)")
+    parser.add_argument("--warm-cache", action="store_true",
+                        help="Compartilha o cache (transcrição/LLM/cenas) entre execuções; padrão: sempre frio")
+    parser.add_argument("--asr-latency", type=float, default=0.2)
+    parser.add_argument("--asr-rtf", type=float, default=0.02, help="Latência do ASR por segundo de áudio")
+    parser.add_argument("--llm-latency", type=float, default=0.3)
+    parser.add_argument("--token-delay", type=float, default=0.002)
+    parser.add_argument("--load-delay", type=float, default=0.0, help="Carga do modelo na 1ª geração (s)")
+    parser.add_argument("--clips", type=int, default=4, help="Highlights devolvidos pelo LLM falso")
+    parser.add_argument("--clip-seconds", type=float, default=20.0)
+    parser.add_argument("--env-file", help="Carrega configurações KEY=VALUE (ex.: ../.env) antes dos overrides")
+    parser.add_argument("--set", action="append", default=[], metavar="KEY=VALUE", help="Override de ENV")
+    parser.add_argument("--prompt_path", default=str(APP_DIR / "prompts" / "detect_highlight" / "prompt_detect_highlight.txt"))
+    parser.add_argument("--cut_mode", default=None, choices=["smart", "copy", "reencode"])
+    parser.add_argument("--label", default="", help="Rótulo livre gravado no relatório")
+    parser.add_argument("--output", help="JSON de saída (padrão: benchmarks/results/<data>_<commit>.json)")
+    parser.add_argument("--compare", help="Relatório anterior para comparar")
+    parser.add_argument("--keep", action="store_true", help="Mantém os diretórios de trabalho")
+    args = parser.parse_args()
+
+    if args.video:
+        video = Path(args.video).resolve()
+    else:
+        video = generate_video(BENCH_DIR / "media" / media_name(args.duration, args.resolution, args.fps, args.audio),
+                               args.duration, args.resolution, args.fps, args.audio)
+
+    services = FakeServices(asr_latency=args.asr_latency, asr_rtf=args.asr_rtf, llm_latency=args.llm_latency,
+                            token_delay=args.token_delay, load_delay=args.load_delay, clips=args.clips,
+                            clip_seconds=args.clip_seconds, default_duration=args.duration).start()
+    overrides = load_env_file(args.env_file) if args.env_file else {}
+    overrides.update(services.env())
+    overrides.update(dict(item.split("=", 1) for item in args.set))
+    os.environ.update(overrides)
+    sys.path.insert(0, str(APP_DIR))
+
+    shared_cache = Path(tempfile.mkdtemp(prefix="bench_cache_"))
+    runs = []
+    try:
+        for i in range(1, args.repeat + 1):
+            cache_dir = shared_cache if args.warm_cache else shared_cache / f"run{i}"
+            run = run_once(video, i, cache_dir, args.keep, args.prompt_path, args.cut_mode)
+            runs.append(run)
+            status = "ok" if run["ok"] else f"FALHOU ({run['error']})"
+            stages = " | ".join(f"{n} {s['wall_s']:.2f}s" for n, s in run["stages"].items())
+            print(f"[{i}/{args.repeat}] {status}: {run['wall_s']:.2f}s total, {run['cpu_s']:.2f}s CPU — {stages}")
+    finally:
+        services.stop()
+        shutil.rmtree(shared_cache, ignore_errors=True)
+
+    report = {
+        "label": args.label,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "git": git_revision(),
+        "host": {"python": platform.python_version(), "platform": platform.platform(),
+                 "cpus": os.cpu_count(), "ffmpeg": ffmpeg_version()},
+        "media": {"path": str(video), "size": video.stat().st_size, "duration": args.duration,
+                  "resolution": args.resolution, "fps": args.fps, "audio": args.audio} if not args.video
+                 else {"path": str(video), "size": video.stat().st_size},
+        "services": {"asr_latency": args.asr_latency, "asr_rtf": args.asr_rtf, "llm_latency": args.llm_latency,
+                     "token_delay": args.token_delay, "load_delay": args.load_delay, "requests": services.stats},
+        "env": {k: v for k, v in overrides.items() if k not in services.env()},
+        "summary": summarize(runs),
+        "runs": runs,
+    }
+    out = Path(args.output) if args.output else (
+        BENCH_DIR / "results" / f"{time.strftime('%Y%m%d-%H%M%S')}_{report['git']['commit'][:8] or 'nogit'}.json")
+    out.parent.mkdir(parents=True, exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"Relatório salvo em {out}")
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            compare(report, json.load(f))
+    return 0 if all(r["ok"] for r in runs) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,54 @@
+import os
+import argparse
+import subprocess
+from pathlib import Path
+
+# Vídeos sintéticos para benchmark, gerados offline só com o ffmpeg (lavfi):
+# padrão de teste com troca de "cena" a cada SCENE_SECONDS (matiz girando) e
+# áudio em tom puro ou "tipo fala" (tom modulado em sílabas de ~4 Hz com pausas).
+AUDIO_SOURCES = {
+    "tone": "sine=frequency=440:sample_rate=48000",
+    "speech": (
+        "aevalsrc='0.4*sin(2*PI*(140+40*sin(2*PI*0.3*t))*t)"
+        "*(0.55+0.45*sin(2*PI*4*t))*gt(mod(t\\,7)\\,1.2)':s=48000"
+    ),
+    "silence": "anullsrc=r=48000:cl=mono",
+}
+SCENE_SECONDS = 8
+
+def media_name(duration: float, resolution: str, fps: int, audio: str) -> str:
+    return f"synthetic_{int(duration)}s_{resolution}_{fps}fps_{audio}.mp4"
+
+def generate_video(path, duration: float = 120, resolution: str = "1280x720", fps: int = 30,
+                   audio: str = "speech", gop: int = 60, ffmpeg: str = "ffmpeg") -> Path:
+    """Gera (se ainda não existir) um MP4 H.264/AAC com faststart em `path`."""
+    path = Path(path)
+    if path.exists() and path.stat().st_size > 0:
+        return path
+    if audio not in AUDIO_SOURCES:
+        raise ValueError(f"Áudio '{audio}' inválido (opções: {', '.join(AUDIO_SOURCES)})")
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp.mp4")
+    cmd = [
+        ffmpeg, "-hide_banner", "-loglevel", "error", "-y",
+        "-f", "lavfi", "-i", f"testsrc2=size={resolution}:rate={fps}:duration={duration}",
+        "-f", "lavfi", "-t", str(duration), "-i", AUDIO_SOURCES[audio],
+        "-vf", f"hue=h=137*floor(t/{SCENE_SECONDS})",
+        "-c:v", "libx264", "-preset", "ultrafast", "-pix_fmt", "yuv420p", "-g", str(gop),
+        "-c:a", "aac", "-b:a", "96k", "-ac", "1",
+        "-shortest", "-movflags", "+faststart", str(tmp),
+    ]
+    subprocess.run(cmd, check=True)
+    os.replace(tmp, path)
+    return path
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Gera um vídeo sintético para benchmark.")
+    parser.add_argument("output", nargs="?", help="Arquivo de saída (padrão: benchmarks/media/<parâmetros>.mp4)")
+    parser.add_argument("--duration", type=float, default=120, help="Duração em segundos")
+    parser.add_argument("--resolution", default="1280x720", help="LARGURAxALTURA")
+    parser.add_argument("--fps", type=int, default=30)
+    parser.add_argument("--audio", default="speech", choices=sorted(AUDIO_SOURCES))
+    args = parser.parse_args()
+    out = args.output or Path(__file__).parent / "media" / media_name(args.duration, args.resolution, args.fps, args.audio)
+    print(generate_video(out, args.duration, args.resolution, args.fps, args.audio))
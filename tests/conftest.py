@@ -0,0 +1,7 @@
+import sys
+from pathlib import Path
+
+# Os módulos do app se importam pelo nome (import metrics, from transcript import ...),
+# como quando rodam de dentro de app/.
+APP_DIR = Path(__file__).resolve().parent.parent / "app"
+sys.path.insert(0, str(APP_DIR))
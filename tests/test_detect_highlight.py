@@ -0,0 +1,95 @@
+import json
+
+import pytest
+
+from detect_highlight import HighlightStreamParser, estimate_tokens, plan_windows, reduce_candidates
+
+@pytest.fixture(autouse=True)
+def _default_token_estimate(monkeypatch):
+    monkeypatch.delenv("DETECT_CHARS_PER_TOKEN", raising=False)
+
+def _cues(n, step=10.0, text="x" * 7):
+    # "x" * 7 → 3 tokens com 3.5 caracteres por token
+    return [(i * step, i * step + step, text) for i in range(n)]
+
+# --------------------------
+# plan_windows
+# --------------------------
+def test_plan_windows_single_window_when_everything_fits():
+    cues = _cues(5)
+    assert plan_windows(cues, 1000, 30.0) == [(0.0, 50.0, cues)]
+
+def test_plan_windows_respects_budget_and_covers_all_cues():
+    cues = _cues(20)
+    windows = plan_windows(cues, 9, 10.0)
+    for _, _, chunk in windows:
+        assert sum(estimate_tokens(c[2]) for c in chunk) <= 9
+    covered = {c for _, _, chunk in windows for c in chunk}
+    assert covered == set(cues)
+    for (_, prev_end, _), (next_start, _, _) in zip(windows, windows[1:]):
+        assert next_start < prev_end  # janelas vizinhas se sobrepõem
+
+def test_plan_windows_oversized_cue_gets_its_own_window():
+    cues = [(0.0, 10.0, "x" * 700), (10.0, 20.0, "curto")]
+    windows = plan_windows(cues, 5, 0.0)
+    assert [w[2] for w in windows] == [[cues[0]], [cues[1]]]
+
+def test_plan_windows_overlap_is_capped_to_half_window():
+    # regressão: overlap maior que a janela fazia cada janela avançar um único cue
+    cues = _cues(30)
+    windows = plan_windows(cues, 9, 1000.0)
+    assert len(windows) <= len(cues) // 2 + 1
+    starts = [w[0] for w in windows]
+    assert starts == sorted(set(starts))
+
+# --------------------------
+# reduce_candidates
+# --------------------------
+def test_reduce_candidates_merges_duplicates_and_prefers_support():
+    candidates = [
+        {"start": 0.0, "end": 10.0},
+        {"start": 1.0, "end": 10.0},   # mesma cena vista por outra janela
+        {"start": 8.0, "end": 30.0},   # sobrepõe o vencedor: descartado
+        {"start": 50.0, "end": 60.0},
+    ]
+    assert reduce_candidates(candidates) == [{"start": 0.0, "end": 10.0}, {"start": 50.0, "end": 60.0}]
+
+def test_reduce_candidates_ranks_by_score_and_limits_clips():
+    candidates = [
+        {"start": 0.0, "end": 10.0, "score": 2},
+        {"start": 20.0, "end": 30.0, "score": 9},
+        {"start": 40.0, "end": 50.0, "score": 5},
+    ]
+    assert reduce_candidates(candidates, max_clips=2) == [{"start": 20.0, "end": 30.0}, {"start": 40.0, "end": 50.0}]
+
+def test_reduce_candidates_tolerates_non_numeric_scores():
+    candidates = [
+        {"start": 0.0, "end": 10.0, "score": "alta"},
+        {"start": 1.0, "end": 10.0, "score": None},
+        {"start": 20.0, "end": 30.0, "score": "7.5"},
+        {"start": 40.0, "end": 50.0, "score": float("nan")},
+    ]
+    assert reduce_candidates(candidates, max_clips=2) == [{"start": 0.0, "end": 10.0}, {"start": 20.0, "end": 30.0}]
+
+# --------------------------
+# HighlightStreamParser
+# --------------------------
+def _feed_all(parser, text, size):
+    found = []
+    for i in range(0, len(text), size):
+        found.extend(parser.feed(text[i:i + size]))
+    return found
+
+@pytest.mark.parametrize("size", [1, 3, 1000])
+def test_stream_parser_yields_each_clip_once(size):
+    clips = [{"start": 1.5, "end": 9.0}, {"start": 20, "end": 31, "reason": "risos {e} \"aplausos\""}]
+    text = "Aqui estão os cortes:\n```json\n" + json.dumps(clips, ensure_ascii=False) + "\n```"
+    assert _feed_all(HighlightStreamParser(), text, size) == clips
+
+def test_stream_parser_accepts_clips_wrapper():
+    text = json.dumps({"clips": [{"start": 0, "end": 5}, {"start": 10, "end": 15}]})
+    assert _feed_all(HighlightStreamParser(), text, 4) == [{"start": 0, "end": 5}, {"start": 10, "end": 15}]
+
+def test_stream_parser_skips_objects_without_times_and_broken_json():
+    text = '[{"nota": 1}, {"start": 1, "end": oops}, {"start": 2, "end": 3}]'
+    assert _feed_all(HighlightStreamParser(), text, 7) == [{"start": 2, "end": 3}]
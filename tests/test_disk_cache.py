@@ -0,0 +1,71 @@
+import os
+import time
+
+import pytest
+
+import disk_cache
+from disk_cache import DiskCache
+
+@pytest.fixture(autouse=True)
+def _cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv("CACHE_DIR", str(tmp_path))
+
+def _age(cache, key, seconds):
+    """Recua o mtime (uso mais recente) da entrada."""
+    path = cache.directory / f"{key}.json"
+    past = time.time() - seconds
+    os.utime(path, (past, past))
+
+def test_set_get_and_missing(tmp_path):
+    cache = DiskCache("teste", 1024 * 1024)
+    assert cache.directory == tmp_path / "teste"
+    cache.set("a", {"texto": "olá", "n": [1, 2]})
+    assert cache.get("a") == {"texto": "olá", "n": [1, 2]}
+    assert cache.get("b") is None
+    assert not list(cache.directory.glob("*.tmp"))
+
+def test_lru_evicts_least_recently_used():
+    cache = DiskCache("lru", 1024 * 1024)
+    for key in ("a", "b", "c"):
+        cache.set(key, "x" * 100)
+    entry_size = (cache.directory / "a.json").stat().st_size
+    _age(cache, "a", 300)
+    _age(cache, "b", 200)
+    _age(cache, "c", 100)
+    assert cache.get("a") is not None  # hit: "a" passa a ser a mais recente
+
+    cache.max_bytes = entry_size * 3 + entry_size // 2  # o "created" varia alguns bytes por entrada
+    cache.set("d", "x" * 100)
+    assert cache.get("b") is None
+    assert all(cache.get(key) is not None for key in ("a", "c", "d"))
+
+def test_eviction_removes_orphan_aliases():
+    cache = DiskCache("alias", 1024 * 1024)
+    cache.set("a", "valor")
+    cache.set_alias("apelido", "a")
+    assert cache.get_alias("apelido") == "valor"
+
+    _age(cache, "a", 100)
+    cache.max_bytes = 1
+    cache.set("b", "outro")
+    assert cache.get_alias("apelido") is None
+    assert not (cache.directory / "apelido.alias").exists()
+
+def test_ttl_expires_entries(monkeypatch):
+    cache = DiskCache("ttl", 1024 * 1024, ttl=60)
+    cache.set("a", "valor")
+    assert cache.get("a") == "valor"
+
+    now = time.time()
+    monkeypatch.setattr(disk_cache.time, "time", lambda: now + 61)
+    assert cache.get("a") is None
+    assert not (cache.directory / "a.json").exists()
+
+def test_ttl_counts_from_write_not_last_hit(monkeypatch):
+    cache = DiskCache("ttl_hit", 1024 * 1024, ttl=60)
+    cache.set("a", "valor")
+    now = time.time()
+    monkeypatch.setattr(disk_cache.time, "time", lambda: now + 40)
+    assert cache.get("a") == "valor"
+    monkeypatch.setattr(disk_cache.time, "time", lambda: now + 70)
+    assert cache.get("a") is None
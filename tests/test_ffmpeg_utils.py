@@ -0,0 +1,28 @@
+import struct
+
+from ffmpeg_utils import mp4_index_position
+
+def _box(kind: bytes, payload: bytes = b"") -> bytes:
+    return struct.pack(">I", 8 + len(payload)) + kind + payload
+
+FTYP = _box(b"ftyp", b"isom\x00\x00\x02\x00isomiso2mp41")
+
+def test_faststart_mp4_has_index_at_start():
+    assert mp4_index_position(FTYP + _box(b"moov", b"\x00" * 32) + _box(b"mdat")) == "start"
+
+def test_mdat_before_moov_has_index_at_end():
+    assert mp4_index_position(FTYP + _box(b"free", b"\x00" * 4) + _box(b"mdat", b"\x00" * 64)) == "end"
+
+def test_64_bit_box_size_is_followed():
+    large_free = struct.pack(">I", 1) + b"free" + struct.pack(">Q", 16 + 8) + b"\x00" * 8
+    assert mp4_index_position(FTYP + large_free + _box(b"moov")) == "start"
+
+def test_not_mp4():
+    assert mp4_index_position(b"\x1aE\xdf\xa3" + b"\x00" * 60) is None  # Matroska
+    assert mp4_index_position(b"") is None
+
+def test_undecidable_with_given_bytes():
+    truncated = FTYP + struct.pack(">I", 4096) + b"free" + b"\x00" * 16
+    assert mp4_index_position(truncated) is None
+    assert mp4_index_position(FTYP + struct.pack(">I", 0) + b"free") is None  # box até o fim do arquivo
+    assert mp4_index_position(FTYP + struct.pack(">I", 4) + b"free") is None  # tamanho inválido
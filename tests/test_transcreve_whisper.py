@@ -0,0 +1,94 @@
+import pytest
+
+import transcreve_whisper
+from transcreve_whisper import merge_chunk_segments, plan_chunks
+
+# --------------------------
+# plan_chunks
+# --------------------------
+def test_plan_chunks_short_audio_is_one_chunk():
+    assert plan_chunks(30.0, [], 60.0, 1.0) == [(0.0, 30.0)]
+
+def test_plan_chunks_cuts_in_last_silence_of_second_half():
+    # janela [0, 40]: silêncios no meio em 26 e 36 → corta em 36; depois não há silêncio
+    chunks = plan_chunks(100.0, [(25.0, 27.0), (35.0, 37.0)], 40.0, 1.0)
+    assert chunks == [(0.0, 36.0), (36.0, 76.0), (75.0, 100.0)]
+
+def test_plan_chunks_ignores_silence_in_first_half():
+    chunks = plan_chunks(100.0, [(5.0, 7.0)], 40.0, 0.0)
+    assert chunks[0] == (0.0, 40.0)
+
+def test_plan_chunks_covers_whole_duration():
+    chunks = plan_chunks(1000.0, [(s, s + 1.0) for s in range(0, 1000, 37)], 120.0, 2.0)
+    assert chunks[0][0] == 0.0 and chunks[-1][1] == 1000.0
+    for (_, end), (start, _) in zip(chunks, chunks[1:]):
+        assert start <= end
+
+def test_plan_chunks_overlap_larger_than_chunk_still_advances():
+    # regressão: overlap ≥ chunk_seconds fazia pos = limit - overlap nunca avançar (loop infinito)
+    chunks = plan_chunks(100.0, [], 10.0, 50.0)
+    assert chunks[-1][1] == 100.0
+    assert len(chunks) <= 20
+    assert all(b[0] > a[0] for a, b in zip(chunks, chunks[1:]))
+
+@pytest.mark.parametrize("chunk_seconds", [0.0, -5.0])
+def test_plan_chunks_rejects_non_positive_chunk(chunk_seconds):
+    with pytest.raises(ValueError):
+        plan_chunks(100.0, [], chunk_seconds, 1.0)
+
+# --------------------------
+# merge_chunk_segments
+# --------------------------
+def _seg(start, end, text, words=None):
+    return {"start": start, "end": end, "text": text, "words": words or []}
+
+def test_merge_chunk_segments_applies_offsets_and_renumbers():
+    merged = merge_chunk_segments([
+        (0.0, [_seg(0.0, 5.0, "olá mundo")]),
+        (5.0, [_seg(0.5, 3.0, "segunda parte")]),
+    ])
+    assert [(s["id"], s["start"], s["end"], s["text"]) for s in merged] == [
+        (0, 0.0, 5.0, "olá mundo"),
+        (1, 5.5, 8.0, "segunda parte"),
+    ]
+
+def test_merge_chunk_segments_drops_seam_duplicates():
+    merged = merge_chunk_segments([
+        (0.0, [_seg(0.0, 5.0, "primeira frase"), _seg(5.0, 10.0, "tudo bem com você")]),
+        # chunk seguinte começa 1 s antes (sobreposição sem silêncio)
+        (9.0, [_seg(0.0, 1.0, "você"), _seg(0.5, 1.5, "com você"), _seg(1.0, 4.0, "outra frase")]),
+    ])
+    assert [s["text"] for s in merged] == ["primeira frase", "tudo bem com você", "outra frase"]
+    assert merged[-1]["start"] == 10.0 and merged[-1]["end"] == 13.0
+
+def test_merge_chunk_segments_clamps_start_and_shifts_words():
+    merged = merge_chunk_segments([
+        (0.0, [_seg(0.0, 5.0, "abc")]),
+        (4.0, [_seg(0.0, 3.0, "texto novo", words=[
+            {"word": "velho", "start": 0.2, "end": 0.8},
+            {"word": "texto", "start": 1.2, "end": 1.8},
+            {"word": "novo", "start": 2.0, "end": 2.9},
+        ])]),
+    ])
+    second = merged[1]
+    assert second["start"] == 5.0
+    assert [(w["word"], w["start"], w["end"]) for w in second["words"]] == [
+        ("texto", 5.2, 5.8), ("novo", 6.0, 6.9),
+    ]
+
+# --------------------------
+# _transcribe_chunk
+# --------------------------
+def test_transcribe_chunk_does_not_sleep_after_last_attempt(monkeypatch):
+    sleeps, urls = [], []
+
+    def failing_post(path, url, timeout):
+        urls.append(url)
+        raise ConnectionError("fora do ar")
+
+    monkeypatch.setattr(transcreve_whisper, "post_asr", failing_post)
+    monkeypatch.setattr(transcreve_whisper.time, "sleep", sleeps.append)
+    with pytest.raises(RuntimeError):
+        transcreve_whisper._transcribe_chunk("chunk.opus", ["http://a", "http://b"], 0, 2, 10)
+    assert urls == ["http://a/asr", "http://b/asr", "http://a/asr"]
+    assert sleeps == [1, 2]
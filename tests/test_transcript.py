@@ -0,0 +1,66 @@
+import pytest
+
+from transcript import Transcript, load_timings_for, timings_path_for
+
+WORDS = [(1.0, 1.5, "olá"), (2.0, 2.6, "mundo"), (3.0, 3.4, "ação")]
+
+@pytest.fixture
+def transcript():
+    return Transcript([1.0, 3.0], [2.6, 3.4], ["olá mundo", "ação"], words=WORDS)
+
+# --------------------------
+# Ajuste em fronteiras de palavra
+# --------------------------
+def test_snap_start_inside_word_moves_to_word_start_minus_pad(transcript):
+    assert transcript.snap_start(2.3) == pytest.approx(1.85)
+
+def test_snap_start_in_pause_aligns_with_next_word(transcript):
+    assert transcript.snap_start(1.7) == pytest.approx(1.85)
+
+def test_snap_start_pad_does_not_enter_previous_word(transcript):
+    assert transcript.snap_start(2.3, pad=1.0) == pytest.approx(1.5)
+
+def test_snap_end_inside_word_moves_past_word_end(transcript):
+    assert transcript.snap_end(2.3) == pytest.approx(2.75)
+
+def test_snap_end_pad_does_not_enter_next_word(transcript):
+    assert transcript.snap_end(2.3, pad=1.0) == pytest.approx(3.0)
+
+def test_snap_keeps_times_beyond_max_shift(transcript):
+    assert transcript.snap_start(10.0) == 10.0
+    assert transcript.snap_end(-5.0) == -5.0
+
+def test_snap_keeps_original_when_interval_would_invert(transcript):
+    assert transcript.snap(3.2, 1.2) == (3.2, 1.2)
+
+def test_snap_without_words_uses_cues():
+    t = Transcript([0.0, 5.0], [4.0, 9.0], ["a", "b"])
+    assert t.snap(4.5, 8.0) == pytest.approx((4.85, 9.15))
+
+# --------------------------
+# .timings.bin
+# --------------------------
+def test_timings_round_trip(tmp_path, transcript):
+    path = transcript.save_timings(str(tmp_path / "video.timings.bin"))
+    loaded = Transcript.load_timings(path)
+    assert loaded.cues() == transcript.cues()
+    assert list(zip(loaded.word_starts, loaded.word_ends, loaded.words)) == WORDS
+    assert loaded.snap(2.3, 2.3) == transcript.snap(2.3, 2.3)
+
+def test_timings_round_trip_empty(tmp_path):
+    path = Transcript([], [], []).save_timings(str(tmp_path / "vazio.timings.bin"))
+    loaded = Transcript.load_timings(path)
+    assert len(loaded) == 0 and loaded.words == []
+
+def test_load_timings_rejects_other_files(tmp_path):
+    path = tmp_path / "outro.timings.bin"
+    path.write_bytes(b"XXXX" + bytes(16))
+    with pytest.raises(ValueError):
+        Transcript.load_timings(str(path))
+
+def test_load_timings_for_media(tmp_path, transcript):
+    video = tmp_path / "job.mp4"
+    assert timings_path_for(str(video)) == str(tmp_path / "job.timings.bin")
+    assert load_timings_for(str(video)) is None
+    transcript.save_timings(timings_path_for(str(video)))
+    assert load_timings_for(str(video)).cues() == transcript.cues()